@@ -22,6 +22,12 @@
  */
 class ContainerExecutor {
 
+    // The docker command.
+    // Can be replaced (i.e. by a test shim) using the DOCKER environment variable.
+    final static String docker = System.getenv('DOCKER') ?: 'docker'
+    // The command that keeps a re-usable container running
+    final static String idleCommand = 'while true; do sleep 60; done'
+
     /**
      * Executes the given command in the supplied container image. The data
      * directory (pin) is mounted as `/data` in the running container
@@ -37,51 +43,148 @@ class ContainerExecutor {
      * @param pout The pipeline output directory
      *             (used to define the POUT environment variable)
      * @param timeoutSeconds The time to allow for the command to execute
-     * @return A list containing the STDOUT and STDERR encapsulated in a
-     *         StringBuilder(), an integer command exit code and a timeout
-     *         boolean (set if the program execution timed out)
+     * @param sout The capture for the command's STDOUT
+     * @param serr The capture for the command's STDERR
+     * @return A list containing the STDOUT and STDERR encapsulated in an
+     *         OutputCapture(), an integer command exit code, a timeout
+     *         boolean (set if the program execution timed out) and the
+     *         CPU time of the command (always null, it's not measured
+     *         in the container)
      */
     static execute(String command, String imageName,
                    String pin, String pout,
-                   int timeoutSeconds) {
-
-        StringBuilder sout = new StringBuilder()
-        StringBuilder serr = new StringBuilder()
+                   int timeoutSeconds,
+                   OutputCapture sout = new OutputCapture(),
+                   OutputCapture serr = new OutputCapture()) {
 
-        // Windows/Git-Bash PIN/POUT path tweak...
-        String osName = System.properties['os.name']
-        if (osName && osName.startsWith('Win')) {
-            pin = pin.replace('\\', '/')
-            pin = pin.replace('C:', '/c')
-            pout = pout.replace('\\', '/')
-            pout = pout.replace('C:', '/c')
-        }
+        pin = hostPath(pin)
+        pout = hostPath(pout)
 
         // Note: PIN and POUT have trailing forward-slashes for now
         //       to allow a migratory use of $PIN}file references
         //       rather than insisting on ${PIN}/file which would fail if
         //       PIN wasn't defined - it's about lowest risk changes.
 
-        String cmd = "docker run --rm -v $pin:/data -v $pout:/output" +
+        String cmd = "$docker run --rm -v $pin:/data -v $pout:/output" +
                      " -w /output -e PIN=/data/ -e POUT=/output/ $imageName" +
                      " sh -c '$command'"
 
         def proc = ['sh', '-c', cmd].execute(null, new File('.'))
-        proc.consumeProcessOutput(sout, serr)
-        proc.waitForOrKill((long)timeoutSeconds * 1000)
+        def readers = OutputCapture.consume(proc, sout, serr)
+        boolean timeout = ProcessTimer.waitFor(proc, timeoutSeconds)
+        int exitValue = proc.exitValue()
+        OutputCapture.finish(readers, sout, serr)
+
+        return [sout, serr, exitValue, timeout, null]
+
+    }
+
+    /**
+     * Starts a container that can be used to execute commands (see exec()).
+     * The container runs until it's stopped. The data directory (pin) is
+     * mounted as `/data`, the root of the test output directories as
+     * `/output` and the root of the alternative input directories
+     * as `/input`.
+     *
+     * @param imageName The image to run
+     * @param pin The pipeline input directory
+     * @param outputRoot The directory containing the test output directories
+     * @param inputRoot The directory containing alternative input directories
+     * @return The container ID (null if the container could not be started)
+     */
+    static String start(String imageName, String pin,
+                        String outputRoot, String inputRoot) {
+
+        StringBuilder sout = new StringBuilder()
+        StringBuilder serr = new StringBuilder()
+        def proc = [docker, 'run', '--detach', '--rm',
+                    '-v', hostPath(pin) + ':/data',
+                    '-v', hostPath(outputRoot) + ':/output',
+                    '-v', hostPath(inputRoot) + ':/input',
+                    imageName, 'sh', '-c', idleCommand].execute()
+        proc.waitForProcessOutput(sout, serr)
+        if (proc.exitValue() != 0) {
+            Log.err("Failed to start a container for $imageName (${serr.toString().trim()})")
+            return null
+        }
+        return sout.toString().trim()
+
+    }
+
+    /**
+     * Executes the given command in a running container (see start()).
+     * PIN and POUT are defined as they are for execute(), and the command
+     * is executed in the output directory.
+     *
+     * @param command The command to run
+     * @param containerId The container to run the command in
+     * @param pin The pipeline input directory (in the container)
+     * @param pout The pipeline output directory (in the container)
+     * @param timeoutSeconds The time to allow for the command to execute
+     * @param sout The capture for the command's STDOUT
+     * @param serr The capture for the command's STDERR
+     * @return The same list returned by execute(). If the command times out
+     *         it may still be running in the container, which should be
+     *         stopped.
+     */
+    static exec(String command, String containerId,
+                String pin, String pout,
+                int timeoutSeconds,
+                OutputCapture sout = new OutputCapture(),
+                OutputCapture serr = new OutputCapture()) {
+
+        def proc = [docker, 'exec', '-w', pout,
+                    '-e', "PIN=$pin/", '-e', "POUT=$pout/",
+                    containerId, 'sh', '-c', command].execute()
+        def readers = OutputCapture.consume(proc, sout, serr)
+        boolean timeout = ProcessTimer.waitFor(proc, timeoutSeconds)
         int exitValue = proc.exitValue()
+        OutputCapture.finish(readers, sout, serr)
+
+        return [sout, serr, exitValue, timeout, null]
+
+    }
+
+    /**
+     * Stops (and removes) a container.
+     *
+     * @param containerId The container to stop
+     */
+    static stop(String containerId) {
+
+        def proc = [docker, 'rm', '--force', containerId].execute()
+        proc.waitForProcessOutput(new StringBuilder(), new StringBuilder())
+
+    }
 
-        // Timeout?
-        //
-        // Some exit codes have a special meaning.
-        //
-        // We can, for example, assume that the process was killed
-        // if the exit code is 143 as 143, which is 128 + 15, means
-        // the program died with signal 15 (SIGTERM).
-        // See http://www.tldp.org/LDP/abs/html/exitcodes.html.
-        boolean timeout = exitValue == 143 ? true : false
-
-        return [sout, serr, exitValue, timeout]
+    /**
+     * Returns the ID of an image (a digest of its content),
+     * or null if the image is not available locally.
+     *
+     * @param imageName The image name (and tag)
+     */
+    static String imageId(String imageName) {
+
+        def proc = [docker, 'image', 'inspect', '--format', '{{.Id}}', imageName].execute()
+        StringBuilder out = new StringBuilder()
+        proc.waitForProcessOutput(out, new StringBuilder())
+        String id = out.toString().trim()
+        return proc.exitValue() == 0 && id ? id : null
+
+    }
+
+    /**
+     * Returns a host path suitable for a docker volume
+     * (applying the Windows/Git-Bash path tweak).
+     */
+    static String hostPath(String path) {
+
+        String osName = System.properties['os.name']
+        if (osName && osName.startsWith('Win')) {
+            path = path.replace('\\', '/')
+            path = path.replace('C:', '/c')
+        }
+        return path
 
     }
 
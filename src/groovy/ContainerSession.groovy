@@ -0,0 +1,185 @@
+#!/usr/bin/env groovy
+
+/**
+ * Copyright (c) 2019 Informatics Matters Ltd.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+/**
+ * The ContainerSession class. Re-usable containers, used to run tests
+ * in their container images without starting a new container for every
+ * test.
+ *
+ * A container is started (by ContainerExecutor.start()) the first time an
+ * image is used with a given input directory and each test is run in it
+ * (by ContainerExecutor.exec()) in its own output directory. Each thread
+ * has its own containers so tests that are run in parallel never share
+ * a container. A container whose test timed out is discarded (as the test
+ * may still be running in it) and a new one is started for the next test.
+ */
+class ContainerSession {
+
+    // Container paths of the mounted directories (see ContainerExecutor.start())
+    final static String containerInputPath = '/data'
+    final static String containerOutputRoot = '/output'
+    final static String containerInputRoot = '/input'
+
+    // The directory containing the test output directories (POUT)
+    String outputRoot
+    // The directory containing alternative test input directories
+    String inputRoot
+
+    // Running containers (IDs), keyed by image, input directory and thread
+    private final Map containers = [:]
+
+    /**
+     * Executes a test command in a re-usable container.
+     * If a container cannot be started the command is executed
+     * (using ContainerExecutor.execute()) in a new container.
+     *
+     * @param command The command to run
+     * @param imageName The container image
+     * @param pin The pipeline input directory
+     *            (the project data directory or a sub-directory of inputRoot)
+     * @param pout The pipeline output directory (a sub-directory of outputRoot)
+     * @param timeoutSeconds The time to allow for the command to execute
+     * @param sout The capture for the command's STDOUT
+     * @param serr The capture for the command's STDERR
+     * @return The same list returned by ContainerExecutor.execute()
+     */
+    def execute(String command, String imageName,
+                String pin, String pout,
+                int timeoutSeconds,
+                OutputCapture sout = new OutputCapture(),
+                OutputCapture serr = new OutputCapture()) {
+
+        // The project data directory is mounted when the container is
+        // started, alternative input directories are found in inputRoot.
+        String dataPin = pin
+        String containerPin = containerInputPath
+        String relativePin = relativePath(inputRoot, pin)
+        if (relativePin != null) {
+            dataPin = null
+            containerPin = containerInputRoot + '/' + relativePin
+        }
+        String relativePout = relativePath(outputRoot, pout)
+        if (relativePout == null) {
+            Log.err("Output path is not in $outputRoot, using a new container")
+            return ContainerExecutor.execute(command, imageName,
+                                             pin, pout, timeoutSeconds,
+                                             sout, serr)
+        }
+        String containerPout = containerOutputRoot + '/' + relativePout
+
+        String key = containerKey(imageName, dataPin)
+        String containerId = container(key, imageName, dataPin)
+        if (containerId == null) {
+            return ContainerExecutor.execute(command, imageName,
+                                             pin, pout, timeoutSeconds,
+                                             sout, serr)
+        }
+
+        def result = ContainerExecutor.exec(command, containerId,
+                                            containerPin, containerPout,
+                                            timeoutSeconds, sout, serr)
+        boolean timeout = result[3]
+        if (timeout) {
+            discard(key)
+        }
+        return result
+
+    }
+
+    /**
+     * Stops all the running containers.
+     */
+    synchronized void close() {
+
+        containers.values().each { String containerId ->
+            ContainerExecutor.stop(containerId)
+        }
+        containers.clear()
+
+    }
+
+    /**
+     * Returns the ID of the container for the given key,
+     * starting one if necessary.
+     *
+     * @return The container ID (null if a container could not be started)
+     */
+    private String container(String key, String imageName, String dataPin) {
+
+        synchronized (this) {
+            if (containers.containsKey(key)) {
+                return containers[key]
+            }
+        }
+        // The project data directory isn't needed if the test
+        // uses alternative input, but something has to be mounted.
+        String pin = dataPin ?: inputRoot
+        new File(outputRoot).mkdirs()
+        new File(inputRoot).mkdirs()
+        String containerId = ContainerExecutor.start(imageName, pin,
+                                                     outputRoot, inputRoot)
+        if (containerId != null) {
+            synchronized (this) {
+                containers[key] = containerId
+            }
+        }
+        return containerId
+
+    }
+
+    /**
+     * Stops the container for the given key.
+     */
+    private void discard(String key) {
+
+        String containerId
+        synchronized (this) {
+            containerId = containers.remove(key)
+        }
+        if (containerId != null) {
+            ContainerExecutor.stop(containerId)
+        }
+
+    }
+
+    /**
+     * The key of the calling thread's container for an image
+     * and input directory.
+     */
+    private static String containerKey(String imageName, String dataPin) {
+
+        return "$imageName|$dataPin|${Thread.currentThread().getId()}"
+
+    }
+
+    /**
+     * Returns the path of a file relative to a directory
+     * (using '/' separators), or null if it is not in the directory.
+     */
+    private static String relativePath(String directory, String path) {
+
+        String root = new File(directory).getCanonicalPath() + File.separator
+        String canonicalPath = new File(path).getCanonicalPath()
+        if (!canonicalPath.startsWith(root)) {
+            return null
+        }
+        return canonicalPath.substring(root.length()).replace(File.separator, '/')
+
+    }
+
+}
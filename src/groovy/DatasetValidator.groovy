@@ -0,0 +1,404 @@
+#!/usr/bin/env groovy
+
+/**
+ * Copyright (c) 2019 Informatics Matters Ltd.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+import java.util.zip.GZIPInputStream
+
+import groovy.json.JsonSlurper
+
+/**
+ * The DatasetValidator class. Validates the content of a Squonk dataset,
+ * a gzipped JSON list of records (the '.data.gz' file) and its
+ * '.metadata' file.
+ *
+ * The data is streamed through a simple JSON parser that checks it's
+ * well-formed without building the records, so memory use does not
+ * depend on the size of the dataset (other than the record uuids, which
+ * are kept to check that they're unique). The number of records must
+ * match the 'size' in the metadata (if it has one).
+ */
+class DatasetValidator {
+
+    final static int bufferSize = 65536
+    // JSON values nested deeper than this are considered invalid
+    final static int maxDepth = 512
+    // The longest uuid value that's kept
+    final static int maxUuidLength = 256
+    final static String uuidKey = 'uuid'
+
+    // The number of records found
+    long records = 0
+    // The time taken to validate the data
+    double seconds = 0
+
+    private Reader reader = null
+    private int peeked = -1
+    private boolean hasPeeked = false
+    // Characters read (for error messages)
+    private long position = 0
+    private final Set<Object> uuids = new HashSet<Object>()
+
+    /**
+     * Validates a dataset, logging any problems.
+     *
+     * @param dataFile The dataset's (gzipped) data file
+     * @param metadataFile The dataset's metadata file
+     * @return True if the dataset is valid
+     */
+    boolean validate(File dataFile, File metadataFile) {
+
+        long startNanos = System.nanoTime()
+        try {
+            new GZIPInputStream(new FileInputStream(dataFile), bufferSize).
+                    withReader('UTF-8') { Reader input ->
+                reader = new BufferedReader(input, bufferSize)
+                parseDataset()
+            }
+        } catch (IOException ex) {
+            Log.err("Invalid dataset '$dataFile.name' (${ex.getMessage()})")
+            return false
+        } finally {
+            reader = null
+            uuids.clear()
+            seconds = (double)(System.nanoTime() - startNanos) / 1000000000
+        }
+
+        def metadata
+        try {
+            metadata = new JsonSlurper().parse(metadataFile)
+        } catch (Exception ex) {
+            Log.err("Invalid metadata '$metadataFile.name' (${ex.getMessage()})")
+            return false
+        }
+        if (!(metadata instanceof Map)) {
+            Log.err("Invalid metadata '$metadataFile.name' (it is not a JSON object)")
+            return false
+        }
+        if (metadata.size != null && metadata.size != records) {
+            Log.err("Dataset '$dataFile.name' has $records records" +
+                    " but its metadata size is $metadata.size")
+            return false
+        }
+
+        return true
+
+    }
+
+    /**
+     * Returns the validation rate (records per second).
+     */
+    long recordsPerSecond() {
+
+        return seconds > 0 ? (long)(records / seconds) : records
+
+    }
+
+    /**
+     * Parses the dataset, a JSON list of objects, each with a unique uuid.
+     */
+    private parseDataset() {
+
+        skipWhitespace()
+        expect('[')
+        skipWhitespace()
+        if (peek() == (int)']') {
+            next()
+        } else {
+            while (true) {
+                skipWhitespace()
+                if (peek() != (int)'{') {
+                    fail('Expected a record (JSON object)')
+                }
+                String uuid = parseObject(1, true)
+                records += 1
+                if (uuid == null) {
+                    fail("Record $records has no $uuidKey")
+                }
+                if (!uuids.add(uuidValue(uuid))) {
+                    fail("Record $records has a duplicate $uuidKey ($uuid)")
+                }
+                skipWhitespace()
+                int c = next()
+                if (c == (int)']') {
+                    break
+                } else if (c != (int)',') {
+                    fail("Expected ',' or ']'")
+                }
+            }
+        }
+        skipWhitespace()
+        if (peek() != -1) {
+            fail('Unexpected content after the end of the list')
+        }
+
+    }
+
+    /**
+     * Parses a JSON value.
+     */
+    private parseValue(int depth) {
+
+        if (depth > maxDepth) {
+            fail('Values are nested too deeply')
+        }
+        skipWhitespace()
+        int c = peek()
+        switch (c) {
+            case (int)'{':
+                parseObject(depth, false)
+                break
+            case (int)'[':
+                parseArray(depth)
+                break
+            case (int)'"':
+                parseString(0)
+                break
+            case (int)'t':
+                parseLiteral('true')
+                break
+            case (int)'f':
+                parseLiteral('false')
+                break
+            case (int)'n':
+                parseLiteral('null')
+                break
+            default:
+                if (c == (int)'-' || Character.isDigit(c)) {
+                    parseNumber()
+                } else {
+                    fail('Expected a value')
+                }
+        }
+
+    }
+
+    /**
+     * Parses a JSON object.
+     *
+     * @param record True if the object is a record (whose uuid is returned)
+     * @return The record's uuid (null if it has none or it's not a record)
+     */
+    private String parseObject(int depth, boolean record) {
+
+        String uuid = null
+        expect('{')
+        skipWhitespace()
+        if (peek() == (int)'}') {
+            next()
+            return uuid
+        }
+        while (true) {
+            skipWhitespace()
+            if (peek() != (int)'"') {
+                fail('Expected a member name')
+            }
+            String key = parseString(record ? uuidKey.length() + 1 : 0)
+            skipWhitespace()
+            expect(':')
+            skipWhitespace()
+            if (record && key == uuidKey && peek() == (int)'"') {
+                uuid = parseString(maxUuidLength)
+            } else {
+                parseValue(depth + 1)
+            }
+            skipWhitespace()
+            int c = next()
+            if (c == (int)'}') {
+                return uuid
+            } else if (c != (int)',') {
+                fail("Expected ',' or '}'")
+            }
+        }
+
+    }
+
+    /**
+     * Parses a JSON array.
+     */
+    private parseArray(int depth) {
+
+        expect('[')
+        skipWhitespace()
+        if (peek() == (int)']') {
+            next()
+            return
+        }
+        while (true) {
+            parseValue(depth + 1)
+            skipWhitespace()
+            int c = next()
+            if (c == (int)']') {
+                return
+            } else if (c != (int)',') {
+                fail("Expected ',' or ']'")
+            }
+        }
+
+    }
+
+    /**
+     * Parses a JSON string, returning (at most) the first
+     * 'limit' characters of it.
+     *
+     * @return The string (null if the limit is 0)
+     */
+    private String parseString(int limit) {
+
+        StringBuilder value = limit > 0 ? new StringBuilder() : null
+        expect('"')
+        while (true) {
+            int c = next()
+            if (c == -1) {
+                fail('Unterminated string')
+            } else if (c == (int)'"') {
+                break
+            } else if (c < 0x20) {
+                fail('Control character in string')
+            } else if (c == (int)'\\') {
+                int e = next()
+                if (e == (int)'u') {
+                    int code = 0
+                    4.times {
+                        int digit = Character.digit(next(), 16)
+                        if (digit < 0) {
+                            fail('Invalid unicode escape')
+                        }
+                        code = code * 16 + digit
+                    }
+                    c = code
+                } else if ('"\\/bfnrt'.indexOf(e) < 0) {
+                    fail('Invalid escape')
+                } else {
+                    c = e
+                }
+            }
+            if (value != null && value.length() < limit) {
+                value.append((char)c)
+            }
+        }
+        return value != null ? value.toString() : null
+
+    }
+
+    private parseNumber() {
+
+        if (peek() == (int)'-') {
+            next()
+        }
+        if (!digits()) {
+            fail('Invalid number')
+        }
+        if (peek() == (int)'.') {
+            next()
+            if (!digits()) {
+                fail('Invalid number')
+            }
+        }
+        if (peek() == (int)'e' || peek() == (int)'E') {
+            next()
+            if (peek() == (int)'+' || peek() == (int)'-') {
+                next()
+            }
+            if (!digits()) {
+                fail('Invalid number')
+            }
+        }
+
+    }
+
+    /**
+     * Consumes digits, returning true if there were any.
+     */
+    private boolean digits() {
+
+        boolean found = false
+        while (peek() != -1 && Character.isDigit(peek())) {
+            next()
+            found = true
+        }
+        return found
+
+    }
+
+    private parseLiteral(String literal) {
+
+        literal.each { String expected ->
+            if (next() != (int)expected.charAt(0)) {
+                fail("Expected '$literal'")
+            }
+        }
+
+    }
+
+    /**
+     * The value kept for a uuid, a UUID (which is smaller than its string)
+     * or the string if it's not a valid UUID.
+     */
+    private static Object uuidValue(String uuid) {
+
+        try {
+            return UUID.fromString(uuid)
+        } catch (IllegalArgumentException ex) {
+            return uuid
+        }
+
+    }
+
+    private skipWhitespace() {
+
+        while (peek() in [(int)' ', (int)'\t', (int)'\n', (int)'\r']) {
+            next()
+        }
+
+    }
+
+    private expect(String expected) {
+
+        if (next() != (int)expected.charAt(0)) {
+            fail("Expected '$expected'")
+        }
+
+    }
+
+    private int peek() {
+
+        if (!hasPeeked) {
+            peeked = reader.read()
+            hasPeeked = true
+        }
+        return peeked
+
+    }
+
+    private int next() {
+
+        int c = peek()
+        hasPeeked = false
+        if (c != -1) {
+            position += 1
+        }
+        return c
+
+    }
+
+    private fail(String message) {
+
+        throw new IOException("$message at character $position".toString())
+
+    }
+
+}
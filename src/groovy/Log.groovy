@@ -36,63 +36,112 @@
  * White    37                  White   47
  */
 
-/**
- * Print a simple separator (a bar) to stdout.
- * Used to visually separate generated output into logical blocks.
- */
-static separate() {
-
-    // To look 'pretty' this should align with the field width
-    // used in the info() function
-    println "+------------------+"
-
-}
-
-/**
- * Print an 'info' message prefixed with `->` string. You can specify a
- * tag and a message which is printed as "-> <tag> : <msg>"
- */
-static info(String tag, msg) {
-
-    println "|" + sprintf('%18s| %s', tag, msg)
-
-}
-
-/**
- * Turns text printing BOLD.
- */
-static text_style_bold() {
-    print "" + (char)27 + "[1m"
-}
-
-/**
- * Turns text printing RED.
- */
-static text_colour_red() {
-    print "" + (char)27 + "[31m"
-}
-
-/**
- * Turns text printing GREEN.
- */
-static text_colour_green() {
-    print "" + (char)27 + "[32m"
-}
-
-/**
- * Returns text printing colour to normal (default).
- */
-static text_normal() {
-    print "" + (char)27 + "[39m" + (char)27 + "[0m"
-}
-
-/**
- * Print an error message.
- */
-static err(String msg) {
-
-    text_colour_red()
-    println "|" + sprintf('%18s| %s', 'ERROR', msg)
-    text_normal()
+class Log {
+
+    // Output written by a thread is collected here (rather than printed)
+    // if the thread has called capture(). Used to keep the output of tests
+    // that are run in parallel together.
+    private static final ThreadLocal<StringBuilder> captureBuffer =
+            new ThreadLocal<StringBuilder>()
+
+    /**
+     * Sets (or clears) the capture buffer of the calling thread.
+     *
+     * @param buffer The buffer to collect the thread's output in,
+     *               or null to resume printing
+     */
+    static capture(StringBuilder buffer) {
+
+        if (buffer == null) {
+            captureBuffer.remove()
+        } else {
+            captureBuffer.set(buffer)
+        }
+
+    }
+
+    /**
+     * Prints text (to stdout), or adds it to the thread's capture buffer.
+     */
+    static write(String text) {
+
+        StringBuilder buffer = captureBuffer.get()
+        if (buffer == null) {
+            print text
+        } else {
+            buffer.append(text)
+        }
+
+    }
+
+    /**
+     * Prints a line of text, or adds it to the thread's capture buffer.
+     */
+    static writeln(String text) {
+
+        write(text + '\n')
+
+    }
+
+    /**
+     * Print a simple separator (a bar) to stdout.
+     * Used to visually separate generated output into logical blocks.
+     */
+    static separate() {
+
+        // To look 'pretty' this should align with the field width
+        // used in the info() function
+        writeln "+------------------+"
+
+    }
+
+    /**
+     * Print an 'info' message prefixed with `->` string. You can specify a
+     * tag and a message which is printed as "-> <tag> : <msg>"
+     */
+    static info(String tag, msg) {
+
+        writeln "|" + sprintf('%18s| %s', tag, msg)
+
+    }
+
+    /**
+     * Turns text printing BOLD.
+     */
+    static text_style_bold() {
+        write "" + (char)27 + "[1m"
+    }
+
+    /**
+     * Turns text printing RED.
+     */
+    static text_colour_red() {
+        write "" + (char)27 + "[31m"
+    }
+
+    /**
+     * Turns text printing GREEN.
+     */
+    static text_colour_green() {
+        write "" + (char)27 + "[32m"
+    }
+
+    /**
+     * Returns text printing colour to normal (default).
+     */
+    static text_normal() {
+        write "" + (char)27 + "[39m" + (char)27 + "[0m"
+    }
+
+    /**
+     * Print an error message.
+     */
+    static err(String msg) {
+
+        text_colour_red()
+        writeln "|" + sprintf('%18s| %s', 'ERROR', msg)
+        text_normal()
+
+    }
 
 }
@@ -23,6 +23,10 @@
 class MediaChecker {
 
     final static String mediaTypesFile = 'MediaTypes.txt'
+    // Extensions of the files of a Squonk dataset, whose content
+    // can be validated (see DatasetValidator)
+    final static String datasetDataExt = '.data.gz'
+    final static String datasetMetadataExt = '.metadata'
 
     // A map of media type and expected file extension(s).
     // This is populated by the constructor, which reads the content
@@ -40,13 +44,15 @@ class MediaChecker {
     }
 
     /**
-     * Checks that a pipeline's expected files exist.
+     * Checks that a pipeline's expected files exist and, optionally,
+     * that the content of any datasets is valid.
      *
      * @param serviceDescriptor The test service descriptor
      * @param path The test path (where the pipeline's files are to be found)
+     * @param validate True to validate the content of datasets
      * @return True on success, False otherwise.
      */
-    boolean check(serviceDescriptor, File path) {
+    boolean check(serviceDescriptor, File path, boolean validate = false) {
 
         boolean retVal = true
 
@@ -63,6 +69,7 @@ class MediaChecker {
             } else {
                 // What are the expected file extensions for this media type?
                 // It's a list of 1 or more entries.
+                boolean found = true
                 typeExtList.each { extension ->
 
                     String opName = desc.name + extension
@@ -72,9 +79,26 @@ class MediaChecker {
                         Log.err("The pipeline's 'outputDescriptor'" +
                                 " expected '$opName' but the file wasn't found")
                         retVal = false
+                        found = false
                     }
 
                 }
+
+                // Validate dataset content?
+                if (validate && found &&
+                        typeExtList.contains(datasetDataExt) &&
+                        typeExtList.contains(datasetMetadataExt)) {
+                    String basePath = path.toString() + File.separator + desc.name
+                    DatasetValidator validator = new DatasetValidator()
+                    if (validator.validate(new File(basePath + datasetDataExt),
+                                           new File(basePath + datasetMetadataExt))) {
+                        Log.info('Media valid', "${desc.name}${datasetDataExt}" +
+                                 " ($validator.records records," +
+                                 " ${validator.recordsPerSecond()} records/s)")
+                    } else {
+                        retVal = false
+                    }
+                }
             }
 
         }
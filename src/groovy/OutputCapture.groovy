@@ -0,0 +1,362 @@
+#!/usr/bin/env groovy
+
+/**
+ * Copyright (c) 2019 Informatics Matters Ltd.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+import java.util.regex.Pattern
+
+/**
+ * The OutputCapture class. Collects the output (stdout or stderr) of a
+ * pipeline command with bounded memory. Output is kept in memory until it
+ * exceeds a limit, after which it is written (spilled) to a temporary file.
+ *
+ * The capture is given the (regular) expressions the test expects to see
+ * and matches them against each line as it arrives, so the output never
+ * has to be held in memory (or searched) in its entirety. Once all the
+ * expressions have been found lines are no longer matched.
+ *
+ * Expressions that can match across lines (those containing a line
+ * separator, '\n' or '\r', or the DOTALL flag, '(?s)') are instead matched
+ * against the whole output when the capture is closed. This is only possible
+ * while the output is within the memory limit, if it has been written to a
+ * temporary file they are not searched (see unsearched()).
+ */
+class OutputCapture extends OutputStream {
+
+    // Output beyond this (bytes) is written to a temporary file
+    final static int defaultMemoryLimit = 1024 * 1024
+    // Lines longer than this (bytes) are matched in pieces
+    final static int maxLineLength = 64 * 1024
+    // Time to allow the output to be drained once the process has finished
+    final static int drainSeconds = 5
+    // The line separator ('\n')
+    final static byte newline = 10
+    // Expressions that can match across lines
+    final static Pattern multiline = ~/\n|\\[nr]|\(\?[a-zA-Z]*s/
+
+    // The expressions (strings) and their compiled patterns
+    // that have yet to be found.
+    private final Map<String, Pattern> expected = [:]
+    // The expressions (and patterns) that are matched against
+    // the whole output (when the capture's closed).
+    private final Map<String, Pattern> expectedWhole = [:]
+    // Whole-output expressions that were not searched
+    // because the output exceeded the memory limit.
+    private final Set<String> unsearched = new HashSet<String>()
+    // The expressions that have been found
+    private final Set<String> found = new HashSet<String>()
+
+    private final int memoryLimit
+    private ByteArrayOutputStream memory = new ByteArrayOutputStream()
+    private File spillFile = null
+    private OutputStream spillStream = null
+    private long size = 0
+    private boolean closed = false
+    // The line being collected (for matching)
+    private ByteArrayOutputStream line = new ByteArrayOutputStream()
+
+    /**
+     * Creates a capture.
+     *
+     * @param expressions The (regular) expressions to look for
+     * @param memoryLimit The number of bytes kept in memory
+     */
+    OutputCapture(Collection expressions = [], int memoryLimit = defaultMemoryLimit) {
+
+        expressions.each { expression ->
+            String key = expression.toString()
+            if (spansLines(key)) {
+                expectedWhole[key] = Pattern.compile(key)
+            } else {
+                expected[key] = Pattern.compile(key)
+            }
+        }
+        this.memoryLimit = memoryLimit
+
+    }
+
+    @Override
+    synchronized void write(int b) {
+
+        byte[] buffer = [(byte)b]
+        write(buffer, 0, 1)
+
+    }
+
+    @Override
+    synchronized void write(byte[] b, int off, int len) {
+
+        if (closed) {
+            return
+        }
+        store(b, off, len)
+        if (expected) {
+            collectLines(b, off, len)
+        }
+
+    }
+
+    /**
+     * Finishes the capture, matching any final (unterminated) line.
+     * Anything written after the capture is closed is ignored.
+     */
+    @Override
+    synchronized void close() {
+
+        if (closed) {
+            return
+        }
+        closed = true
+        matchLine()
+        matchWholeOutput()
+        if (spillStream != null) {
+            spillStream.close()
+            spillStream = null
+        }
+
+    }
+
+    /**
+     * Returns true if the expression (given to the constructor)
+     * was found in the output.
+     */
+    synchronized boolean found(def expression) {
+
+        return found.contains(expression.toString())
+
+    }
+
+    /**
+     * Returns true if all the expressions have been found.
+     */
+    synchronized boolean allFound() {
+
+        return expected.isEmpty() && expectedWhole.isEmpty()
+
+    }
+
+    /**
+     * Returns the expressions that can match across lines but were not
+     * searched for because the output exceeded the memory limit.
+     */
+    synchronized Set<String> unsearched() {
+
+        return new HashSet<String>(unsearched)
+
+    }
+
+    /**
+     * Returns true if the expression can match across lines,
+     * and so has to be matched against the whole output.
+     */
+    static boolean spansLines(String expression) {
+
+        return multiline.matcher(expression).find()
+
+    }
+
+    /**
+     * Returns the number of bytes captured.
+     */
+    synchronized long size() {
+
+        return size
+
+    }
+
+    /**
+     * Returns true if the output has been written to a temporary file.
+     */
+    synchronized boolean spilled() {
+
+        return spillFile != null
+
+    }
+
+    /**
+     * Calls the closure with each line of the output,
+     * reading it from the temporary file if it's been spilled.
+     */
+    synchronized void eachLine(Closure closure) {
+
+        if (spillStream != null) {
+            spillStream.flush()
+        }
+        InputStream input = spillFile != null ?
+                new FileInputStream(spillFile) :
+                new ByteArrayInputStream(memory.toByteArray())
+        input.withReader('UTF-8') { reader ->
+            reader.eachLine { String text ->
+                closure(text)
+            }
+        }
+
+    }
+
+    /**
+     * Returns the output as a string. This reads all the output into memory,
+     * eachLine() should be used for output that might be large.
+     */
+    @Override
+    synchronized String toString() {
+
+        StringBuilder builder = new StringBuilder()
+        eachLine { String text ->
+            builder.append(text).append('\n')
+        }
+        return builder.toString()
+
+    }
+
+    /**
+     * Removes any temporary file.
+     */
+    synchronized void delete() {
+
+        close()
+        if (spillFile != null) {
+            spillFile.delete()
+            spillFile = null
+        }
+        memory = new ByteArrayOutputStream()
+
+    }
+
+    /**
+     * Starts threads that copy the stdout and stderr of a process
+     * to captures.
+     *
+     * @return The threads, to be passed to finish()
+     */
+    static List<Thread> consume(Process proc, OutputCapture sout, OutputCapture serr) {
+
+        return [proc.consumeProcessOutputStream(sout),
+                proc.consumeProcessErrorStream(serr)]
+
+    }
+
+    /**
+     * Waits (for a short time) for the threads started by consume()
+     * to copy any remaining output once the process has finished and then
+     * closes the captures. The wait is limited as the output may have been
+     * inherited by a process that's still running.
+     */
+    static void finish(List<Thread> threads, OutputCapture sout, OutputCapture serr) {
+
+        long deadline = System.currentTimeMillis() + drainSeconds * 1000
+        threads.each { Thread thread ->
+            long remaining = deadline - System.currentTimeMillis()
+            if (remaining > 0) {
+                thread.join(remaining)
+            }
+        }
+        sout.close()
+        serr.close()
+
+    }
+
+    private void store(byte[] b, int off, int len) {
+
+        size += len
+        if (spillStream == null && memory.size() + len > memoryLimit) {
+            spillFile = File.createTempFile('PipelineTester-', '.out')
+            spillFile.deleteOnExit()
+            spillStream = new BufferedOutputStream(new FileOutputStream(spillFile))
+            memory.writeTo(spillStream)
+            memory = new ByteArrayOutputStream()
+        }
+        if (spillStream != null) {
+            spillStream.write(b, off, len)
+        } else {
+            memory.write(b, off, len)
+        }
+
+    }
+
+    /**
+     * Splits the output into lines, matching each one as it's completed.
+     */
+    private void collectLines(byte[] b, int off, int len) {
+
+        int start = off
+        int end = off + len
+        for (int i = off; i < end && expected; i++) {
+            if (b[i] == newline) {
+                line.write(b, start, i - start)
+                matchLine()
+                start = i + 1
+            } else if (line.size() + i - start >= maxLineLength) {
+                line.write(b, start, i - start)
+                matchLine()
+                start = i
+            }
+        }
+        if (start < end && expected) {
+            line.write(b, start, end - start)
+        }
+
+    }
+
+    /**
+     * Matches the whole (in-memory) output against the expressions
+     * that can match across lines. If the output has been spilled
+     * they're recorded as unsearched.
+     */
+    private void matchWholeOutput() {
+
+        if (expectedWhole.isEmpty()) {
+            return
+        }
+        if (spillFile != null) {
+            unsearched.addAll(expectedWhole.keySet())
+            return
+        }
+        String text = memory.toString('UTF-8')
+        def matched = expectedWhole.findAll { key, pattern ->
+            pattern.matcher(text).find()
+        }
+        matched.keySet().each { key ->
+            expectedWhole.remove(key)
+            found.add(key)
+        }
+
+    }
+
+    /**
+     * Matches the collected line against the expressions
+     * that have not been found.
+     */
+    private void matchLine() {
+
+        if (line.size() == 0) {
+            return
+        }
+        String text = line.toString('UTF-8')
+        line.reset()
+        if (text.endsWith('\r')) {
+            text = text.take(text.length() - 1)
+        }
+        def matched = expected.findAll { key, pattern ->
+            pattern.matcher(text).find()
+        }
+        matched.keySet().each { key ->
+            expected.remove(key)
+            found.add(key)
+        }
+
+    }
+
+}
@@ -33,7 +33,7 @@ import org.apache.commons.cli.Option
 
 // Version
 // Update with every change/release
-String version = '2.7.0'
+String version = '2.13.0'
 
 println "+------------------+"
 println "|  PipelineTester  | v$version"
@@ -48,7 +48,21 @@ cli.with {
     k longOpt: 'keepoutput', "Keep execution output, even on failure"
     d longOpt: 'indocker', "Run tests using their container images"
     s longOpt: 'stoponerror', "Stop executing on the first test failure"
+    f longOpt: 'force', "Run every test, including those that have" +
+                " passed before and are unchanged"
+    c longOpt: 'reusecontainers', "Run the tests of each test file in" +
+                " one container per image (with --indocker)"
+    m longOpt: 'validatemedia', "Validate the content of the datasets" +
+                " written by the pipelines"
     h longOpt: 'help', "Print this message"
+    p longOpt: 'parallel', args: 1, argName: 'n',
+                "Run up to n tests at the same time"
+    _ longOpt: 'slow', args: 1, argName: 'fraction',
+                "Report tests that take longer than this fraction" +
+                " of their timeout (default 0.5)"
+    r longOpt: 'report', args: 1, argName: 'base',
+                "Base name of the JUnit-XML and JSON reports" +
+                " (default tmp/PipelineTester-report)"
     o longOpt: 'only', args: Option.UNLIMITED_VALUES, argName: 'directory',
                 valueSeparator: ',', "Comma-separated list of test directories"
 }
@@ -66,13 +80,35 @@ def only = []
 if (options.o) {
     only.addAll(options.os)
 }
+// Number of tests to run in parallel (1 if not specified)
+int parallel = 1
+if (options.p) {
+    parallel = options.p as int
+    if (parallel < 1) {
+        println "The parallel value must be 1 or more"
+        System.exit(1)
+    }
+}
+// Slow test threshold
+double slowFraction = 0.5
+if (options.slow) {
+    slowFraction = options.slow as double
+}
 // Create a Tester object
 // and run all the tests that have been discovered...
 Tester pipelineTester = new Tester(verbose:options.v,
                                    keepOutput:options.k,
                                    inDocker:options.d,
                                    stopOnError:options.s,
+                                   parallel:parallel,
+                                   slowFraction:slowFraction,
+                                   force:options.f,
+                                   reuseContainers:options.c,
+                                   validateMedia:options.m,
                                    onlySpec:only)
+if (options.r) {
+    pipelineTester.reportBase = options.r
+}
 boolean testResult = pipelineTester.run()
 
 // Leave with a non-zero exit code on failure...
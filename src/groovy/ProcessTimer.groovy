@@ -0,0 +1,76 @@
+#!/usr/bin/env groovy
+
+/**
+ * Copyright (c) 2019 Informatics Matters Ltd.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+import java.util.concurrent.TimeUnit
+
+/**
+ * Process timing utilities used by the executors.
+ */
+class ProcessTimer {
+
+    // Time allowed for a process to stop once it's been asked to
+    final static int stopSeconds = 5
+
+    /**
+     * Waits for a process to finish, killing it if it takes too long.
+     *
+     * @param proc The process
+     * @param timeoutSeconds The time to allow for the process to finish
+     * @return True if the process was killed because it took too long
+     */
+    static boolean waitFor(Process proc, int timeoutSeconds) {
+
+        if (proc.waitFor((long)timeoutSeconds, TimeUnit.SECONDS)) {
+            return false
+        }
+        // Ask it to stop (SIGTERM), and then insist...
+        proc.destroy()
+        if (!proc.waitFor((long)stopSeconds, TimeUnit.SECONDS)) {
+            proc.destroyForcibly()
+            proc.waitFor()
+        }
+        return true
+
+    }
+
+    /**
+     * Returns the total CPU time (user and system, of the shell and its
+     * children) from the output of the shell's 'times' command, which
+     * looks like this: -
+     *
+     *      0m0.004s 0m0.002s
+     *      0m1.231s 0m0.120s
+     *
+     * @param text The output of the 'times' command
+     * @return The CPU time in seconds (null if there are no times)
+     */
+    static Double parseTimes(String text) {
+
+        def matcher = text =~ /(\d+)m([\d.]+)s/
+        if (matcher.count == 0) {
+            return null
+        }
+        double seconds = 0
+        matcher.each { match ->
+            seconds += (match[1] as int) * 60 + (match[2] as double)
+        }
+        return seconds
+
+    }
+
+}
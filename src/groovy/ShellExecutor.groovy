@@ -35,20 +35,23 @@ class ShellExecutor {
      * @param pout The pipeline output directory
      *             (used to define the POUT environment variable)
      * @param timeoutSeconds The time to allow for the command to execute
-     * @return A list containing the STDOUT and STDERR encapsulated in a
-     *         StringBuilder(), an integer command exit code and a timeout
-     *         boolean (set if the program execution timed out)
+     * @param sout The capture for the command's STDOUT
+     * @param serr The capture for the command's STDERR
+     * @return A list containing the STDOUT and STDERR encapsulated in an
+     *         OutputCapture(), an integer command exit code, a timeout
+     *         boolean (set if the program execution timed out) and the
+     *         CPU time (seconds) used by the command (null if not known)
      */
     static execute(String command, File edir,
                    String pin, String pout,
-                   int timeoutSeconds) {
-
-        StringBuilder sout = new StringBuilder()
-        StringBuilder serr = new StringBuilder()
+                   int timeoutSeconds,
+                   OutputCapture sout = new OutputCapture(),
+                   OutputCapture serr = new OutputCapture()) {
 
         // Windows/Git-Bash PIN/POUT path tweak...
         def proc
         String cmd
+        File timesFile = null
         String osName = System.properties['os.name']
         if (osName && osName.startsWith('Win')) {
 
@@ -66,26 +69,27 @@ class ShellExecutor {
             // Everywhere else
 
             // Append '/' to PIN and POUT to allow '${POUT}output'
-            cmd = "PIN=$pin/; POUT=$pout/; PROOT=$edir; " + command
+            // The shell's 'times' (the CPU time used by the shell and
+            // its children) is written to a file when the shell exits.
+            timesFile = File.createTempFile('PipelineTester-', '.times')
+            cmd = "trap 'times > ${timesFile.getAbsolutePath()}' EXIT; " +
+                  "PIN=$pin/; POUT=$pout/; PROOT=$edir; " + command
             proc = ['sh', '-c', cmd].execute(null, edir)
 
         }
 
-        proc.consumeProcessOutput(sout, serr)
-        proc.waitForOrKill((long)timeoutSeconds * 1000)
+        def readers = OutputCapture.consume(proc, sout, serr)
+        boolean timeout = ProcessTimer.waitFor(proc, timeoutSeconds)
         int exitValue = proc.exitValue()
+        OutputCapture.finish(readers, sout, serr)
 
-        // Timeout?
-        //
-        // Some exit codes have a special meaning.
-        //
-        // We can, for example, assume that the process was killed
-        // if the exit code is 143 as 143, which is 128 + 15, means
-        // the program died with signal 15 (SIGTERM).
-        // See http://www.tldp.org/LDP/abs/html/exitcodes.html.
-        boolean timeout = exitValue == 143 ? true : false
+        Double cpuSeconds = null
+        if (timesFile != null) {
+            cpuSeconds = ProcessTimer.parseTimes(timesFile.text)
+            timesFile.delete()
+        }
 
-        return [sout, serr, exitValue, timeout]
+        return [sout, serr, exitValue, timeout, cpuSeconds]
 
     }
 
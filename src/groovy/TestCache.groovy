@@ -0,0 +1,238 @@
+#!/usr/bin/env groovy
+
+/**
+ * Copyright (c) 2019 Informatics Matters Ltd.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+import java.security.MessageDigest
+
+import groovy.io.FileType
+import groovy.json.JsonOutput
+import groovy.json.JsonSlurper
+
+/**
+ * The TestCache class. A record of the tests that have passed, keyed by
+ * a (SHA-256) hash of everything the test depends on: the files it uses,
+ * its command, the pipelines_utils module, the tester itself and
+ * (for tests run in Docker) the ID of the image.
+ * A test whose key is in the cache has passed before and, as nothing
+ * has changed, does not need to be run again.
+ */
+class TestCache {
+
+    final static String cachePath = System.getProperty('user.dir') +
+            File.separator + 'tmp' + File.separator + 'PipelineTester-cache.json'
+    // Prints the directory of the pipelines_utils module used by the pipelines
+    final static String locateModuleScript = 'import os, pipelines_utils;' +
+            ' print(os.path.dirname(os.path.abspath(pipelines_utils.__file__)))'
+    final static int bufferSize = 65536
+
+    // The cache entries, keyed by test key.
+    // Each entry is a map containing the test 'name'.
+    def entries = [:]
+    // A digest of the pipelines_utils module and the tester source
+    String environmentDigest = null
+    // The IDs of the Docker images (that are available), keyed by name
+    private final Map<String, String> imageIds = [:]
+
+    /**
+     * Default constructor.
+     * Reads any existing cache.
+     */
+    TestCache() {
+
+        File cacheFile = new File(cachePath)
+        if (cacheFile.exists()) {
+            try {
+                entries = new JsonSlurper().parse(cacheFile)
+            } catch (Exception ex) {
+                Log.err("Ignoring unreadable test cache (${ex.getMessage()})")
+            }
+        }
+
+        File testerDir = testerDirectory()
+        File moduleDir = pipelinesUtilsDirectory(testerDir)
+        MessageDigest md = MessageDigest.getInstance('SHA-256')
+        update(md, moduleDir == null ? 'missing' :
+                digestFiles(moduleDir, true) { File file ->
+                    file.name.endsWith('.py')
+                })
+        update(md, digestFiles(testerDir, false) { File file ->
+            file.name.endsWith('.groovy') || file.name.endsWith('.txt')
+        })
+        environmentDigest = md.digest().encodeHex().toString()
+
+    }
+
+    /**
+     * Returns the key for a test.
+     *
+     * @param testName The test's name
+     * @param files The files the test depends on
+     * @param values Other values the test depends on (i.e. its command)
+     * @return The key (a hex string)
+     */
+    String key(String testName, Collection<File> files, def values) {
+
+        MessageDigest md = MessageDigest.getInstance('SHA-256')
+        update(md, testName)
+        update(md, environmentDigest)
+        values.each { value ->
+            update(md, value.toString())
+        }
+        def paths = files.collect { it.getCanonicalPath() }.unique().sort()
+        paths.each { String path ->
+            update(md, path)
+            File file = new File(path)
+            update(md, file.isFile() ? digestFile(file) : 'missing')
+        }
+        return md.digest().encodeHex().toString()
+
+    }
+
+    /**
+     * Returns the ID of a Docker image, so a test's key changes when the
+     * image is rebuilt (even if its name and tag don't). IDs are looked up
+     * once, returning null if the image is not available (yet).
+     *
+     * @param imageName The image name (and tag)
+     */
+    synchronized String imageId(String imageName) {
+
+        String id = imageIds[imageName]
+        if (id == null) {
+            id = ContainerExecutor.imageId(imageName)
+            if (id != null) {
+                imageIds[imageName] = id
+            }
+        }
+        return id
+
+    }
+
+    /**
+     * Returns true if the test with the given key has passed before.
+     */
+    boolean passed(String key) {
+
+        return key != null && entries.containsKey(key)
+
+    }
+
+    /**
+     * Updates the cache with the results of the latest tests and writes it.
+     * Entries for tests that were run are replaced, those for tests that
+     * were not run are kept.
+     *
+     * @param results The list of test results (maps with a 'name',
+     *                'status' and 'cacheKey')
+     */
+    void save(def results) {
+
+        Set names = results.collect { it.name } as Set
+        Map updated = entries.findAll { key, entry -> !names.contains(entry.name) }
+        results.each { result ->
+            if (result.cacheKey && result.status in ['passed', 'cached']) {
+                updated[result.cacheKey] = [name: result.name]
+            }
+        }
+        File cacheFile = new File(cachePath)
+        cacheFile.getParentFile().mkdirs()
+        cacheFile.text = JsonOutput.prettyPrint(JsonOutput.toJson(updated))
+
+    }
+
+    /**
+     * Returns a digest (hex string) of the content of a file.
+     */
+    static String digestFile(File file) {
+
+        MessageDigest md = MessageDigest.getInstance('SHA-256')
+        file.eachByte(bufferSize) { byte[] buffer, int length ->
+            md.update(buffer, 0, length)
+        }
+        return md.digest().encodeHex().toString()
+
+    }
+
+    /**
+     * Returns the directory of the tester's source
+     * (found on the classpath), or the current directory.
+     */
+    private static File testerDirectory() {
+
+        URL source = TestCache.class.classLoader.getResource('TestCache.groovy')
+        if (source != null && source.protocol == 'file') {
+            return new File(source.toURI()).getParentFile()
+        }
+        return new File('.')
+
+    }
+
+    /**
+     * Returns the directory of the pipelines_utils module the pipelines
+     * use, the one Python imports or, if it's not installed, the source
+     * in this project (next to the tester). Returns null if neither exists.
+     */
+    private static File pipelinesUtilsDirectory(File testerDir) {
+
+        try {
+            def proc = ['python', '-c', locateModuleScript].execute()
+            StringBuilder out = new StringBuilder()
+            proc.waitForProcessOutput(out, new StringBuilder())
+            File installed = new File(out.toString().trim())
+            if (proc.exitValue() == 0 && installed.isDirectory()) {
+                return installed
+            }
+        } catch (IOException ex) {
+            // No Python
+        }
+        File source = new File(testerDir, '..' + File.separator + 'python' +
+                File.separator + 'pipelines_utils')
+        return source.isDirectory() ? source : null
+
+    }
+
+    /**
+     * Returns a digest of the names and content of the files
+     * in a directory that satisfy a filter.
+     */
+    private static String digestFiles(File directory, boolean recurse, Closure filter) {
+
+        if (!directory.isDirectory()) {
+            return 'missing'
+        }
+        def files = []
+        if (recurse) {
+            directory.eachFileRecurse(FileType.FILES) { files.add(it) }
+        } else {
+            directory.eachFile(FileType.FILES) { files.add(it) }
+        }
+        MessageDigest md = MessageDigest.getInstance('SHA-256')
+        files.findAll(filter).sort { it.path }.each { File file ->
+            update(md, file.path)
+            update(md, digestFile(file))
+        }
+        return md.digest().encodeHex().toString()
+
+    }
+
+    private static update(MessageDigest md, String value) {
+
+        md.update((value + '\n').getBytes('UTF-8'))
+
+    }
+
+}
@@ -21,9 +21,18 @@
 @Grab('org.yaml:snakeyaml:1.24')
 
 import java.nio.file.Files
+import java.util.concurrent.Callable
+import java.util.concurrent.ExecutorService
+import java.util.concurrent.Executors
+import java.util.concurrent.Future
+import java.util.concurrent.TimeUnit
+import java.util.concurrent.atomic.AtomicBoolean
 import java.util.regex.Pattern
 
+import groovy.json.JsonOutput
+import groovy.json.JsonSlurper
 import groovy.text.SimpleTemplateEngine
+import groovy.xml.MarkupBuilder
 
 import org.yaml.snakeyaml.Yaml
 
@@ -46,6 +55,19 @@ class Tester {
     boolean stopOnError = false
     boolean keepOutput = false
     def onlySpec = []
+    // The number of tests to run at the same time
+    int parallel = 1
+    // Run tests even if they've passed before and are unchanged
+    boolean force = false
+    // Validate the content of datasets written by the pipelines
+    boolean validateMedia = false
+    // Run the tests of each test file in re-usable containers
+    // (when running in docker)
+    boolean reuseContainers = false
+    // A test is slow if it takes longer than this fraction of its timeout
+    double slowFraction = 0.5
+    // The base name of the JUnit-XML (.xml) and JSON (.json) reports
+    String reportBase = defaultReportBase
 
     // Constants?
     int defaultTimeoutSeconds = 60
@@ -67,6 +89,17 @@ class Tester {
             File.separator + 'tmp' + File.separator + 'PipelineTester-out'
     final static String alternativeInputPath = System.getProperty('user.dir') +
             File.separator + 'tmp' + File.separator + 'PipelineTester-in'
+    final static String defaultReportBase = System.getProperty('user.dir') +
+            File.separator + 'tmp' + File.separator + 'PipelineTester-report'
+    // Durations of the tests that passed in prior runs
+    final static String historyPath = System.getProperty('user.dir') +
+            File.separator + 'tmp' + File.separator + 'PipelineTester-history.json'
+    // The number of durations kept for each test
+    final static int historySize = 10
+    // A test has regressed if it takes longer than this multiple
+    // of its (median) historical duration, and more than the minimum
+    final static double regressionFactor = 1.5
+    final static double regressionMinimumSeconds = 1.0
 
     // Controlled by setup sections
     int testTimeoutSeconds = defaultTimeoutSeconds
@@ -79,11 +112,36 @@ class Tester {
     int testsIgnored = 0
     int testsSkipped = 0
     int testsPassed = 0
+    int testsCached = 0
     int filesUsed = 0
     def failedTests = []
     def observedFiles = []
     // The set of directories (pipeline repos) that contained test files.
     Set observedDirectories = new HashSet()
+    // A map of the results of each test section found
+    // (its name, status, duration, etc.). See newResult().
+    def testResults = []
+    // A map of test name and list of prior durations (seconds)
+    def history = [:]
+    // Tests that have passed before (see TestCache)
+    TestCache testCache = null
+    // Re-usable containers (see ContainerSession)
+    ContainerSession containerSession = null
+
+    // Parallel execution.
+    // Tests are run by copies of this object (workers) on a pool of threads.
+    // The output of each test (and the output logged between tests) is
+    // captured and printed in the order the tests were found, along with
+    // the merged results of each test.
+    ExecutorService pool = null
+    // A list of maps, each with an 'output' (StringBuilder),
+    // the 'future' (null for output logged by the run() method)
+    // and a 'started' flag (set by the test, or when it's cancelled)
+    def pendingOutput = []
+    // Set when any worker has failed a test
+    volatile boolean workerFailed = false
+    // False for workers (which can't tell how other tests are doing)
+    boolean reportProgress = true
 
     // The service descriptor for the current test file...
     def currentServiceDescriptor = null
@@ -109,6 +167,9 @@ class Tester {
     // which is copied to env_pout.
     String test_pin = null
     String test_pout = null
+    // The directory for any alternative input files
+    // (a sub-directory of alternativeInputPath)
+    String testInputPath = null
     // The POUT environment variable (or null)
     // Set in the static initialiser.
     final static String env_pout
@@ -131,6 +192,11 @@ class Tester {
         Log.info('Tests', "Supporting test file versions: $supportedTestFileVersions")
         Log.info('Stop on error', stopOnError)
         Log.info('Keep output', keepOutput)
+        Log.info('Parallel', parallel)
+        Log.info('Validate media', validateMedia)
+        if (inDocker) {
+            Log.info('Reuse containers', reuseContainers)
+        }
         Log.info('OS Name', osName)
 
         // Only process some directories?
@@ -147,6 +213,23 @@ class Tester {
             cleanUpOutput()
         }
 
+        loadHistory()
+        testCache = new TestCache()
+
+        if (inDocker && reuseContainers) {
+            containerSession = new ContainerSession(
+                    outputRoot: env_pout ? env_pout : defaultOutputPath,
+                    inputRoot: alternativeInputPath)
+            // Don't leave containers running if we're interrupted
+            Runtime.getRuntime().addShutdownHook(new Thread({
+                containerSession.close()
+            }))
+        }
+
+        if (parallel > 1) {
+            startParallelTests()
+        }
+
         // Find all the potential test files
         String searchRoot = new File(testSearchDir).getCanonicalPath()
         def testFiles = new FileNameFinder().getFileNames(searchRoot, testFileSpec)
@@ -165,6 +248,13 @@ class Tester {
                 continue
             }
 
+            // Containers are re-used for the tests in a test file.
+            // When running in parallel tests of the previous file may still
+            // be running so the containers are kept until the end.
+            if (containerSession != null && parallel == 1) {
+                containerSession.close()
+            }
+
             // Add to our list of observed directories
             observedDirectories.add(testDir)
             currentTestDirectory = testDir
@@ -214,7 +304,7 @@ class Tester {
                         Log.err("Unsupported test script version ($section.value)." +
                                 " Expected value from choice of $supportedTestFileVersions")
                         Log.err("In $path")
-                        recordFailedTest("-")
+                        recordFailure("-", "Unsupported test script version ($section.value)")
                         break
                     }
 
@@ -224,7 +314,7 @@ class Tester {
                     if (testScriptVersion == 0) {
                         Log.separate()
                         Log.err('The file is missing its version definition')
-                        recordFailedTest("-")
+                        recordFailure("-", 'The file is missing its version definition')
                         break
                     }
 
@@ -235,38 +325,54 @@ class Tester {
                     } else if (section_key_lower.startsWith(testPrefix)) {
                         // Should we avoid this test?
                         if (!avoid(testDir, section_key_lower)) {
-                            processTest(path, section)
+                            if (parallel > 1) {
+                                submitTest(path, section)
+                            } else {
+                                processTest(path, section)
+                            }
                         }
                     } else if (section_key_lower.startsWith(ignorePrefix)) {
                         Log.separate()
                         logTest(path, section)
                         testsIgnored += 1
+                        newResult(section.key).status = 'ignored'
                         Log.info('Result', 'Ignored')
                     } else {
                         Log.separate()
                         Log.err("Unexpected section name ($section.key)" +
                                 " in the '${currentTestFilename}.test'")
-                        recordFailedTest(section_key_lower)
+                        recordFailure(section.key, "Unexpected section name ($section.key)")
                     }
 
-                    if (stopOnError && failedTests.size() > 0) {
+                    if (stopping()) {
                         break
                     }
 
                 }
 
-                if (stopOnError && failedTests.size() > 0) {
+                if (stopping()) {
                     break
                 }
 
             }
 
-            if (stopOnError && failedTests.size() > 0) {
+            if (stopping()) {
                 break
             }
 
         }
 
+        if (parallel > 1) {
+            finishParallelTests()
+        }
+        if (containerSession != null) {
+            containerSession.close()
+        }
+
+        writeReports()
+        saveHistory()
+        testCache.save(testResults)
+
         // Cleanup if successful.
         // We'll also cleanup again when we re-run.
         boolean testPassed = false
@@ -304,16 +410,33 @@ class Tester {
                 Log.info('Failed', name)
             }
         }
+        // List slow and regressed tests...
+        def slowTests = testResults.findAll { it.slow }
+        def regressedTests = testResults.findAll { it.regressed }
+        if (slowTests || regressedTests) {
+            Log.separate()
+            slowTests.each { result ->
+                Log.info('Slow', sprintf('%s (%.1fS)', result.name, result.seconds))
+            }
+            regressedTests.each { result ->
+                Log.info('Regressed', sprintf('%s (%.1fS)', result.name, result.seconds))
+            }
+        }
 
         Log.separate()
         int testsFailed = failedTests.size()
         Log.info('Test files', sprintf('%3s', filesUsed ? filesUsed : '-'))
         Log.info('Tests found', sprintf('%3s', numTestsFound ? numTestsFound : '-'))
         Log.info('Tests passed',sprintf('%3s', testsPassed ? testsPassed : '-'))
+        Log.info('Tests cached',sprintf('%3s', testsCached ? testsCached : '-'))
         Log.info('Tests failed', sprintf('%3s', testsFailed ? testsFailed : '-'))
         Log.info('Tests skipped', sprintf('%3s', testsSkipped ? testsSkipped : '-'))
         Log.info('Tests ignored', sprintf('%3s', testsIgnored ? testsIgnored : '-'))
         Log.info('Tests excluded', sprintf('%3s', numTestsExcluded ? numTestsExcluded : '-'))
+        Log.info('Tests slow', sprintf('%3s', slowTests ? slowTests.size() : '-'))
+        Log.info('Tests regressed', sprintf('%3s', regressedTests ? regressedTests.size() : '-'))
+        Log.separate()
+        Log.info('Report', reportBase + '.xml')
         Log.separate()
         if (testsFailed) {
             Log.info('Result', 'FAILURE')
@@ -381,6 +504,380 @@ class Tester {
 
     }
 
+    /**
+     * Returns true if testing should stop,
+     * i.e. we're stopping on error and a test has failed.
+     */
+    private boolean stopping() {
+
+        return stopOnError && (failedTests.size() > 0 || workerFailed)
+
+    }
+
+    /**
+     * Creates the thread pool for parallel tests and starts capturing
+     * the output of the run() method.
+     */
+    private startParallelTests() {
+
+        pool = Executors.newFixedThreadPool(parallel)
+        StringBuilder output = new StringBuilder()
+        pendingOutput.add([output: output, future: null])
+        Log.capture(output)
+
+    }
+
+    /**
+     * Creates a worker, a copy of this object with the state of the
+     * current test file, used to run a test in parallel with others.
+     */
+    private Tester createWorker() {
+
+        return new Tester(verbose: verbose,
+                          inDocker: inDocker,
+                          stopOnError: stopOnError,
+                          keepOutput: keepOutput,
+                          onlySpec: onlySpec,
+                          parallel: parallel,
+                          slowFraction: slowFraction,
+                          history: history,
+                          force: force,
+                          validateMedia: validateMedia,
+                          testCache: testCache,
+                          reuseContainers: reuseContainers,
+                          containerSession: containerSession,
+                          reportProgress: false,
+                          testTimeoutSeconds: testTimeoutSeconds,
+                          testScriptVersion: testScriptVersion,
+                          currentServiceDescriptor: currentServiceDescriptor,
+                          currentTestDirectory: currentTestDirectory,
+                          currentTestFilename: currentTestFilename,
+                          optionNames: optionNames.collect(),
+                          optionMinValues: optionMinValues.collect(),
+                          optionDefaults: new LinkedHashMap(optionDefaults),
+                          collectionCreates: collectionCreates.collect())
+
+    }
+
+    /**
+     * Submits a test to the thread pool. The test is run by a worker
+     * whose output is captured.
+     *
+     * @param path Full path to the test file
+     * @param section The test section
+     */
+    private submitTest(String path, def section) {
+
+        Tester worker = createWorker()
+        StringBuilder testOutput = new StringBuilder()
+        AtomicBoolean started = new AtomicBoolean(false)
+        Future future = pool.submit({
+            if (!started.compareAndSet(false, true)) {
+                // Cancelled before it started
+                return null
+            }
+            Log.capture(testOutput)
+            try {
+                worker.processTest(path, section)
+            } catch (Throwable ex) {
+                Log.err("Unexpected exception ($ex)")
+                worker.recordFailedTest(section.key)
+                // The test's result (if it got that far) has failed
+                Map result = worker.testResults ?
+                        worker.testResults[-1] : worker.newResult(section.key)
+                result.status = 'failed'
+                result.message = "Unexpected exception ($ex)".toString()
+            } finally {
+                Log.capture(null)
+            }
+            if (worker.failedTests) {
+                workerFailed = true
+            }
+            return worker
+        } as Callable)
+        pendingOutput.add([output: testOutput, future: future, started: started])
+
+        // Anything we log now follows the test
+        StringBuilder output = new StringBuilder()
+        pendingOutput.add([output: output, future: null])
+        Log.capture(output)
+
+        reportCompletedTests(false)
+
+    }
+
+    /**
+     * Prints the output of completed tests (and merges their results)
+     * in the order they were submitted.
+     *
+     * @param wait True to wait for all the tests to complete
+     */
+    private reportCompletedTests(boolean wait) {
+
+        while (pendingOutput) {
+            def entry = pendingOutput[0]
+            if (entry.future != null) {
+                if (!wait && !entry.future.isDone()) {
+                    break
+                }
+                Tester worker = entry.future.isCancelled() ? null : entry.future.get()
+                if (worker == null) {
+                    // Never started (we're stopping on error)
+                    pendingOutput.remove(0)
+                    continue
+                }
+                mergeResults(worker)
+            } else if (!wait && pendingOutput.size() == 1) {
+                // Output that's still being logged
+                break
+            }
+            print entry.output.toString()
+            pendingOutput.remove(0)
+        }
+
+    }
+
+    /**
+     * Adds the results of a worker's test to our own.
+     */
+    private mergeResults(Tester worker) {
+
+        numTestsFound += worker.numTestsFound
+        numTestsExcluded += worker.numTestsExcluded
+        testsSkipped += worker.testsSkipped
+        testsPassed += worker.testsPassed
+        testsCached += worker.testsCached
+        failedTests.addAll(worker.failedTests)
+        testResults.addAll(worker.testResults)
+
+    }
+
+    /**
+     * Waits for the parallel tests to complete, printing their output.
+     * If we're stopping on error tests that have not started are cancelled,
+     * tests that are running are allowed to finish. The pool is shut down
+     * (once all its tests have finished) before returning.
+     */
+    private finishParallelTests() {
+
+        if (stopping()) {
+            pendingOutput.each { entry ->
+                if (entry.future != null && entry.started.compareAndSet(false, true)) {
+                    entry.future.cancel(false)
+                }
+            }
+        }
+        Log.capture(null)
+        reportCompletedTests(true)
+        pool.shutdown()
+        pool.awaitTermination(Long.MAX_VALUE, TimeUnit.SECONDS)
+
+    }
+
+    /**
+     * Returns the files a test depends on. These are all the files in the
+     * test file's directory (the pipeline, its service descriptor and
+     * test file), files named in the command (relative to the execution
+     * directory), modules run with 'python -m' and input (PIN) files.
+     *
+     * Modules imported by the pipeline from elsewhere are not included,
+     * use the --force option if you change one.
+     *
+     * @param path Full path to the test file
+     * @param executeDir The test's execution directory (PROOT)
+     * @param pin The test's default input directory (PIN)
+     * @param command The test's (expanded) command
+     * @param inputBlock The user's input block definition (or null)
+     * @return A list of Files (some of which may not exist)
+     */
+    private testDependencies(String path, String executeDir, String pin,
+                             String command, def inputBlock) {
+
+        def files = []
+        new File(path).getParentFile().eachFile { file ->
+            if (file.isFile()) {
+                files.add(file)
+            }
+        }
+
+        String pinRef = '${PIN}'
+        String prootRef = '${PROOT}'
+        def tokens = command.tokenize(' \t\n\'"=;|<>')
+        tokens.eachWithIndex { String token, int i ->
+            if (token.contains(pinRef)) {
+                String name = token.substring(token.indexOf(pinRef) + pinRef.length())
+                if (inputBlock && inputBlock.containsKey(name)) {
+                    name = inputBlock[name]
+                }
+                files.add(new File(pin, name))
+            } else if (i > 0 && tokens[i - 1] == '-m') {
+                files.add(new File(executeDir, token.replace('.', File.separator) + '.py'))
+            } else {
+                File file = new File(executeDir, token.replace(prootRef, ''))
+                if (file.isFile()) {
+                    files.add(file)
+                }
+            }
+        }
+        return files
+
+    }
+
+    /**
+     * Creates the result of a test in the current test file, adding it
+     * to the list of results. The test is assumed to fail
+     * until it's shown otherwise.
+     *
+     * @param testName The test name (test section value).
+     * @return The result, a map
+     */
+    private Map newResult(testName) {
+
+        Map result = [name: "${currentTestDirectory}/${currentTestFilename}.${testName}".toString(),
+                      directory: currentTestDirectory,
+                      file: currentTestFilename,
+                      test: testName.toString(),
+                      status: 'failed',
+                      message: null,
+                      timeout: testTimeoutSeconds,
+                      seconds: null,
+                      cpuSeconds: null,
+                      slow: false,
+                      regressed: false,
+                      cacheKey: null]
+        testResults.add(result)
+        return result
+
+    }
+
+    /**
+     * Logs a test's duration, marking the result as slow if it took more
+     * than the slow fraction of its timeout and regressed if it took
+     * significantly longer than it has done in the past.
+     *
+     * @param result The test result (with its seconds and cpuSeconds)
+     */
+    private checkDuration(Map result) {
+
+        String duration = sprintf('%.2fS', result.seconds)
+        if (result.cpuSeconds != null) {
+            duration += sprintf(' (CPU %.2fS)', result.cpuSeconds)
+        }
+        Log.info('Duration', duration)
+
+        if (result.seconds > slowFraction * testTimeoutSeconds) {
+            result.slow = true
+            Log.info('Slow', sprintf('Yes (over %d%% of the %dS timeout)',
+                                     (int)(slowFraction * 100), testTimeoutSeconds))
+        }
+
+        def durations = history[result.name]
+        if (durations) {
+            double typical = median(durations)
+            if (result.seconds > regressionFactor * typical &&
+                    result.seconds - typical > regressionMinimumSeconds) {
+                result.regressed = true
+                Log.info('Regressed', sprintf('Yes (typically %.2fS)', typical))
+            }
+        }
+
+    }
+
+    /**
+     * Returns the median of a list of numbers.
+     */
+    private static double median(def values) {
+
+        def sorted = values.collect { it as double }.sort()
+        int middle = sorted.size().intdiv(2)
+        if (sorted.size() % 2) {
+            return sorted[middle]
+        }
+        return (sorted[middle - 1] + sorted[middle]) / 2
+
+    }
+
+    /**
+     * Loads the durations of tests that passed in earlier runs.
+     */
+    private loadHistory() {
+
+        File historyFile = new File(historyPath)
+        if (historyFile.exists()) {
+            try {
+                history = new JsonSlurper().parse(historyFile)
+            } catch (Exception ex) {
+                Log.err("Ignoring unreadable history file (${ex.getMessage()})")
+            }
+        }
+
+    }
+
+    /**
+     * Adds the durations of the tests that passed to the history,
+     * keeping the most recent durations of each test.
+     */
+    private saveHistory() {
+
+        Map updated = new LinkedHashMap(history)
+        testResults.each { result ->
+            if (result.status == 'passed' && result.seconds != null) {
+                def durations = (updated[result.name] ?: []).collect()
+                durations.add(result.seconds)
+                updated[result.name] = durations.takeRight(historySize)
+            }
+        }
+        File historyFile = new File(historyPath)
+        historyFile.getParentFile().mkdirs()
+        historyFile.text = JsonOutput.prettyPrint(JsonOutput.toJson(updated))
+
+    }
+
+    /**
+     * Writes the test results as a JUnit-XML and a JSON report.
+     */
+    private writeReports() {
+
+        File jsonFile = new File(reportBase + '.json')
+        if (jsonFile.getParentFile() != null) {
+            jsonFile.getParentFile().mkdirs()
+        }
+        jsonFile.text = JsonOutput.prettyPrint(JsonOutput.toJson(
+                [slowFraction: slowFraction,
+                 results: testResults]))
+
+        // JUnit-XML, with a test suite for each test file
+        def skippedStates = ['skipped', 'excluded', 'ignored']
+        def suites = testResults.groupBy { it.directory + '/' + it.file }
+        def writer = new StringWriter()
+        def xml = new MarkupBuilder(writer)
+        xml.testsuites(tests: testResults.size(),
+                       failures: testResults.count { it.status == 'failed' },
+                       time: sprintf('%.3f', testResults.sum { it.seconds ?: 0 } ?: 0)) {
+            suites.each { suiteName, results ->
+                testsuite(name: suiteName,
+                          tests: results.size(),
+                          failures: results.count { it.status == 'failed' },
+                          skipped: results.count { it.status in skippedStates },
+                          time: sprintf('%.3f', results.sum { it.seconds ?: 0 })) {
+                    results.each { result ->
+                        testcase(classname: suiteName.replace('/', '.'),
+                                 name: result.test,
+                                 time: sprintf('%.3f', result.seconds ?: 0)) {
+                            if (result.status == 'failed') {
+                                failure(message: result.message ?: 'Test failed')
+                            } else if (result.status in skippedStates) {
+                                skipped(message: result.status)
+                            }
+                        }
+                    }
+                }
+            }
+        }
+        new File(reportBase + '.xml').text = writer.toString()
+
+    }
+
     /**
      * Checks the file version supplied is supported.
      * If successful the `testScriptVersion` member is set.
@@ -429,16 +926,16 @@ class Tester {
     /**
      * Dumps the pipeline command's output, used when there's been an error.
      */
-    private dumpCommandError(StringBuilder errString) {
+    private dumpCommandError(OutputCapture errString) {
 
         Log.text_colour_red()
         Log.text_style_bold()
-        println "$dumpErrPrefix STDERR Follows..."
+        Log.writeln "$dumpErrPrefix STDERR Follows..."
         Log.text_normal()
 
         Log.text_colour_red()
-        errString.toString().split('\n').each { line ->
-            println "$dumpErrPrefix $line"
+        errString.eachLine { line ->
+            Log.writeln "$dumpErrPrefix $line"
         }
         Log.text_normal()
 
@@ -448,21 +945,35 @@ class Tester {
      * Dumps the pipeline command's output, used when the user's used '-v'.
      * It uses control-codes to change the text color (see Log.groovy).
      */
-    private dumpCommandOutput(StringBuilder outString) {
+    private dumpCommandOutput(OutputCapture outString) {
 
         Log.text_colour_green()
         Log.text_style_bold()
-        println "$dumpOutPrefix STDOUT Follows..."
+        Log.writeln "$dumpOutPrefix STDOUT Follows..."
         Log.text_normal()
 
         Log.text_colour_green()
-        outString.toString().split('\n').each { line ->
-            println "$dumpOutPrefix $line"
+        outString.eachLine { line ->
+            Log.writeln "$dumpOutPrefix $line"
         }
         Log.text_normal()
 
     }
 
+    /**
+     * Warns about expressions that span lines that could not be searched
+     * for because the command's output exceeded the capture's memory limit
+     * (they are only matched against the whole output when it's in memory).
+     */
+    private warnUnsearched(OutputCapture capture, String stream) {
+
+        capture.unsearched().each { expression ->
+            Log.info('Warning', "The $stream (${capture.size()} bytes) was" +
+                    " too large to search for '$expression' (which spans lines)")
+        }
+
+    }
+
     /**
      * Extracts the service descriptor option names and default values.
      * It automatically adds `minValue` and `maxValue` for ranges.
@@ -668,6 +1179,21 @@ class Tester {
 
     }
 
+    /**
+     * Records a failure that's found before a test is run (i.e. a problem
+     * with the test file), adding it to the failed tests and the results
+     * so that it's reported.
+     *
+     * @param testName The test name (test section value), '-' for the file
+     * @param message The reason for the failure
+     */
+    private recordFailure(testName, String message) {
+
+        recordFailedTest(testName)
+        newResult(testName).message = message
+
+    }
+
     /**
      * Logs key information about the current test.
      *
@@ -697,10 +1223,10 @@ class Tester {
 
         boolean success = true
 
-        // Create the 'alternative' input directory (after deleting it).
+        // Create the test's 'alternative' input directory (after deleting it).
         // Test files wil be copied/linked to here.
         destroyTestInputDataDir()
-        new File(alternativeInputPath).mkdir()
+        new File(testInputPath).mkdirs()
 
         // Link each test file (inputBlock.item.value) to the expected file
         // (inputBlock.item.key). The input will be in the
@@ -736,12 +1262,12 @@ class Tester {
             }
             // If all is still OK then link...
             if (success) {
-                File dst = new File(alternativeInputPath.toString() + File.separator + item.key)
+                File dst = new File(testInputPath + File.separator + item.key)
                 Files.createSymbolicLink(dst.toPath(), src.toPath())
             }
         }
 
-        return success ? alternativeInputPath : null
+        return success ? testInputPath : null
 
     }
 
@@ -750,7 +1276,7 @@ class Tester {
      */
     private destroyTestInputDataDir() {
 
-        new File(alternativeInputPath).deleteDir()
+        new File(testInputPath).deleteDir()
 
     }
 
@@ -816,6 +1342,7 @@ class Tester {
     def processTest(filename, section) {
 
         numTestsFound += 1
+        Map result = newResult(section.key)
 
         Log.separate()
         logTest(filename, section)
@@ -836,6 +1363,7 @@ class Tester {
                 Log.info('Excluding', exclusion)
                 // Increment the number of excluded tests
                 numTestsExcluded += 1
+                result.status = 'excluded'
                 return
             }
         }
@@ -848,9 +1376,11 @@ class Tester {
 
             if (currentServiceDescriptor == null) {
                 Log.err('Found "params" but there was no service descriptor file.')
+                result.message = 'No service descriptor'
                 recordFailedTest(section.key)
                 return
             } else if (!checkAllOptionsHaveBeenUsed(paramsBlock)) {
+                result.message = 'Invalid params'
                 recordFailedTest(section.key)
                 return
             }
@@ -889,6 +1419,7 @@ class Tester {
         if (inDocker && imageName == null) {
             Log.info('Skip', 'Yes')
             testsSkipped += 1
+            result.status = 'skipped'
             return
         }
 
@@ -911,7 +1442,34 @@ class Tester {
                 executeAnchorDirPos + executeAnchorDir.length()))
         File testExecutionDir = new File(executeDir)
 
+        // Tests run in parallel may have the same file and section name
+        // so the sub-directory includes the test directory.
         String testSubDir = "${currentTestFilename}-${section.key}"
+        if (parallel > 1) {
+            testSubDir = "${currentTestDirectory}-${testSubDir}"
+        }
+        testInputPath = alternativeInputPath + File.separator + testSubDir
+
+        // Has the test passed before?
+        // If nothing it depends on has changed there's no need to run it.
+        // In Docker the pipeline (and pipelines_utils) come from the image,
+        // so the key includes the image ID. If the image isn't available
+        // the test isn't cached (until it is).
+        String defaultPin = new File(executeDir, defaultInputPath).getCanonicalPath()
+        String imageId = imageName && inDocker ? testCache.imageId(imageName) : null
+        if (!imageName || !inDocker || imageId != null) {
+            result.cacheKey = testCache.key(result.name,
+                    testDependencies(filename, executeDir, defaultPin,
+                                     pipelineCommand, inputBlock),
+                    [pipelineCommand, imageName, imageId, inDocker,
+                     testTimeoutSeconds, osName, validateMedia])
+        }
+        if (!force && testCache.passed(result.cacheKey)) {
+            Log.info('Cached', 'Yes (passed before and unchanged)')
+            testsCached += 1
+            result.status = 'cached'
+            return
+        }
 
         // POUT is either set by the POUT environment variable or relative
         //      to the directory we've been executed from.
@@ -928,12 +1486,13 @@ class Tester {
         // If the user has defined an 'input' block in their test file
         // the test utility will create a temporary directory so that the
         // user's alternative input files can be linked safely into it.
-        test_pin = new File(executeDir, defaultInputPath).getCanonicalPath()
+        test_pin = defaultPin
         if (inputBlock) {
             // This call does some validation. If all looks well then
             // we'll get back a path. If there are problems we'll get null.
             test_pin = createTestInputData(test_pin, pipelineCommand, inputBlock)
             if (test_pin == null) {
+                result.message = 'Invalid input'
                 recordFailedTest(section.key)
                 return
             }
@@ -943,37 +1502,59 @@ class Tester {
         Log.info('Input path (PIN)', test_pin)
         Log.info('Output path (POUT)', test_pout)
 
-        if (numTestsFound > 1) {
+        if (reportProgress && numTestsFound > 1) {
             // Report on the current test status - has anything failed?
             String okSoFar = failedTests ? 'No' : 'Yes'
             Log.info('Testing OK so far', okSoFar)
         }
 
         // Execute the command, using the shell, giving it time to complete,
-        // while also collecting stdout & stderr
-        StringBuilder sout
-        StringBuilder serr
+        // while also collecting stdout & stderr. The output is matched
+        // against the expressions the test expects to see as it's collected.
+        def stdoutExprs = stdoutBlock.collect { escapeString(it) }
+        def stderrExprs = stderrBlock.collect { escapeString(it) }
+        if (exitErrorBlock != null) {
+            stderrExprs.add(escapeString(exitErrorBlock))
+        }
+        OutputCapture sout = new OutputCapture(stdoutExprs)
+        OutputCapture serr = new OutputCapture(stderrExprs)
         int exitValue
         boolean expectedExit    // If we got a non-zero exit but it was expected
         boolean timeout
+        Double cpuSeconds
+        long startNanos = System.nanoTime()
         if (imageName && inDocker) {
             Log.info('Docker', 'Yes')
-            (sout, serr, exitValue, timeout) =
-                    ContainerExecutor.execute(pipelineCommand,
-                            imageName, test_pin, test_pout, testTimeoutSeconds)
+            if (containerSession != null) {
+                (sout, serr, exitValue, timeout, cpuSeconds) =
+                        containerSession.execute(pipelineCommand,
+                                imageName, test_pin, test_pout, testTimeoutSeconds,
+                                sout, serr)
+            } else {
+                (sout, serr, exitValue, timeout, cpuSeconds) =
+                        ContainerExecutor.execute(pipelineCommand,
+                                imageName, test_pin, test_pout, testTimeoutSeconds,
+                                sout, serr)
+            }
 
         } else {
             Log.info('Docker', 'No')
-            (sout, serr, exitValue, timeout) =
+            (sout, serr, exitValue, timeout, cpuSeconds) =
                     ShellExecutor.execute(pipelineCommand,
-                            testExecutionDir, test_pin, test_pout, testTimeoutSeconds)
+                            testExecutionDir, test_pin, test_pout, testTimeoutSeconds,
+                            sout, serr)
 
         }
+        result.seconds = (double)(System.nanoTime() - startNanos) / 1000000000
+        result.cpuSeconds = cpuSeconds
+        checkDuration(result)
 
         // Dump pipeline output (written to stderr) if verbose
         if (verbose) {
             dumpCommandOutput(serr)
         }
+        warnUnsearched(sout, 'stdout')
+        warnUnsearched(serr, 'stderr')
 
         // Remove any temporary input directory
         // (created if the user defined an `input` block)
@@ -999,7 +1580,8 @@ class Tester {
             // Then we should check that the pipeline generated the
             // expected files using the MediaChecker.
             if (currentServiceDescriptor != null && command == null) {
-                validated = mediaChecker.check(currentServiceDescriptor, testOutputPath)
+                validated = mediaChecker.check(currentServiceDescriptor,
+                                               testOutputPath, validateMedia)
             }
 
             // Do we expect additional output files?
@@ -1031,9 +1613,7 @@ class Tester {
 
                 // Check that we see everything the test tells us to see.
                 stderrBlock.each { see ->
-                    String stderrExpr = escapeString(see)
-                    def finder = (serr =~ /$stderrExpr/)
-                    if (finder.count == 0) {
+                    if (!serr.found(escapeString(see))) {
                         Log.err("Expected to see '$see' but it was not in the command's stderr")
                         validated = false
                     }
@@ -1045,9 +1625,7 @@ class Tester {
                 // Check that we see everything the test tells us to see
                 // on the stdout stream.
                 stdoutBlock.each { see ->
-                    String stdoutExpr = escapeString(see)
-                    def finder = (sout =~ /$stdoutExpr/)
-                    if (finder.count == 0) {
+                    if (!sout.found(escapeString(see))) {
                         Log.err("Expected to see '$see' but it was not in the command's stdout")
                         validated = false
                     }
@@ -1097,9 +1675,7 @@ class Tester {
             } else {
                 // Otherwise, was an 'exit_error' defined for this test?
                 if (exitErrorBlock != null) {
-                    String stderrExpr = escapeString(exitErrorBlock)
-                    def finder = (serr =~ /$stderrExpr/)
-                    if (finder.count == 0) {
+                    if (!serr.found(escapeString(exitErrorBlock))) {
                         Log.err("Test failed." +
                                 " This was expected but did not see '$exitErrorBlock'" +
                                 " in the command's stderr")
@@ -1117,14 +1693,26 @@ class Tester {
         if (validated &&
             (exitValue == 0 || (exitValue != 0 && expectedExit) )) {
             testsPassed += 1
+            result.status = 'passed'
             Log.info('Result', 'SUCCESS')
         } else {
             // Test failed.
+            if (timeout) {
+                result.message = "Timed out (after ${testTimeoutSeconds}S)".toString()
+            } else if (exitValue != 0 && !expectedExit) {
+                result.message = "Exit value $exitValue".toString()
+            } else {
+                result.message = 'Output validation failed'
+            }
             dumpCommandOutput(sout)
             dumpCommandError(serr)
             recordFailedTest(section.key)
         }
 
+        // Remove any output written to temporary files
+        sout.delete()
+        serr.delete()
+
     }
 
     /**
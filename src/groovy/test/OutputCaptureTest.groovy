@@ -0,0 +1,95 @@
+#!/usr/bin/env groovy
+
+/**
+ * Copyright (c) 2019 Informatics Matters Ltd.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+/**
+ * Checks the OutputCapture. Run from this directory with the PipelineTester
+ * classes on the classpath: -
+ *
+ *   $ groovy -cp .. OutputCaptureTest.groovy
+ */
+
+// Writes text to a capture in small (arbitrary) pieces,
+// so lines are split across writes.
+def writeText = { OutputCapture capture, String text ->
+    byte[] bytes = text.getBytes('UTF-8')
+    for (int off = 0; off < bytes.length; off += 5) {
+        capture.write(bytes, off, Math.min(5, bytes.length - off))
+    }
+}
+
+// Expressions are matched line by line, including an unterminated last line
+def capture = new OutputCapture(['Cmax[ \\t]+0.42', 'done$', 'missing'])
+writeText(capture, 'Starting\r\nCmax   0.42 (mean)\nAll done')
+assert !capture.found('done$')
+capture.close()
+assert capture.found('Cmax[ \\t]+0.42')
+assert capture.found('done$')
+assert !capture.found('missing')
+assert !capture.allFound()
+assert !capture.spilled()
+assert capture.size() == 'Starting\r\nCmax   0.42 (mean)\nAll done'.length()
+assert capture.toString() == 'Starting\nCmax   0.42 (mean)\nAll done\n'
+// Writes after the capture is closed are ignored
+writeText(capture, 'More\n')
+assert capture.size() == 'Starting\r\nCmax   0.42 (mean)\nAll done'.length()
+
+// Expressions that span lines are matched against the whole output
+assert OutputCapture.spansLines('first\\nsecond')
+assert OutputCapture.spansLines('(?s)first.*second')
+assert OutputCapture.spansLines('\\(?s\\)first.*second')
+assert !OutputCapture.spansLines('first[ \\t]+second')
+assert !OutputCapture.spansLines('(?i)first')
+capture = new OutputCapture(['first\\nsecond', '(?s)first.*third', 'second'])
+writeText(capture, 'first\nsecond\nthird\n')
+capture.close()
+assert capture.allFound()
+assert capture.unsearched().isEmpty()
+
+// Output beyond the memory limit is written to a temporary file.
+// Line expressions are still found but whole-output ones are not searched.
+capture = new OutputCapture(['line 99$', 'line 1\\nline 2'], 64)
+(0..99).each { writeText(capture, "line $it\n") }
+capture.close()
+assert capture.spilled()
+assert capture.found('line 99$')
+assert !capture.found('line 1\\nline 2')
+assert capture.unsearched() == ['line 1\\nline 2'] as Set
+int lines = 0
+capture.eachLine { lines++ }
+assert lines == 100
+assert capture.toString().startsWith('line 0\nline 1\n')
+capture.delete()
+assert !capture.spilled()
+
+// Long lines are matched in pieces
+capture = new OutputCapture(['^x+$', 'y'])
+writeText(capture, 'x' * (OutputCapture.maxLineLength * 2) + 'y\n')
+capture.close()
+assert capture.allFound()
+
+// A process's output is consumed into the captures
+def proc = ['sh', '-c', 'echo out; echo err >&2'].execute()
+def sout = new OutputCapture(['^out$'])
+def serr = new OutputCapture(['^err$'])
+def threads = OutputCapture.consume(proc, sout, serr)
+proc.waitFor()
+OutputCapture.finish(threads, sout, serr)
+assert sout.allFound()
+assert serr.allFound()
+
+println 'OutputCapture checks passed'
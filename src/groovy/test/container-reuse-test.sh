@@ -0,0 +1,112 @@
+#!/bin/sh
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests the PipelineTester's re-usable containers (--reusecontainers)
+# using the fake docker command (fake-docker). A project with a test file
+# of four tests is created in a temporary directory and the PipelineTester
+# is run on it. The tests must all pass, having been run (with 'exec') in
+# a single container, each in a new (empty) output directory, and the
+# container must be removed at the end.
+#
+# Run from anywhere (it needs groovy): -
+#
+#   $ sh src/groovy/test/container-reuse-test.sh
+
+set -e
+
+here=$(cd "$(dirname "$0")" && pwd)
+groovy_dir=$(dirname "$here")
+root=$(mktemp -d)
+trap 'rm -rf "$root"' EXIT
+
+fail() {
+    echo "FAILED: $*" >&2
+    echo "--- docker commands ---" >&2
+    cat "$FAKE_DOCKER_LOG" >&2
+    exit 1
+}
+
+# The project: a service descriptor (for the image)
+# and a test file, whose tests each check their POUT is empty.
+tests=$root/project/src/pipelines/reuse
+mkdir -p "$root/project/data" "$tests"
+cat > "$tests/reuse.dsd.yml" <<'EOF'
+imageName: informaticsmatters/fake-pipeline
+command: 'true'
+serviceConfig:
+  optionDescriptors: []
+EOF
+cat > "$tests/reuse.test" <<'EOF'
+[
+    version = 1,
+
+    test_1 = [
+        command: '''test -z "$(ls -A ${POUT})" && echo 1 > ${POUT}section.txt''',
+        creates: [ 'section.txt' ]
+    ],
+
+    test_2 = [
+        command: '''test -z "$(ls -A ${POUT})" && echo 2 > ${POUT}section.txt''',
+        creates: [ 'section.txt' ]
+    ],
+
+    test_3 = [
+        command: '''test -z "$(ls -A ${POUT})" && echo 3 > ${POUT}section.txt''',
+        creates: [ 'section.txt' ]
+    ],
+
+    test_4 = [
+        command: '''echo "Expected failure" >&2; exit 3''',
+        exit_error: 'Expected failure'
+    ]
+]
+EOF
+
+unset PIN POUT
+export DOCKER=$here/fake-docker
+export FAKE_DOCKER_LOG=$root/docker.log
+export FAKE_DOCKER_STATE=$root/containers
+touch "$FAKE_DOCKER_LOG"
+
+# The PipelineTester looks for test files three directories
+# above the directory it's run from.
+# (The output directory isn't created when the output is kept.)
+run_dir=$root/run/a/b
+mkdir -p "$run_dir/tmp/PipelineTester-out"
+cd "$run_dir"
+groovy "$groovy_dir/PipelineTester.groovy" \
+    --indocker --reusecontainers --keepoutput --force \
+    || fail "the PipelineTester failed"
+
+runs=$(grep -c '^run ' "$FAKE_DOCKER_LOG" || true)
+detached=$(grep -c '^run --detach ' "$FAKE_DOCKER_LOG" || true)
+execs=$(grep -c '^exec ' "$FAKE_DOCKER_LOG" || true)
+removes=$(grep -c '^rm --force ' "$FAKE_DOCKER_LOG" || true)
+[ "$runs" -eq 1 ] && [ "$detached" -eq 1 ] \
+    || fail "expected 1 (detached) run, found $runs ($detached detached)"
+[ "$execs" -eq 4 ] || fail "expected 4 execs, found $execs"
+[ "$removes" -eq 1 ] || fail "expected 1 rm, found $removes"
+[ -z "$(ls -A "$FAKE_DOCKER_STATE")" ] || fail "a container was not removed"
+
+for section in 1 2 3; do
+    pout=$run_dir/tmp/PipelineTester-out/reuse-test_$section
+    [ "$(cat "$pout/section.txt")" = "$section" ] \
+        || fail "test_$section did not write its own POUT ($pout)"
+    grep -q "^exec -w /output/reuse-test_$section " "$FAKE_DOCKER_LOG" \
+        || fail "test_$section was not run in /output/reuse-test_$section"
+done
+
+echo "Container re-use test passed: 1 run, $execs execs, $removes rm"
@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Throughput benchmarks for the pipelines_utils readers and writers.
+
+Synthetic data is generated (in a temporary directory) for the configured
+number of rows, columns and record size and each component is then run in
+its own process, reporting records per second, MB per second (of the
+file read or written) and the process's peak RSS.
+
+Results can be saved as JSON (with the configuration) and compared with
+a previous run of the same configuration: -
+
+    python benchmark/bench_io.py --rows 100000 --save new.json
+    python benchmark/bench_io.py --rows 100000 --compare new.json
+
+Run it from the src/python directory.
+"""
+
+from __future__ import print_function
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Use the working copy's package rather than any installed version
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipelines_utils import BasicObjectWriter, MoleculeObjectWriter, \
+    SdfReader, SmilesReader, StreamJsonListLoader, TsvWriter, \
+    TypedColumnReader
+
+
+# -----------------------------------------------------------------------------
+# Synthetic data
+# -----------------------------------------------------------------------------
+
+def generate_values(rows, columns, record_size, seed=42):
+    """A generator of dictionaries of values. Columns cycle through
+    int, float and string types, the strings padded so that each
+    record is approximately record_size characters.
+    """
+    rng = random.Random(seed)
+    num_strings = max(1, columns // 3)
+    pad = 'x' * max(1, record_size // num_strings)
+    for row in range(rows):
+        values = OrderedDict()
+        for column in range(columns):
+            kind = column % 3
+            if kind == 0:
+                values['i%d' % column] = rng.randint(0, 1000000)
+            elif kind == 1:
+                values['f%d' % column] = rng.random() * 1000.0
+            else:
+                values['s%d' % column] = pad
+        yield values
+
+
+def column_header(columns):
+    """The typed (TypedColumnReader) header for the generated columns."""
+    names = []
+    for column in range(columns):
+        kind = column % 3
+        if kind == 0:
+            names.append('i%d:int' % column)
+        elif kind == 1:
+            names.append('f%d:float' % column)
+        else:
+            names.append('s%d' % column)
+    return names
+
+
+def _open(filename, compress, mode):
+    if compress:
+        return gzip.open(filename, mode + 't')
+    return open(filename, mode)
+
+
+def generate_files(directory, config):
+    """Writes the benchmark input files, returning a map of their names."""
+    ext = '.gz' if config['gzip'] else ''
+    files = {'json': os.path.join(directory, 'input.data' + ext),
+             'csv': os.path.join(directory, 'input.tsv' + ext),
+             'sdf': os.path.join(directory, 'input.sdf' + ext),
+             'smi': os.path.join(directory, 'input.smi' + ext)}
+    rows = config['rows']
+    columns = config['columns']
+    record_size = config['record_size']
+
+    out = _open(files['json'], config['gzip'], 'w')
+    writer = BasicObjectWriter.BasicObjectWriter(out)
+    writer.writeHeader()
+    for values in generate_values(rows, columns, record_size):
+        writer.write(values)
+    writer.writeFooter()
+    writer.close()
+
+    out = _open(files['csv'], config['gzip'], 'w')
+    out.write('\t'.join(column_header(columns)) + '\n')
+    for values in generate_values(rows, columns, record_size):
+        out.write('\t'.join(str(v) for v in values.values()) + '\n')
+    out.close()
+
+    molblock = ('mol\n  bench\n\n'
+                '  2  1  0  0  0  0  0  0  0  0999 V2000\n'
+                '    0.0000    0.0000    0.0000 C   0  0\n'
+                '    1.5000    0.0000    0.0000 O   0  0\n'
+                '  1  2  1  0\n'
+                'M  END\n')
+    out = _open(files['sdf'], config['gzip'], 'w')
+    for values in generate_values(rows, columns, record_size):
+        out.write(molblock)
+        for name, value in values.items():
+            out.write('>  <%s>\n%s\n\n' % (name, value))
+        out.write('$$$$\n')
+    out.close()
+
+    out = _open(files['smi'], config['gzip'], 'w')
+    for row, values in enumerate(generate_values(rows, columns, record_size)):
+        out.write('CCO\tm%d\t%s\n'
+                  % (row, '\t'.join(str(v) for v in values.values())))
+    out.close()
+
+    return files
+
+
+# -----------------------------------------------------------------------------
+# Benchmarks
+# Each returns the number of records processed and the file it used
+# -----------------------------------------------------------------------------
+
+def bench_stream_json_list_loader(files, directory, config):
+    stream = _open(files['json'], config['gzip'], 'r')
+    loader = StreamJsonListLoader.StreamJsonListLoader(stream)
+    count = 0
+    for _ in loader:
+        count += 1
+    loader.close()
+    return count, files['json']
+
+
+def bench_typed_column_reader(files, directory, config):
+    stream = _open(files['csv'], config['gzip'], 'r')
+    reader = TypedColumnReader.TypedColumnReader(stream)
+    count = 0
+    for _ in reader:
+        count += 1
+    stream.close()
+    return count, files['csv']
+
+
+def bench_sdf_reader(files, directory, config):
+    reader = SdfReader.SdfReader(files['sdf'])
+    count = 0
+    for _ in reader:
+        count += 1
+    reader.close()
+    return count, files['sdf']
+
+
+def bench_smiles_reader(files, directory, config):
+    reader = SmilesReader.SmilesReader(files['smi'], column_sep='\t')
+    count = 0
+    for _ in reader:
+        count += 1
+    reader.close()
+    return count, files['smi']
+
+
+def bench_basic_object_writer(files, directory, config):
+    filename = os.path.join(directory, 'output.data.gz'
+                            if config['gzip'] else 'output.data')
+    writer = BasicObjectWriter.BasicObjectWriter(
+        _open(filename, config['gzip'], 'w'))
+    writer.writeHeader()
+    count = 0
+    for values in generate_values(config['rows'], config['columns'],
+                                  config['record_size']):
+        writer.write(values)
+        count += 1
+    writer.writeFooter()
+    writer.close()
+    return count, filename
+
+
+def bench_molecule_object_writer(files, directory, config):
+    filename = os.path.join(directory, 'output.mols.gz'
+                            if config['gzip'] else 'output.mols')
+    writer = MoleculeObjectWriter.MoleculeObjectWriter(
+        _open(filename, config['gzip'], 'w'))
+    writer.writeHeader()
+    count = 0
+    for values in generate_values(config['rows'], config['columns'],
+                                  config['record_size']):
+        writer.write('CCO', 'smiles', values)
+        count += 1
+    writer.writeFooter()
+    writer.close()
+    return count, filename
+
+
+def bench_tsv_writer(files, directory, config):
+    filename = os.path.join(directory, 'output.tsv.gz'
+                            if config['gzip'] else 'output.tsv')
+    header = OrderedDict()
+    for name in column_header(config['columns']):
+        header[name.split(':')[0]] = name
+    writer = TsvWriter.TsvWriter(_open(filename, config['gzip'], 'w'), header)
+    writer.writeHeader()
+    count = 0
+    for values in generate_values(config['rows'], config['columns'],
+                                  config['record_size']):
+        writer.write(values)
+        count += 1
+    writer.close()
+    return count, filename
+
+
+BENCHMARKS = OrderedDict([
+    ('StreamJsonListLoader', bench_stream_json_list_loader),
+    ('TypedColumnReader', bench_typed_column_reader),
+    ('SdfReader', bench_sdf_reader),
+    ('SmilesReader', bench_smiles_reader),
+    ('BasicObjectWriter', bench_basic_object_writer),
+    ('MoleculeObjectWriter', bench_molecule_object_writer),
+    ('TsvWriter', bench_tsv_writer),
+])
+
+
+def _peak_rss_mb():
+    """The peak RSS of this process (in MB), or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    if sys.platform == 'darwin':
+        return peak / 1e6
+    return peak / 1e3
+
+
+def _run_benchmark(name, files, directory, config, queue):
+    """Runs a benchmark (in a child process), posting its results."""
+    start = time.time()
+    count, filename = BENCHMARKS[name](files, directory, config)
+    elapsed = max(time.time() - start, 1e-9)
+    size_mb = os.path.getsize(filename) / 1e6
+    queue.put({'records': count,
+               'seconds': round(elapsed, 4),
+               'records_per_s': round(count / elapsed, 1),
+               'mb_per_s': round(size_mb / elapsed, 3),
+               'file_mb': round(size_mb, 3),
+               'peak_rss_mb': _peak_rss_mb()})
+
+
+def run(config, names):
+    """Generates the data and runs the named benchmarks,
+    each in a separate process so that peak RSS is measured per component.
+    """
+    directory = tempfile.mkdtemp(prefix='pipelines-utils-bench-')
+    try:
+        files = generate_files(directory, config)
+        results = OrderedDict()
+        for name in names:
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=_run_benchmark,
+                                              args=(name, files, directory,
+                                                    config, queue))
+            process.start()
+            results[name] = queue.get()
+            process.join()
+            print('%22s %10.0f records/s %8.2f MB/s %8s MB peak RSS'
+                  % (name, results[name]['records_per_s'],
+                     results[name]['mb_per_s'],
+                     results[name]['peak_rss_mb']))
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def compare(results, config, previous):
+    """Prints the ratio of the current and previous records per second.
+    Runs are only compared if they used the same configuration.
+
+    :returns: False if the configurations differ (nothing is compared)
+    """
+    previous_config = previous.get('config', {})
+    differences = ['%s (%s, now %s)' % (name, previous_config.get(name), value)
+                   for name, value in config.items()
+                   if previous_config.get(name) != value]
+    if differences:
+        print('Not comparing runs with a different configuration: %s'
+              % ', '.join(differences), file=sys.stderr)
+        return False
+    if previous.get('python') != platform.python_version():
+        print('Warning: comparing with a run using Python %s'
+              % previous.get('python'), file=sys.stderr)
+    print('%22s %10s %10s %7s' % ('Component', 'Previous', 'Current', 'Ratio'))
+    for name, result in results.items():
+        before = previous.get('results', {}).get(name)
+        if not before or not before['records_per_s']:
+            continue
+        print('%22s %10.0f %10.0f %7.2f'
+              % (name, before['records_per_s'], result['records_per_s'],
+                 result['records_per_s'] / before['records_per_s']))
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='pipelines_utils I/O'
+                                                 ' benchmarks')
+    parser.add_argument('--rows', type=int, default=100000,
+                        help='Number of records')
+    parser.add_argument('--columns', type=int, default=6,
+                        help='Number of value columns')
+    parser.add_argument('--record-size', type=int, default=100,
+                        help='Approximate size of the string values'
+                             ' in each record (characters)')
+    parser.add_argument('--gzip', action='store_true',
+                        help='Compress the files')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS),
+                        help='Only run the named benchmarks')
+    parser.add_argument('--save', help='Save the results to a JSON file')
+    parser.add_argument('--compare', help='Compare with a saved JSON file')
+    args = parser.parse_args()
+
+    config = OrderedDict([('rows', args.rows),
+                          ('columns', args.columns),
+                          ('record_size', args.record_size),
+                          ('gzip', args.gzip)])
+    print('Config: %s' % json.dumps(config))
+    results = run(config, args.only or list(BENCHMARKS))
+
+    report = OrderedDict([('config', config),
+                          ('python', platform.python_version()),
+                          ('created', time.strftime('%Y-%m-%dT%H:%M:%S')),
+                          ('results', results)])
+    if args.save:
+        with open(args.save, 'w') as save_file:
+            json.dump(report, save_file, indent=2)
+    if args.compare:
+        with open(args.compare) as previous_file:
+            if not compare(results, config, json.load(previous_file)):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
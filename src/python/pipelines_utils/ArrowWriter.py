@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Columnar (Parquet and Arrow IPC) output.
+
+Writes records as the columns of a Parquet (``.parquet``) or Arrow IPC
+(``.arrow``) file, which analysis tools can read a column at a time.
+Records are collected into batches of columns, each of which is written
+as a record batch (Arrow) or row group (Parquet). The writer needs the
+``pyarrow`` module (``pip install im-pipelines-utils[arrow]``).
+
+The schema has a ``uuid`` column followed by the record's values. The type
+of each value column is taken from the ``valueClassMappings`` (the Java
+classes used in the Squonk metadata) or, if it has no mapping, from the
+values in the first batch. As a later batch may have floats, an integer
+column without a mapping is written as float64. A column without a mapping
+that has no values in the first batch is of the (Arrow) null type, so
+optional values should be given a mapping.
+
+The schema can't change once it's written, so a value that doesn't match
+its column's type raises a ValueError, as does a value first found after
+the first batch (unless the ``fieldNames`` are given, when values that
+are not among them are not written).
+"""
+
+import uuid
+from collections import OrderedDict
+
+from . import instrumentation
+
+# The supported formats and their file extensions
+FORMATS = {'parquet': 'parquet', 'arrow': 'arrow'}
+# The default number of records in a batch
+DEFAULT_BATCH_SIZE = 65536
+# The compression used for each format (when compressed)
+_COMPRESSION = {'parquet': 'snappy', 'arrow': 'lz4'}
+# Java value classes and their Arrow types (by pyarrow function name)
+_ARROW_TYPES = {'java.lang.Boolean': 'bool_',
+                'java.lang.Integer': 'int64',
+                'java.lang.Long': 'int64',
+                'java.lang.Float': 'float64',
+                'java.lang.Double': 'float64',
+                'java.lang.String': 'string'}
+
+
+def _pyarrow():
+    """Imports pyarrow, raising an ImportError that explains
+    it's needed if it's not installed.
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('The parquet and arrow formats require'
+                          ' the pyarrow module')
+    return pyarrow
+
+
+class ArrowWriter(object):
+    """Writes records (dictionaries of values) to a Parquet
+    or Arrow IPC file.
+    """
+
+    def __init__(self, filename, outputFormat='parquet', fieldNames=None,
+                 valueClassMappings=None, compress=True,
+                 batchSize=DEFAULT_BATCH_SIZE, stats=None):
+        """Basic initialiser.
+
+        :param filename: The output file
+        :param outputFormat: 'parquet' or 'arrow'
+        :param fieldNames: The names of the value columns, in order
+                           (i.e. a list or the keys of an OrderedDict). If
+                           None they're the values of the first batch,
+                           in the order they're found.
+        :param valueClassMappings: A dict of the Java class of the values,
+                                   used to define the column types
+        :param compress: Set to compress the columns (Parquet files with
+                         snappy and Arrow files with LZ4)
+        :param batchSize: The number of records in each batch
+        :param stats: An optional DatasetStats object. Values are added to it
+                      as they're written and it's written (along with the
+                      Squonk metadata) when the writer is closed.
+        """
+        if outputFormat not in FORMATS:
+            raise ValueError("Unsupported format: " + str(outputFormat))
+        if batchSize < 1:
+            raise ValueError('batchSize must be 1 or more')
+        self.pa = _pyarrow()
+        self.filename = filename
+        self.outputFormat = outputFormat
+        self.fieldNames = list(fieldNames) if fieldNames is not None else None
+        self.valueClassMappings = valueClassMappings or {}
+        self.compress = compress
+        self.batchSize = batchSize
+        self.stats = stats
+        # The number of records written
+        self.count = 0
+        self.schema = None
+        self._writer = None
+        # The value fields of the schema
+        self._fields = None
+        # The current batch, its uuids and (value) columns
+        self._uuids = []
+        self._columns = OrderedDict((name, []) for name in
+                                    self.fieldNames or [])
+        self._batched = 0
+        self._recorder = instrumentation.recorder('ArrowWriter')
+
+    def writeHeader(self):
+        """Provided for compatibility with the other writers,
+        the schema is written with the first batch.
+        """
+        pass
+
+    def writeFooter(self):
+        """Provided for compatibility with the other writers,
+        the footer is written when the writer is closed.
+        """
+        pass
+
+    def write(self, dictOfValues, objectUUID=None):
+        """Adds a record to the current batch,
+        writing the batch if it's full.
+
+        :param dictOfValues: The record's values
+        :param objectUUID: Optional uuid. One is generated if not provided.
+        """
+        columns = self._columns
+        if self.fieldNames is None:
+            for name in dictOfValues:
+                if name not in columns and name != 'uuid':
+                    if self.schema is not None:
+                        raise ValueError("The value '%s' is not in the"
+                                         " schema (it's not in the first"
+                                         " batch)" % name)
+                    columns[name] = [None] * self._batched
+        self._uuids.append(objectUUID if objectUUID else str(uuid.uuid4()))
+        for name, column in columns.items():
+            column.append(dictOfValues.get(name))
+        self._batched += 1
+        if self.stats is not None:
+            self.stats.add(dictOfValues)
+        if self._batched >= self.batchSize:
+            self._write_batch()
+
+    def close(self):
+        """Writes any remaining records, closes the file
+        and writes the metadata (and metrics).
+        """
+        if self._batched or self._writer is None:
+            self._write_batch()
+        self._writer.close()
+        if self._recorder is not None:
+            self._recorder.flush()
+        if self.stats is not None:
+            self.stats.write()
+
+    def _create_schema(self):
+        """Creates the schema (from the first batch)."""
+        pa = self.pa
+        self._fields = []
+        for name, column in self._columns.items():
+            java_class = self.valueClassMappings.get(name)
+            if java_class in _ARROW_TYPES:
+                arrow_type = getattr(pa, _ARROW_TYPES[java_class])()
+            else:
+                values = [value for value in column if value is not None]
+                arrow_type = pa.array(values).type if values else pa.null()
+                if pa.types.is_integer(arrow_type):
+                    arrow_type = pa.float64()
+            self._fields.append(pa.field(name, arrow_type))
+        self.schema = pa.schema([pa.field('uuid', pa.string())] +
+                                self._fields)
+
+        compression = _COMPRESSION[self.outputFormat] if self.compress \
+            else None
+        if self.outputFormat == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self.filename, self.schema,
+                                            compression=compression or 'none')
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=compression)
+            self._writer = pa.ipc.new_file(self.filename, self.schema,
+                                           options=options)
+
+    def _write_batch(self):
+        """Writes the current batch."""
+        if self.schema is None:
+            self._create_schema()
+        recorder = self._recorder
+        if recorder is not None:
+            start = instrumentation.clock()
+        pa = self.pa
+        arrays = [pa.array(self._uuids, type=pa.string())]
+        for field in self._fields:
+            column = self._columns[field.name]
+            if pa.types.is_null(field.type) and \
+                    any(value is not None for value in column):
+                raise ValueError("'%s' has no values in the first batch so"
+                                 " its type is unknown, give its type in the"
+                                 " valueClassMappings (i.e. java.lang.Float)"
+                                 % field.name)
+            try:
+                if pa.types.is_integer(field.type):
+                    # pyarrow truncates floats
+                    _check_integers(column)
+                arrays.append(pa.array(column, type=field.type))
+            except (pa.ArrowException, OverflowError, TypeError,
+                    ValueError) as ex:
+                raise ValueError("The values of '%s' don't match its type"
+                                 " (%s): %s" % (field.name, field.type, ex))
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if self.outputFormat == 'parquet':
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+        if recorder is not None:
+            recorder.add('write_seconds', instrumentation.clock() - start)
+            recorder.add('records', self._batched)
+        self.count += self._batched
+        self._uuids = []
+        self._columns = OrderedDict((field.name, [])
+                                    for field in self._fields)
+        self._batched = 0
+
+
+def _check_integers(values):
+    """Raises a ValueError if any of the values is a (non-integral) float."""
+    for value in values:
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError('%r is not an integer' % value)
@@ -16,20 +16,38 @@
 
 import uuid, json
 
+from . import instrumentation
+
 class BasicObjectWriter():
 
-    def __init__(self, file):
+    def __init__(self, file, stats=None, lines=False):
+        """Basic initialiser.
+
+        :param file: The output file (a filename or open file)
+        :param stats: An optional DatasetStats object. Values are added to it
+                      as they're written and it's written when the writer
+                      is closed.
+        :param lines: Write line-delimited JSON (one object per line,
+                      without the enclosing list) rather than a JSON list.
+                      Such files can be appended to and split, and are read
+                      with the JsonLinesReader.
+        """
         if type(file) == str:
             self.file = open(file, 'w')
         else:
             self.file = file
+        self.stats = stats
         self.count = 0
+        self.lines = lines
+        self._recorder = instrumentation.recorder('BasicObjectWriter')
 
     def writeHeader(self):
-        self.file.write('[')
+        if not self.lines:
+            self.file.write('[')
 
     def writeFooter(self):
-        self.file.write(']')
+        if not self.lines:
+            self.file.write(']')
 
     def write(self, dictOfValues, objectUUID=None):
 
@@ -41,12 +59,49 @@ class BasicObjectWriter():
             d['uuid'] = str(uuid.uuid4())
 
         d['values'] = dictOfValues
+        if self.stats is not None:
+            self.stats.add(dictOfValues)
+        recorder = self._recorder
+        if recorder is not None:
+            start = instrumentation.clock()
         json_str = json.dumps(d)
-        if self.count > 0:
+        if recorder is not None:
+            encoded = instrumentation.clock()
+        if self.lines:
+            json_str += '\n'
+        elif self.count > 0:
             self.file.write(',\n')
         self.file.write(json_str)
+        if recorder is not None:
+            recorder.add('encode_seconds', encoded - start)
+            recorder.add('write_seconds', instrumentation.clock() - encoded)
+            recorder.add('records')
+            recorder.add('chars', len(json_str))
         self.count += 1
 
+    def get_state(self):
+        """Returns the writer's state, used to checkpoint it
+        (see Checkpoint).
+        """
+        return {'count': self.count,
+                'stats': self.stats.get_state() if self.stats else None}
+
+    def set_state(self, state):
+        """Restores the state returned by get_state(). The header
+        is considered written.
+        """
+        self.count = state['count']
+        if self.stats is not None and state['stats'] is not None:
+            self.stats.set_state(state['stats'])
+
     def close(self):
+        recorder = self._recorder
+        if recorder is not None:
+            start = instrumentation.clock()
         if self.file:
             self.file.close()
+        if recorder is not None:
+            recorder.add('close_seconds', instrumentation.clock() - start)
+            recorder.flush()
+        if self.stats is not None:
+            self.stats.write()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checkpointed, resumable processing.
+
+A long-running pipeline records, at regular intervals, how far it has got
+through its input (the number of records processed and, optionally, the
+reader's byte offset) along with the state of its writers and the size of
+their output files. If the pipeline is restarted it resumes from the last
+checkpoint: output files are truncated to their checkpointed size
+(discarding anything written after it) and the writers continue from
+where they were, so the finished output is a valid dataset.
+
+Output files are opened with ``open_output()``. Compressed output is
+written as a series of members (gzip), streams or frames, one being
+completed at each checkpoint, so a file truncated at a checkpoint is
+a valid compressed file. A typical pipeline looks like this::
+
+    checkpoint = Checkpoint(outputBase)
+    writer, _ = utils.create_simple_writer(outputBase, None, 'json', None,
+                                           checkpoint=checkpoint)
+    if not checkpoint.resuming:
+        writer.writeHeader()
+    reader = SdfReader(inputFile, start=checkpoint.input_offset)
+    records = checkpoint.records
+    for record in reader:
+        writer.write(process(record))
+        records += 1
+        checkpoint.update(records, input_offset=record.offset + 1)
+    writer.writeFooter()
+    writer.close()
+    checkpoint.complete()
+
+Readers that cannot start at an offset can use ``skip()`` to skip the
+records that have already been processed.
+"""
+
+import io
+import itertools
+import json
+import os
+import time
+
+from . import compression_utils
+
+# The extension of the checkpoint file (added to the output base name)
+CHECKPOINT_EXT = '.checkpoint'
+# The default number of records between checkpoints
+DEFAULT_INTERVAL = 10000
+# The default time (seconds) between checkpoints
+DEFAULT_SECONDS = 60
+
+_VERSION = 1
+
+
+class CheckpointFile(object):
+    """A text output file whose content can be committed. Compressed files
+    (whose names end with a codec's extension, i.e. '.gz') are written as
+    a series of members (or streams), each being completed when the file
+    is committed. The file is opened when it is first written to.
+    """
+
+    def __init__(self, filename, size=None, encoding='utf-8', level=None):
+        """Basic initialiser.
+
+        :param filename: The file
+        :param size: The (committed) size to truncate an existing file to.
+                     If None (or 0) any existing file is replaced.
+        :param encoding: The encoding of the file's content
+        :param level: The compression level (of a compressed file)
+        """
+        self.filename = filename
+        self.encoding = encoding
+        self.level = level
+        self._codec = compression_utils.codec_for_filename(filename)
+        self._file = None
+        if not size:
+            open(filename, 'wb').close()
+        else:
+            if not os.path.exists(filename) or \
+                    os.path.getsize(filename) < size:
+                raise ValueError('The output file %s is shorter than its'
+                                 ' checkpoint (%d bytes)' % (filename, size))
+            with open(filename, 'r+b') as existing:
+                existing.truncate(size)
+
+    def write(self, text):
+        if self._file is None:
+            if self._codec is not None:
+                self._file = self._codec.open(self.filename, 'at',
+                                              level=self.level,
+                                              encoding=self.encoding)
+            else:
+                self._file = io.open(self.filename, 'a',
+                                     encoding=self.encoding)
+        self._file.write(text)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def commit(self):
+        """Completes everything written so far (finishing the current
+        member of a compressed file) and returns the size of the file.
+
+        :returns: The committed size of the file (bytes)
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        return os.path.getsize(self.filename)
+
+    def close(self):
+        self.commit()
+
+
+class Checkpoint(object):
+    """Records the progress of a pipeline and the state of its writers
+    so that it can be resumed (see the module documentation).
+    """
+
+    def __init__(self, outputBase, interval=DEFAULT_INTERVAL,
+                 seconds=DEFAULT_SECONDS):
+        """Basic initialiser. Reads any existing checkpoint.
+
+        :param outputBase: The output base name. The checkpoint is written
+                           to a file with this name and a
+                           '.checkpoint' extension.
+        :param interval: The number of records between checkpoints
+        :param seconds: The time between checkpoints (None for no limit)
+        """
+        self.filename = outputBase + CHECKPOINT_EXT
+        self.interval = interval
+        self.seconds = seconds
+        # The last checkpoint (None if there isn't one)
+        self.state = None
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r') as checkpoint_file:
+                self.state = json.load(checkpoint_file)
+            if self.state.get('version') != _VERSION:
+                raise ValueError('Unsupported checkpoint file (%s)'
+                                 % self.filename)
+        # True if the pipeline is resuming from a checkpoint
+        self.resuming = self.state is not None
+        self._writers = []
+        self._last_records = self.records
+        self._last_time = time.time()
+
+    @property
+    def records(self):
+        """The number of records processed at the last checkpoint
+        (0 if there isn't one)."""
+        return self.state['records'] if self.state else 0
+
+    @property
+    def input_offset(self):
+        """The input offset recorded at the last checkpoint (0 if there
+        isn't one or no offset was recorded)."""
+        if self.state and self.state.get('input_offset') is not None:
+            return self.state['input_offset']
+        return 0
+
+    @property
+    def values(self):
+        """Any additional values saved with the checkpoint."""
+        return self.state.get('values', {}) if self.state else {}
+
+    def open_output(self, filename, encoding='utf-8', level=None):
+        """Opens an output file. If resuming the file is truncated to its
+        checkpointed size, otherwise it is replaced.
+
+        :param filename: The output file
+        :param encoding: The encoding of the file's content
+        :param level: The compression level (of a compressed file)
+        :returns: A CheckpointFile
+        """
+        size = None
+        if self.state:
+            output = self.state['outputs'].get(filename)
+            size = output['size'] if output else 0
+        return CheckpointFile(filename, size=size, encoding=encoding,
+                              level=level)
+
+    def track(self, writer):
+        """Adds a writer to the checkpoint. The writer's file must have
+        been opened with ``open_output()``. If resuming, the writer's
+        state is restored.
+
+        :param writer: A writer, with get_state() and set_state() methods
+        """
+        self._writers.append(writer)
+        if self.state:
+            output = self.state['outputs'].get(writer.file.filename)
+            if output:
+                writer.set_state(output['writer'])
+
+    def skip(self, iterable):
+        """Returns an iterator over the iterable without the records
+        processed before the checkpoint.
+        """
+        return itertools.islice(iterable, self.records, None)
+
+    def update(self, records, input_offset=None, **values):
+        """Saves a checkpoint if enough records have been processed,
+        or enough time has passed, since the last one.
+
+        :param records: The number of (input) records processed
+        :param input_offset: The offset to resume reading the input from
+        :param values: Additional (JSON-serialisable) values to save
+        :returns: True if a checkpoint was saved
+        """
+        if records - self._last_records >= self.interval or \
+                (self.seconds is not None and
+                 time.time() - self._last_time >= self.seconds):
+            self.save(records, input_offset, **values)
+            return True
+        return False
+
+    def save(self, records, input_offset=None, **values):
+        """Saves a checkpoint. The output of every writer is committed
+        before the checkpoint is written.
+
+        :param records: The number of (input) records processed
+        :param input_offset: The offset to resume reading the input from
+        :param values: Additional (JSON-serialisable) values to save
+        """
+        outputs = {}
+        for writer in self._writers:
+            writer_state = writer.get_state()
+            outputs[writer.file.filename] = {'size': writer.file.commit(),
+                                             'writer': writer_state}
+        state = {'version': _VERSION,
+                 'records': records,
+                 'input_offset': input_offset,
+                 'outputs': outputs,
+                 'values': values}
+        # Write to a temporary file and then replace the checkpoint
+        # so there's always a complete checkpoint
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'w') as checkpoint_file:
+            json.dump(state, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        if hasattr(os, 'replace'):
+            os.replace(tmp_filename, self.filename)
+        else:
+            # Python 2
+            if os.path.exists(self.filename):
+                os.remove(self.filename)
+            os.rename(tmp_filename, self.filename)
+        self.state = state
+        self._last_records = records
+        self._last_time = time.time()
+
+    def complete(self):
+        """Removes the checkpoint, called when the pipeline has finished
+        (and its writers have been closed).
+        """
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        self.state = None
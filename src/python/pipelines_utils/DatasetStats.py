@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Dataset statistics.
+
+Statistics gathered by the writers as records are written so that
+complete Squonk metadata (the dataset size, value class mappings and
+numeric field ranges) and metrics can be written when the writer is
+closed, without a second pass over the output.
+"""
+
+from . import utils
+
+# Java value classes for the Python types we recognise.
+# Fields with a mixture of int and float values are Floats,
+# any other mixture is treated as a String.
+JAVA_VALUE_CLASSES = {bool: 'java.lang.Boolean',
+                      int: 'java.lang.Integer',
+                      float: 'java.lang.Float',
+                      str: 'java.lang.String'}
+_NUMERIC_TYPES = (int, float)
+# Types (by name) restored by set_state(). Others become strings.
+_STATE_TYPES = {'bool': bool, 'int': int, 'float': float, 'str': str}
+
+
+class DatasetStats(object):
+    """Collects the number of records written along with the types,
+    null counts and the numeric range of each of the record's values.
+    """
+
+    def __init__(self, outputBase=None, metadata=True, metrics=True,
+                 thinOutput=True,
+                 valueClassMappings=None, datasetMetaProps=None,
+                 fieldMetaProps=None):
+        """Basic initialiser.
+
+        :param outputBase: Base name for the metadata and metrics files.
+                           If None nothing is written on close.
+        :param metadata: Set to write the Squonk metadata on close
+        :param metrics: Set to write the metrics on close
+        :param thinOutput: True for BasicObject, False for MoleculeObject
+                           datasets (see write_squonk_datasetmetadata())
+        :param valueClassMappings: User-defined value class mappings,
+                                   which take precedence over those
+                                   derived from the values
+        :param datasetMetaProps: A dict with dataset metadata properties
+        :param fieldMetaProps: A list of dicts with field metadata
+        """
+        self.outputBase = outputBase
+        self.metadata = metadata
+        self.metrics_enabled = metrics
+        self.thinOutput = thinOutput
+        self.valueClassMappings = valueClassMappings
+        self.datasetMetaProps = datasetMetaProps
+        self.fieldMetaProps = fieldMetaProps
+
+        self.count = 0
+        # Per-field sets of observed types, number of non-null values
+        # and numeric minimum and maximum values
+        self._types = {}
+        self._present = {}
+        self._min = {}
+        self._max = {}
+
+    def add(self, values):
+        """Adds a record's values (a dictionary) to the statistics.
+        Fields that are missing from the record, or are None, are
+        counted as nulls.
+        """
+        self.count += 1
+        if not values:
+            return
+        types = self._types
+        present = self._present
+        mins = self._min
+        maxs = self._max
+        for name, value in values.items():
+            if value is None:
+                continue
+            value_type = type(value)
+            field_types = types.get(name)
+            if field_types is None:
+                types[name] = set([value_type])
+                present[name] = 1
+            else:
+                if value_type not in field_types:
+                    field_types.add(value_type)
+                present[name] += 1
+            if value_type in _NUMERIC_TYPES:
+                if name not in mins:
+                    mins[name] = value
+                    maxs[name] = value
+                elif value < mins[name]:
+                    mins[name] = value
+                elif value > maxs[name]:
+                    maxs[name] = value
+
+    def get_state(self):
+        """Returns the statistics as a (JSON-serialisable) dictionary,
+        used to checkpoint a writer (see Checkpoint).
+        """
+        return {'count': self.count,
+                'types': dict((name, sorted(t.__name__ for t in field_types))
+                              for name, field_types in self._types.items()),
+                'present': dict(self._present),
+                'min': dict(self._min),
+                'max': dict(self._max)}
+
+    def set_state(self, state):
+        """Restores statistics returned by get_state()."""
+        self.count = state['count']
+        self._types = dict((name, set(_STATE_TYPES.get(t, str) for t in names))
+                           for name, names in state['types'].items())
+        self._present = dict(state['present'])
+        self._min = dict(state['min'])
+        self._max = dict(state['max'])
+
+    def null_count(self, name):
+        """Returns the number of records without a value for the field."""
+        return self.count - self._present.get(name, 0)
+
+    def value_class_mappings(self):
+        """Returns the Java value class of each field, derived from the
+        types of the values observed and updated with any user-defined
+        mappings.
+        """
+        mappings = {}
+        for name, field_types in self._types.items():
+            if len(field_types) == 1:
+                mappings[name] = JAVA_VALUE_CLASSES.get(next(iter(field_types)),
+                                                        'java.lang.String')
+            elif field_types.issubset(_NUMERIC_TYPES):
+                mappings[name] = JAVA_VALUE_CLASSES[float]
+            else:
+                mappings[name] = JAVA_VALUE_CLASSES[str]
+        if self.valueClassMappings:
+            mappings.update(self.valueClassMappings)
+        return mappings
+
+    def field_meta_props(self):
+        """Returns the field metadata. The minimum, maximum and null count
+        of every numeric field is added to any user-defined properties
+        (user-defined values take precedence).
+        """
+        field_props = {}
+        for name in sorted(self._min):
+            field_props[name] = {'min': self._min[name],
+                                 'max': self._max[name],
+                                 'nullCount': self.null_count(name)}
+        user_props = []
+        for props in self.fieldMetaProps or []:
+            name = props.get('fieldName')
+            if name in field_props:
+                field_props[name].update(props.get('values', {}))
+            else:
+                user_props.append(props)
+        return user_props + [{'fieldName': name, 'values': values}
+                             for name, values in sorted(field_props.items())]
+
+    def metrics(self):
+        """Returns a dictionary of metrics."""
+        return {'__OutputCount__': self.count}
+
+    def write(self):
+        """Writes the metadata and metrics (if there's an output base name).
+        """
+        if not self.outputBase:
+            return
+        if self.metadata:
+            utils.write_squonk_datasetmetadata(self.outputBase,
+                                               self.thinOutput,
+                                               self.value_class_mappings(),
+                                               self.datasetMetaProps,
+                                               self.field_meta_props(),
+                                               size=self.count)
+        if self.metrics_enabled:
+            utils.update_metrics(self.outputBase, self.metrics())
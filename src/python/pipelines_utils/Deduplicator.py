@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Streaming deduplication.
+
+Drops records whose key (i.e. their uuid or SMILES) has already been seen,
+keeping the first, before they're written. Keys are not kept, only a
+(16-byte) hash of each, and there are two modes:
+
+*   ``exact`` keeps the hashes in memory until they reach a memory budget
+    and then moves them to a set of (sorted) partition files on disk, which
+    are searched for the keys that follow. Each move only writes the hashes
+    that were in memory, as new files that are merged with earlier ones of
+    a similar size, so the hashes are rewritten only a few times. A record is only dropped if its
+    key has the same hash as an earlier one (the chance of two different
+    keys having the same hash is negligible).
+*   ``approximate`` uses a Bloom filter, a fixed-size array of bits sized
+    for an expected number of records and a false-positive rate. It never
+    uses any more memory (or any disk) but some unique records, in
+    proportion to the false-positive rate, are dropped.
+
+When closed the number of duplicates dropped is written to the metrics
+file (as ``__DuplicateCount__``)::
+
+    dedup = Deduplicator(outputBase, key_field='uuid')
+    for record in dedup.filter(records):
+        writer.write(record['values'], objectUUID=record['uuid'])
+    dedup.close()
+"""
+
+import contextlib
+import hashlib
+import math
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+from . import utils
+
+# The supported modes
+MODES = ['exact', 'approximate']
+# The default memory budget (bytes)
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024
+# The default false-positive rate of the approximate mode
+DEFAULT_ERROR_RATE = 0.001
+# The metric (the number of duplicates dropped)
+DUPLICATES_METRIC = '__DuplicateCount__'
+
+# The size of a key's hash (bytes)
+_HASH_SIZE = 16
+# The (approximate) memory used by each hash held in memory (bytes)
+_BYTES_PER_HASH = 100
+# The number of (exact mode) partitions (by the first byte of the hash)
+_PARTITIONS = 256
+# A partition's newest run is merged with the run before it
+# unless that's more than this many times its size
+_MERGE_RATIO = 2
+
+
+def key_hash(value):
+    """Returns the hash of a key value (as bytes)."""
+    if not isinstance(value, bytes):
+        if not isinstance(value, type(u'')):
+            value = str(value)
+        value = value.encode('utf-8')
+    return hashlib.sha1(value).digest()[:_HASH_SIZE]
+
+
+class BloomFilter(object):
+    """A Bloom filter, a set of hashes that may report that a hash has
+    been added when it hasn't (at the false-positive rate given the
+    expected number of hashes) but never the opposite.
+    """
+
+    def __init__(self, capacity, error_rate=DEFAULT_ERROR_RATE):
+        """Basic initialiser.
+
+        :param capacity: The expected number of (unique) hashes
+        :param error_rate: The false-positive rate (when holding
+                           the expected number of hashes)
+        """
+        if capacity < 1:
+            raise ValueError('capacity must be 1 or more')
+        if not 0 < error_rate < 1:
+            raise ValueError('error_rate must be between 0 and 1')
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # The number of bits and (bit positions) per hash
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate)
+                                             / math.log(2) ** 2)))
+        self.num_positions = max(1, int(round(float(self.num_bits) / capacity
+                                              * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def add(self, digest):
+        """Adds a hash (of at least 16 bytes).
+
+        :returns: True if the hash (probably) had already been added
+        """
+        bits = self.bits
+        found = True
+        for position in self._positions(digest):
+            byte = position >> 3
+            mask = 1 << (position & 7)
+            if not bits[byte] & mask:
+                found = False
+                bits[byte] |= mask
+        return found
+
+    def __contains__(self, digest):
+        bits = self.bits
+        for position in self._positions(digest):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def _positions(self, digest):
+        """Returns the bit positions of a hash (using double hashing)."""
+        h1, h2 = struct.unpack('>QQ', digest[:16])
+        h2 |= 1
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in range(self.num_positions)]
+
+
+class _Run(object):
+    """A (memory-mapped) file of sorted, fixed-width hashes."""
+
+    __slots__ = ['filename', 'file', 'data']
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, digest):
+        start = _search(self.data, digest) * _HASH_SIZE
+        return self.data[start:start + _HASH_SIZE] == digest
+
+    def close(self, remove=False):
+        self.data.close()
+        self.file.close()
+        if remove:
+            os.remove(self.filename)
+
+
+class _HashStore(object):
+    """An exact set of hashes. Hashes are held in memory until there are
+    more than a maximum number of them. They're then written, sorted, as a
+    new run of each partition (so a spill only writes the hashes that were
+    in memory). The runs of a partition are binary-searched. When a run is
+    not much smaller than the one before it the two are merged, so there
+    are only a few (of decreasing size) and each hash is rewritten only a
+    few (log2 of the number of spills) times.
+    """
+
+    def __init__(self, max_hashes, tmp_dir=None):
+        self.max_hashes = max_hashes
+        self.tmp_dir = tmp_dir
+        self._memory = set()
+        self._dir = None
+        # The runs of each partition, oldest (and largest) first
+        self._runs = [[] for _ in range(_PARTITIONS)]
+        # The number of run files written (used to name them)
+        self._files_written = 0
+
+    @property
+    def spills(self):
+        """True if hashes have been moved to disk."""
+        return self._dir is not None
+
+    def add(self, digest):
+        """Adds a hash.
+
+        :returns: True if the hash had already been added
+        """
+        if digest in self._memory or self._on_disk(digest):
+            return True
+        self._memory.add(digest)
+        if len(self._memory) > self.max_hashes:
+            self._spill()
+        return False
+
+    def _on_disk(self, digest):
+        """Searches the runs of the hash's partition."""
+        for run in self._runs[ord(digest[0:1])]:
+            if digest in run:
+                return True
+        return False
+
+    def _spill(self):
+        """Writes the hashes in memory as new runs of the partitions."""
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix='pipelines-dedup-',
+                                         dir=self.tmp_dir)
+        partitions = [[] for _ in range(_PARTITIONS)]
+        for digest in self._memory:
+            partitions[ord(digest[0:1])].append(digest)
+        self._memory = set()
+        for number, digests in enumerate(partitions):
+            if digests:
+                digests.sort()
+                runs = self._runs[number]
+                with self._new_run() as (filename, run_file):
+                    run_file.write(b''.join(digests))
+                runs.append(_Run(filename))
+                while len(runs) > 1 and \
+                        len(runs[-2]) <= _MERGE_RATIO * len(runs[-1]):
+                    newer = runs.pop()
+                    runs.append(self._merge(runs.pop(), newer))
+
+    def _merge(self, older, newer):
+        """Merges two runs into a new run, removing them."""
+        old = older.data
+        with self._new_run() as (filename, run_file):
+            # Both are sorted (and there are no common hashes)
+            start = 0
+            for offset in range(0, len(newer), _HASH_SIZE):
+                digest = newer.data[offset:offset + _HASH_SIZE]
+                end = _search(old, digest) * _HASH_SIZE
+                run_file.write(old[start:end])
+                run_file.write(digest)
+                start = end
+            run_file.write(old[start:])
+        older.close(remove=True)
+        newer.close(remove=True)
+        return _Run(filename)
+
+    @contextlib.contextmanager
+    def _new_run(self):
+        """Opens a new run file, yielding its name and the (open) file."""
+        self._files_written += 1
+        filename = os.path.join(self._dir, '%08d' % self._files_written)
+        with open(filename, 'wb') as run_file:
+            yield filename, run_file
+
+    def close(self):
+        self._memory = set()
+        for runs in self._runs:
+            for run in runs:
+                run.close()
+            del runs[:]
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+
+def _search(data, digest):
+    """Returns the position of the first hash in sorted (fixed-width)
+    hashes that is not less than a hash.
+    """
+    low = 0
+    high = len(data) // _HASH_SIZE
+    while low < high:
+        middle = (low + high) // 2
+        start = middle * _HASH_SIZE
+        if data[start:start + _HASH_SIZE] < digest:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+class Deduplicator(object):
+    """Drops records with a key that has already been seen
+    (see the module documentation).
+    """
+
+    def __init__(self, outputBase=None, key_field='uuid', mode='exact',
+                 max_memory=DEFAULT_MAX_MEMORY, capacity=None,
+                 error_rate=DEFAULT_ERROR_RATE, tmp_dir=None):
+        """Basic initialiser.
+
+        :param outputBase: The output base name, used to write the number of
+                           duplicates to the metrics file when closed.
+                           If None no metrics are written.
+        :param key_field: The name of the key (looked for in the record and
+                          then in its 'values') or a function that returns
+                          a record's key. Records without a key are kept.
+        :param mode: 'exact' or 'approximate'
+        :param max_memory: The (approximate) memory, in bytes, used to hold
+                           the hashes of keys in the exact mode, or the size
+                           of the Bloom filter if no capacity is given in the
+                           approximate mode.
+        :param capacity: The expected number of unique records
+                         (approximate mode)
+        :param error_rate: The rate at which unique records are dropped
+                           (approximate mode)
+        :param tmp_dir: The directory used for partition files
+                        (the system default if None)
+        """
+        if mode not in MODES:
+            raise ValueError('Unsupported mode: ' + str(mode))
+        self.outputBase = outputBase
+        self.key_field = key_field
+        self.mode = mode
+        # The number of records (with a key) seen and the number dropped
+        self.count = 0
+        self.duplicates = 0
+        if mode == 'exact':
+            self._store = _HashStore(max(1, max_memory // _BYTES_PER_HASH),
+                                     tmp_dir=tmp_dir)
+        else:
+            if capacity is None:
+                # The most that can be held in max_memory at the error rate
+                bits_per_hash = -math.log(error_rate) / math.log(2) ** 2
+                capacity = max(1, int(max_memory * 8 / bits_per_hash))
+            self._store = BloomFilter(capacity, error_rate)
+
+    def key(self, record):
+        """Returns a record's key (None if it has none)."""
+        if callable(self.key_field):
+            return self.key_field(record)
+        value = record.get(self.key_field)
+        if value is None:
+            values = record.get('values')
+            if isinstance(values, dict):
+                value = values.get(self.key_field)
+        return value
+
+    def is_duplicate(self, value):
+        """Adds a key value, returning True if it has already been seen
+        (it's counted as a duplicate).
+        """
+        self.count += 1
+        if self._store.add(key_hash(value)):
+            self.duplicates += 1
+            return True
+        return False
+
+    def filter(self, records):
+        """Returns a generator of the records whose key hasn't been seen.
+
+        :param records: An iterable of records (dictionaries)
+        """
+        for record in records:
+            value = self.key(record)
+            if value is None or not self.is_duplicate(value):
+                yield record
+
+    def close(self):
+        """Releases any partition files and writes the number of
+        duplicates to the metrics file.
+        """
+        if self.mode == 'exact':
+            self._store.close()
+        if self.outputBase is not None:
+            utils.update_metrics(self.outputBase,
+                                 {DUPLICATES_METRIC: self.duplicates})
+
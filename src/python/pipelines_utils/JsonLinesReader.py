@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Line-delimited JSON (NDJSON) reader.
+
+Reads files written by the BasicObjectWriter in its ``lines`` mode, where
+each record is a JSON object on its own line. Unlike a JSON list the file
+can be appended to and split, and each record is decoded with a single
+``json.loads()`` call on a line found in a large binary block.
+
+Like the SdfReader the reader can be restricted to a range of
+(uncompressed) byte offsets so a file can be processed in parallel.
+"""
+
+from __future__ import print_function
+import json
+import os
+import sys
+
+from . import compression_utils, instrumentation, utils
+
+# The default size of each block read from the underlying file
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+
+class JsonLinesReader(object):
+    """An iterator over the records (dictionaries) of a line-delimited
+    JSON file. Blank lines are ignored.
+
+    To process a file in parallel each worker can be given a different
+    ``start`` and ``end`` offset (see ``split_ranges()``). A record belongs
+    to the range that contains its first byte, so non-overlapping ranges
+    that cover the file return every record exactly once.
+    """
+
+    def __init__(self, filename_or_stream,
+                 start=0,
+                 end=None,
+                 encoding='utf-8',
+                 block_size=DEFAULT_BLOCK_SIZE):
+        """Basic initialiser.
+
+        :param filename_or_stream: The file (which may be compressed)
+                                   or an open (binary) stream.
+        :param start: The (uncompressed) byte offset to start reading from.
+                      If this is not the start of a line the reader moves
+                      on to the next line. Values other than 0 require
+                      a seekable stream.
+        :param end: An optional offset. Records starting at or after this
+                    offset are not returned.
+        :param encoding: The encoding of the file's content.
+        :param block_size: The size of each read from the file.
+        """
+        if isinstance(filename_or_stream, str):
+            self.stream = utils.open_file(filename_or_stream)
+        else:
+            self.stream = getattr(filename_or_stream, 'buffer',
+                                  filename_or_stream)
+        self._start = start
+        self._end = end
+        self._encoding = encoding
+        self._block_size = block_size
+        self._recorder = instrumentation.recorder('JsonLinesReader')
+
+    def __iter__(self):
+        """Returns the next record.
+
+        :returns: A dictionary
+        """
+        decode = json.JSONDecoder().decode
+        encoding = self._encoding
+        recorder = self._recorder
+        for _, line in self._lines():
+            if recorder is not None:
+                start = instrumentation.clock()
+            record = decode(line.decode(encoding))
+            if recorder is not None:
+                recorder.add('parse_seconds', instrumentation.clock() - start)
+                recorder.add('records')
+                recorder.add('bytes', len(line))
+            yield record
+
+        if recorder is not None:
+            recorder.flush()
+
+    def offsets(self):
+        """Returns a generator of the byte offsets of the records in
+        the reader's range without decoding them.
+        """
+        for offset, _ in self._lines():
+            yield offset
+
+    def _lines(self):
+        """Returns a generator of (offset, bytes) tuples for the non-blank
+        lines that start in the reader's range. The bytes exclude
+        the line's newline.
+        """
+        position = 0
+        if self._start > 0:
+            # Start at the end of the previous line
+            # (which may be the line before the start)
+            position = self._start - 1
+            self.stream.seek(position)
+        skip_line = position > 0
+
+        end = self._end
+        recorder = self._recorder
+        partial = b''
+        offset = position
+        while True:
+            if recorder is not None:
+                start = instrumentation.clock()
+                block = self.stream.read(self._block_size)
+                recorder.add('read_seconds', instrumentation.clock() - start)
+            else:
+                block = self.stream.read(self._block_size)
+            if not block:
+                break
+            if not isinstance(block, bytes):
+                block = block.encode(self._encoding)
+            lines = (partial + block).split(b'\n')
+            partial = lines.pop()
+            for line in lines:
+                line_offset = offset
+                offset += len(line) + 1
+                if skip_line:
+                    skip_line = False
+                    continue
+                if end is not None and line_offset >= end:
+                    return
+                if line.strip():
+                    yield line_offset, line
+
+        if partial.strip() and not skip_line and \
+                (end is None or offset < end):
+            yield offset, partial
+
+    def close(self):
+        if self.stream:
+            self.stream.close()
+        if self._recorder is not None:
+            self._recorder.flush()
+
+
+def build_index(filename_or_stream, block_size=DEFAULT_BLOCK_SIZE):
+    """Builds an index of the (uncompressed) byte offset of every record.
+    Offsets can be used as the ``start`` of a JsonLinesReader or given
+    to ``split_ranges()``.
+
+    :param filename_or_stream: The file or a binary stream
+    :param block_size: The size of each read from the file
+    :returns: A list of record offsets
+    """
+    reader = JsonLinesReader(filename_or_stream, block_size=block_size)
+    index = list(reader.offsets())
+    reader.close()
+    return index
+
+
+def split_ranges(filename, num_ranges, index=None):
+    """Splits a file into (approximately) equal ranges suitable for
+    use as the ``start`` and ``end`` of a set of JsonLinesReaders.
+
+    Without an index the (plain) file is split into equal byte ranges.
+    With an index (see ``build_index()``) the ranges contain an equal number
+    of records, which is also the only way to split a compressed file.
+
+    :param filename: The file
+    :param num_ranges: The number of ranges required
+    :param index: An optional list of record offsets
+    :returns: A list of (start, end) tuples. The last end is None.
+    """
+    if num_ranges < 1:
+        raise ValueError('num_ranges must be 1 or more')
+
+    if index is None:
+        if compression_utils.detect_file(filename) is not None:
+            raise ValueError('Compressed files can only be split'
+                             ' using an index')
+        size = os.path.getsize(filename)
+        starts = [size * i // num_ranges for i in range(num_ranges)]
+    else:
+        starts = [index[len(index) * i // num_ranges] if index else 0
+                  for i in range(num_ranges)]
+
+    ranges = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < num_ranges else None
+        ranges.append((start, end))
+    return ranges
+
+
+def main():
+    reader = JsonLinesReader(sys.stdin)
+    count = 0
+    for _ in reader:
+        count += 1
+    print("Found", count, "records")
+
+
+if __name__ == "__main__":
+    main()
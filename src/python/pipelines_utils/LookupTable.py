@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Lookup tables and (hash) joins.
+
+A LookupTable indexes the rows of a (smaller) reference table, typically a
+typed CSV file found with ``file_utils.pick_csv()`` and read with the
+``TypedColumnReader``, by the value of a key column. Only the key and the
+columns that are needed are kept, each row as a tuple rather than
+a dictionary. A large dataset is then joined to the table one record at a
+time (an inner or left join) so it's never held in memory::
+
+    table = LookupTable.from_file(file_utils.pick_csv('targets'),
+                                  'target_id', columns=['name', 'pIC50'])
+    for record in table.join(records, 'target_id', how='left'):
+        writer.write(record)
+    table.close()
+
+If the table does not fit within its memory budget it's moved to
+a temporary (SQLite) database and rows are looked up from there.
+"""
+
+import itertools
+import os
+import pickle
+import sqlite3
+import tempfile
+
+from . import compression_utils, utils
+from .TypedColumnReader import CONVERTERS, TypedColumnReader
+
+# The supported joins
+JOINS = ['inner', 'left']
+# The number of rows used to estimate the size of a row
+_SAMPLE_SIZE = 100
+
+
+class LookupTable(object):
+    """An index of the rows of a table by the value of a key column.
+    Rows with a duplicate key are all kept (and a join returns a record
+    for each of them). Rows without a key are ignored.
+    """
+
+    def __init__(self, rows, key_field, columns=None, key_type=None,
+                 max_memory=None, tmp_dir=None):
+        """Basic initialiser. Reads (and indexes) the rows.
+
+        :param rows: An iterable of rows (dictionaries),
+                     i.e. a TypedColumnReader
+        :param key_field: The name of the key column
+        :param columns: The names of the columns kept (all but the key
+                        if None). Missing values are None.
+        :param key_type: The name of a TypedColumnReader type ('int',
+                         'float', 'boolean' or 'string') used to convert
+                         keys (in the table and when looking up), so that
+                         keys read as different types still match.
+        :param max_memory: The (approximate) memory, in bytes, used to hold
+                           the rows, estimated from their pickled size.
+                           Larger tables are moved to a temporary database.
+                           If None the table is kept in memory.
+        :param tmp_dir: The directory used for the temporary database
+                        (the system default if None)
+        """
+        self.key_field = key_field
+        self.converter = CONVERTERS[key_type.lower()] if key_type else None
+        self.max_memory = max_memory
+        self.tmp_dir = tmp_dir
+        # The number of rows in the table
+        self.count = 0
+        # Rows (value tuples), keyed by their key. A key with more than one
+        # row has a list of them. None once the table's been moved
+        # to the database.
+        self._rows = {}
+        self._db_file = None
+        self._db = None
+
+        rows = iter(rows)
+        sample = list(itertools.islice(rows, _SAMPLE_SIZE))
+        if columns is None:
+            columns = []
+            for row in sample:
+                for name in row:
+                    if name != key_field and name not in columns:
+                        columns.append(name)
+        self.columns = list(columns)
+
+        max_rows = None
+        if max_memory is not None and sample:
+            entries = [self._entry(row) for row in sample]
+            row_size = len(pickle.dumps(entries, pickle.HIGHEST_PROTOCOL)) \
+                // len(entries)
+            max_rows = max(1, max_memory // max(1, row_size))
+
+        for row in itertools.chain(sample, rows):
+            key, values = self._entry(row)
+            if key is None:
+                continue
+            if self._db is not None:
+                self._insert(key, values)
+            else:
+                existing = self._rows.get(key)
+                if existing is None:
+                    self._rows[key] = values
+                elif isinstance(existing, list):
+                    existing.append(values)
+                else:
+                    self._rows[key] = [existing, values]
+            self.count += 1
+            if self._db is None and max_rows is not None and \
+                    self.count > max_rows:
+                self._spill()
+        if self._db is not None:
+            self._db.commit()
+
+    @classmethod
+    def from_file(cls, filename, key_field, columns=None, column_sep=None,
+                  **kwargs):
+        """Creates a table from a typed CSV (or TSV) file.
+
+        :param filename: The file (which may be compressed). If it does not
+                         exist it's looked for with a '.csv' extension
+                         (compressed or not).
+        :param key_field: The name of the key column
+        :param columns: The names of the columns kept (see the initialiser)
+        :param column_sep: The column separator. If None it's a tab for
+                           '.tsv' files and a comma for anything else.
+        :param kwargs: Other initialiser arguments
+        :returns: A LookupTable
+        """
+        if not os.path.isfile(filename):
+            for ext in _csv_extensions():
+                if os.path.isfile(filename + ext):
+                    filename += ext
+                    break
+        if column_sep is None:
+            name = compression_utils.split_extension(filename.lower())[0]
+            column_sep = '\t' if name.endswith('.tsv') else ','
+        table_file = utils.open_file(filename, as_text=True)
+        try:
+            return cls(TypedColumnReader(table_file, column_sep=column_sep),
+                       key_field, columns=columns, **kwargs)
+        finally:
+            table_file.close()
+
+    @property
+    def spilled(self):
+        """True if the table has been moved to a (temporary) database."""
+        return self._db is not None
+
+    def __len__(self):
+        return self.count
+
+    def key(self, value):
+        """Returns the key for a value (converted if the table has
+        a key type), or None if the value is None.
+        """
+        if value is None or self.converter is None or \
+                isinstance(value, bool):
+            return value
+        return self.converter(str(value))
+
+    def lookup(self, value):
+        """Returns the rows with a key value.
+
+        :param value: The key value (converted if the table has a key type)
+        :returns: A list of value tuples (in the order of the table's
+                  columns), empty if there are none.
+        """
+        key = self.key(value)
+        if key is None:
+            return []
+        if self._db is not None:
+            cursor = self._db.execute('SELECT row_values FROM lookup'
+                                      ' WHERE key = ? ORDER BY id',
+                                      (self._db_key(key),))
+            return [pickle.loads(bytes(row[0])) for row in cursor]
+        rows = self._rows.get(key)
+        if rows is None:
+            return []
+        return rows if isinstance(rows, list) else [rows]
+
+    def join(self, records, key_field=None, how='inner', prefix=''):
+        """Returns a generator of the records joined to the table.
+        Each record is returned (once for each matching row) with the
+        table's columns added to its values, or to the record itself if it
+        does not have 'values' (i.e. it's a row rather than a
+        Squonk object). Records are updated rather than copied
+        unless they match more than one row.
+
+        :param records: An iterable of records (dictionaries)
+        :param key_field: The name of the record's key value
+                          (the table's key field if None)
+        :param how: The join, 'inner' (records without a matching row
+                    are dropped) or 'left' (they are returned with
+                    None for the table's columns)
+        :param prefix: A prefix added to the names of the table's columns
+        :returns: A generator of records
+        """
+        if how not in JOINS:
+            raise ValueError('Unsupported join: ' + str(how))
+        if key_field is None:
+            key_field = self.key_field
+        names = [prefix + name for name in self.columns]
+        no_match = [(None,) * len(names)] if how == 'left' else []
+
+        for record in records:
+            values = record.get('values')
+            if not isinstance(values, dict):
+                values = record
+            rows = self.lookup(values.get(key_field)) or no_match
+            if len(rows) == 1:
+                values.update(zip(names, rows[0]))
+                yield record
+                continue
+            for row in rows:
+                joined = _copy(record)
+                joined_values = joined.get('values')
+                if not isinstance(joined_values, dict):
+                    joined_values = joined
+                joined_values.update(zip(names, row))
+                yield joined
+
+    def close(self):
+        """Releases the table, removing any temporary database."""
+        self._rows = {}
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        if self._db_file is not None:
+            if os.path.exists(self._db_file):
+                os.remove(self._db_file)
+            self._db_file = None
+
+    def _entry(self, row):
+        """Returns the (key, value tuple) entry for a row."""
+        return self.key(row.get(self.key_field)), \
+            tuple([row.get(name) for name in self.columns])
+
+    def _spill(self):
+        """Moves the table to a temporary database."""
+        handle, self._db_file = tempfile.mkstemp(prefix='pipelines-lookup-',
+                                                 suffix='.db',
+                                                 dir=self.tmp_dir)
+        os.close(handle)
+        self._db = sqlite3.connect(self._db_file)
+        self._db.execute('PRAGMA synchronous = OFF')
+        self._db.execute('PRAGMA journal_mode = OFF')
+        self._db.execute('CREATE TABLE lookup'
+                         ' (id INTEGER PRIMARY KEY, key, row_values BLOB)')
+        self._db.execute('CREATE INDEX lookup_key ON lookup (key)')
+        for key, rows in self._rows.items():
+            for values in (rows if isinstance(rows, list) else [rows]):
+                self._insert(key, values)
+        self._rows = None
+
+    def _insert(self, key, values):
+        self._db.execute('INSERT INTO lookup (key, row_values) VALUES (?, ?)',
+                         (self._db_key(key),
+                          sqlite3.Binary(pickle.dumps(values,
+                                                      pickle.HIGHEST_PROTOCOL))))
+
+    @staticmethod
+    def _db_key(key):
+        """Returns the database value of a key. Keys that are equal in
+        Python (i.e. 1, 1.0 and True) are equal in the database.
+        """
+        if isinstance(key, bool):
+            return int(key)
+        if isinstance(key, float) and key.is_integer():
+            return int(key)
+        if isinstance(key, (int, float)) or isinstance(key, type(u'')):
+            return key
+        return str(key)
+
+
+def _csv_extensions():
+    """Returns the CSV extensions (compressed and not)."""
+    return ['.csv' + compression_utils.get_codec(name).extension
+            for name in compression_utils.codec_names()] + ['.csv']
+
+
+def _copy(record):
+    """Copies a record (and its values, if it has them)."""
+    copy = dict(record)
+    if isinstance(copy.get('values'), dict):
+        copy['values'] = dict(copy['values'])
+    return copy
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import uuid, json
+
+from . import instrumentation
+from .DatasetStats import DatasetStats
+
+# The default number of records encoded and written together
+DEFAULT_BATCH_SIZE = 1000
+
+
+class MoleculeObjectWriter():
+    """Writes a JSON list of Squonk MoleculeObjects, where each object has
+    a uuid, source, format and optional values. Objects are encoded and
+    written in batches and, if given an output base name, the dataset
+    metadata (including its size and value classes) and metrics are written
+    when the writer is closed.
+    """
+
+    def __init__(self, file, outputBase=None, valueClassMappings=None,
+                 datasetMetaProps=None, fieldMetaProps=None,
+                 batchSize=DEFAULT_BATCH_SIZE, stats=None):
+        """Basic initialiser.
+
+        :param file: The output file (a filename or open file)
+        :param outputBase: Base name for the metadata and metrics files.
+                           If None they are not written.
+        :param valueClassMappings: A dict that describes the Java class of
+                                   the value properties (used by Squonk)
+        :param datasetMetaProps: A dict with metadata properties that
+                                 describe the dataset as a whole
+        :param fieldMetaProps: A list of dicts with additional field metadata
+        :param batchSize: The number of objects encoded and written together
+        :param stats: An optional DatasetStats object, used instead of
+                      one built from the above metadata parameters
+        """
+        if type(file) == str:
+            self.file = open(file, 'w')
+        else:
+            self.file = file
+        if stats is None:
+            stats = DatasetStats(outputBase, thinOutput=False,
+                                 valueClassMappings=valueClassMappings,
+                                 datasetMetaProps=datasetMetaProps,
+                                 fieldMetaProps=fieldMetaProps)
+        self.stats = stats
+        self.batchSize = batchSize
+        # The number of objects written (including those in the batch)
+        self.count = 0
+        self._written = 0
+        self._batch = []
+        self._encode = json.JSONEncoder().encode
+        self._recorder = instrumentation.recorder('MoleculeObjectWriter')
+
+    def writeHeader(self):
+        self.file.write('[')
+
+    def writeFooter(self):
+        self._flush_batch()
+        self.file.write(']')
+
+    def write(self, source, format, values=None, objectUUID=None):
+        """Writes a MoleculeObject.
+
+        :param source: The molecule in molfile or smiles format
+        :param format: The format of the molecule. Either 'mol' or 'smiles'
+        :param values: Optional dict of values (properties)
+        :param objectUUID: Optional uuid. One is generated if not provided.
+        """
+        d = {'uuid': objectUUID if objectUUID else str(uuid.uuid4()),
+             'source': source,
+             'format': format}
+        if values:
+            d['values'] = values
+        self._batch.append(d)
+        self.stats.add(values)
+        self.count += 1
+        if len(self._batch) >= self.batchSize:
+            self._flush_batch()
+
+    def _flush_batch(self):
+        """Encodes and writes any objects in the current batch.
+        """
+        if not self._batch:
+            return
+        recorder = self._recorder
+        if recorder is not None:
+            start = instrumentation.clock()
+        json_str = ',\n'.join(map(self._encode, self._batch))
+        if recorder is not None:
+            encoded = instrumentation.clock()
+        if self._written > 0:
+            self.file.write(',\n')
+        self.file.write(json_str)
+        if recorder is not None:
+            recorder.add('encode_seconds', encoded - start)
+            recorder.add('write_seconds', instrumentation.clock() - encoded)
+            recorder.add('records', len(self._batch))
+            recorder.add('chars', len(json_str))
+        self._written += len(self._batch)
+        self._batch = []
+
+    def get_state(self):
+        """Returns the writer's state, used to checkpoint it
+        (see Checkpoint). Any objects in the current batch are written.
+        """
+        self._flush_batch()
+        return {'count': self.count, 'stats': self.stats.get_state()}
+
+    def set_state(self, state):
+        """Restores the state returned by get_state(). The header
+        is considered written.
+        """
+        self.count = state['count']
+        self._written = state['count']
+        self.stats.set_state(state['stats'])
+
+    def close(self):
+        self._flush_batch()
+        recorder = self._recorder
+        if recorder is not None:
+            start = instrumentation.clock()
+        if self.file:
+            self.file.close()
+        if recorder is not None:
+            recorder.add('close_seconds', instrumentation.clock() - start)
+            recorder.flush()
+        self.stats.write()
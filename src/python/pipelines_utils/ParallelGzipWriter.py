@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A gzip writer that compresses in parallel.
+
+Text written to the writer is collected into blocks and each block is
+compressed, as an independent gzip member, by a pool of threads (zlib
+releases the GIL while it compresses). The members are written to the
+file in order. A file of concatenated gzip members is a valid gzip file
+and can be read by ``gzip``, ``zcat`` and Java's ``GZIPInputStream``.
+"""
+
+import collections
+import gzip
+import io
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from . import instrumentation
+
+# The default size of the (uncompressed) blocks
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+
+def _compress(data, level):
+    """Compresses the data as a single gzip member."""
+    buf = io.BytesIO()
+    member = gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=level)
+    member.write(data)
+    member.close()
+    return buf.getvalue()
+
+
+class ParallelGzipWriter(object):
+    """A (text) file-like object that writes gzip-compressed content,
+    compressing blocks of the content in parallel.
+    """
+
+    def __init__(self, filename, threads=None, level=6,
+                 block_size=DEFAULT_BLOCK_SIZE, encoding='utf-8'):
+        """Basic initialiser.
+
+        :param filename: The file to write
+        :param threads: The number of compression threads
+                        (defaults to the number of CPUs)
+        :param level: The compression level (1-9)
+        :param block_size: The size of the blocks that are compressed
+        :param encoding: The encoding of the written text
+        """
+        if threads is None:
+            threads = multiprocessing.cpu_count()
+        self._raw = open(filename, 'wb')
+        self._threads = threads
+        self._level = level
+        self._block_size = block_size
+        self._encoding = encoding
+        self._pool = ThreadPool(threads)
+        self._pending = collections.deque()
+        self._buffer = []
+        self._buffered = 0
+        self._members = 0
+        self._recorder = instrumentation.recorder('ParallelGzipWriter')
+
+    def write(self, text):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self._block_size:
+            self._submit()
+        return len(text)
+
+    def _submit(self):
+        """Hands the buffered text to the pool for compression,
+        writing any compressed members that are ready.
+        """
+        data = ''.join(self._buffer).encode(self._encoding)
+        self._buffer = []
+        self._buffered = 0
+        if self._recorder is not None:
+            self._recorder.add('bytes_in', len(data))
+        self._pending.append(self._pool.apply_async(_compress,
+                                                    (data, self._level)))
+        self._members += 1
+        # Limit the number of blocks held in memory
+        while len(self._pending) > 2 * self._threads:
+            self._write_member()
+
+    def _write_member(self):
+        """Waits for the oldest pending member and writes it."""
+        recorder = self._recorder
+        if recorder is None:
+            self._raw.write(self._pending.popleft().get())
+            return
+        start = instrumentation.clock()
+        member = self._pending.popleft().get()
+        # Time spent waiting for the compression threads
+        recorder.add('wait_seconds', instrumentation.clock() - start)
+        self._raw.write(member)
+        recorder.add('bytes_out', len(member))
+
+    def flush(self):
+        """Compresses and writes everything written so far."""
+        if self._buffer:
+            self._submit()
+        while self._pending:
+            self._write_member()
+        self._raw.flush()
+
+    def close(self):
+        if self._raw.closed:
+            return
+        if not self._members and not self._buffer:
+            # Always write at least one (empty) member
+            self._buffer.append('')
+        self.flush()
+        self._raw.close()
+        self._pool.close()
+        self._pool.join()
+        if self._recorder is not None:
+            self._recorder.flush()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Streaming SDF reader.
+
+A toolkit-free reader for MDL SD files (plain or compressed). Records are
+located by scanning large binary blocks for the ``$$$$`` record delimiter
+rather than reading the file line-by-line, and each record is returned
+as its raw molblock along with a dictionary of its ``> <name>`` data
+items.
+
+The reader can be restricted to a range of (uncompressed) byte offsets,
+allowing a file to be split and processed in parallel, and the offsets
+of every record can be collected into an index.
+"""
+
+from __future__ import print_function
+import collections
+import os
+import re
+import sys
+
+from . import compression_utils, instrumentation, utils
+
+# The default size of each block read from the underlying file
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+# How far before a range's start offset the scanner begins looking
+# for a record delimiter. It only needs to be longer than the
+# longest delimiter line.
+_ALIGNMENT_BACKTRACK = 64
+
+_DELIMITER = b'$$$$'
+_LINE_DELIMITER = b'\n$$$$'
+_MOL_END = 'M  END'
+_PROPERTY_NAME = re.compile(r'<([^>]*)>')
+
+# The record returned by the SdfReader iterator.
+# The molblock is the text up to (and including) the 'M  END' line,
+# properties is a dictionary of data item names and (string) values
+# (None if properties are not parsed) and offset is the (uncompressed)
+# byte offset of the start of the record in the file.
+SdfRecord = collections.namedtuple('SdfRecord', 'molblock properties offset')
+
+
+def parse_record(text):
+    """Splits the text of an SD file record into its molblock and
+    a dictionary of its data items. Multi-line data item values are joined
+    with a newline.
+
+    :param text: The record text (excluding the '$$$$' delimiter)
+    :returns: A tuple of molblock and properties dictionary
+    """
+    properties = {}
+    mol_end = text.find(_MOL_END)
+    if mol_end < 0:
+        return text, properties
+    line_end = text.find('\n', mol_end)
+    if line_end < 0:
+        return text + '\n', properties
+    molblock = text[:line_end + 1]
+
+    name = None
+    values = []
+    for line in text[line_end + 1:].splitlines():
+        if name is None:
+            if line.startswith('>'):
+                match = _PROPERTY_NAME.search(line)
+                name = match.group(1) if match else ''
+                values = []
+        elif line.strip():
+            values.append(line)
+        else:
+            properties[name] = '\n'.join(values)
+            name = None
+    if name is not None:
+        properties[name] = '\n'.join(values)
+
+    return molblock, properties
+
+
+class SdfReader(object):
+    """An iterator over the records of an SD file, returning an
+    ``SdfRecord`` for each record found.
+
+    The file is read in large blocks and split on the ``$$$$`` delimiter,
+    so memory use is bounded by the block size and the size of the
+    largest record.
+
+    To process a file in parallel each worker can be given a different
+    ``start`` and ``end`` offset (see ``split_ranges()``). A record belongs
+    to the range that contains its first byte, so non-overlapping ranges
+    that cover the file return every record exactly once.
+    """
+
+    def __init__(self, filename_or_stream,
+                 start=0,
+                 end=None,
+                 parse_properties=True,
+                 encoding='utf-8',
+                 block_size=DEFAULT_BLOCK_SIZE):
+        """Basic initialiser.
+
+        :param filename_or_stream: The SD file (which may be compressed)
+                                   or an open (binary) stream.
+        :param start: The (uncompressed) byte offset to start reading from.
+                      If this is not the start of a record the reader
+                      moves on to the next record. Values other than 0
+                      require a seekable stream.
+        :param end: An optional offset. Records starting at or after this
+                    offset are not returned.
+        :param parse_properties: Set to False to skip the parsing of data
+                                 items, in which case the molblock is the
+                                 whole record and properties is None.
+        :param encoding: The encoding of the file's content.
+        :param block_size: The size of each read from the file.
+        """
+        if isinstance(filename_or_stream, str):
+            self.stream = utils.open_file(filename_or_stream)
+        else:
+            self.stream = getattr(filename_or_stream, 'buffer',
+                                  filename_or_stream)
+        self._start = start
+        self._end = end
+        self._parse_properties = parse_properties
+        self._encoding = encoding
+        self._block_size = block_size
+        self._recorder = instrumentation.recorder('SdfReader')
+
+    def __iter__(self):
+        """Returns the next record.
+
+        :returns: An SdfRecord
+        """
+        position = 0
+        if self._start > 0:
+            position = max(0, self._start - _ALIGNMENT_BACKTRACK)
+            self.stream.seek(position)
+
+        recorder = self._recorder
+        for offset, data in self._scan(position):
+            if offset < self._start:
+                # A (partial) record that belongs to the previous range
+                continue
+            if self._end is not None and offset >= self._end:
+                break
+            if recorder is not None:
+                start = instrumentation.clock()
+            text = data.decode(self._encoding, 'replace')
+            if self._parse_properties:
+                molblock, properties = parse_record(text)
+            else:
+                molblock, properties = text, None
+            if recorder is not None:
+                recorder.add('parse_seconds', instrumentation.clock() - start)
+                recorder.add('records')
+                recorder.add('bytes', len(data))
+            yield SdfRecord(molblock, properties, offset)
+
+        if recorder is not None:
+            recorder.flush()
+
+    def offsets(self):
+        """Returns a generator of the byte offsets of the records in
+        the reader's range without decoding them.
+        """
+        position = 0
+        if self._start > 0:
+            position = max(0, self._start - _ALIGNMENT_BACKTRACK)
+            self.stream.seek(position)
+
+        for offset, _ in self._scan(position):
+            if offset < self._start:
+                continue
+            if self._end is not None and offset >= self._end:
+                break
+            yield offset
+
+    def _scan(self, position):
+        """Scans the stream, from the given position, for records.
+        The position is expected to be the start of a line.
+
+        :param position: The current (uncompressed) offset of the stream
+        :returns: A generator of (offset, bytes) tuples, one for each record
+                  (the bytes exclude the delimiter line)
+        """
+        buf = b''
+        base = position
+        pos = 0
+        scan = 0
+        eof = False
+        recorder = self._recorder
+        while True:
+
+            # Find the next delimiter at the start of a line...
+            if scan <= pos and buf.startswith(_DELIMITER, pos):
+                delimiter = pos
+            else:
+                delimiter = buf.find(_LINE_DELIMITER, max(scan, pos))
+                if delimiter >= 0:
+                    delimiter += 1
+
+            if delimiter >= 0:
+                line_end = buf.find(b'\n', delimiter)
+                if line_end < 0 and eof:
+                    line_end = len(buf)
+                if line_end >= 0:
+                    if buf[delimiter + len(_DELIMITER):line_end].strip():
+                        # Not a delimiter line (i.e. '$$$$abc'),
+                        # keep looking
+                        scan = delimiter + 1
+                        continue
+                    yield base + pos, buf[pos:delimiter]
+                    pos = line_end + 1
+                    scan = pos
+                    continue
+                # Delimiter found but its line is incomplete
+                scan = delimiter - 1 if delimiter > pos else pos
+            else:
+                scan = max(pos, len(buf) - len(_DELIMITER))
+
+            if eof:
+                if buf[pos:].strip():
+                    # A final record without a delimiter
+                    yield base + pos, buf[pos:]
+                return
+
+            if recorder is not None:
+                start = instrumentation.clock()
+                block = self.stream.read(self._block_size)
+                recorder.add('read_seconds', instrumentation.clock() - start)
+            else:
+                block = self.stream.read(self._block_size)
+            if not block:
+                eof = True
+                continue
+            if not isinstance(block, bytes):
+                block = block.encode(self._encoding)
+            buf = buf[pos:] + block
+            base += pos
+            scan -= pos
+            pos = 0
+
+    def close(self):
+        if self.stream:
+            self.stream.close()
+        if self._recorder is not None:
+            self._recorder.flush()
+
+
+def build_index(filename_or_stream, block_size=DEFAULT_BLOCK_SIZE):
+    """Builds an index of the (uncompressed) byte offset of every record
+    in an SD file. Offsets can be used as the ``start`` of an SdfReader
+    or given to ``split_ranges()``.
+
+    :param filename_or_stream: The SD file or a binary stream
+    :param block_size: The size of each read from the file
+    :returns: A list of record offsets
+    """
+    reader = SdfReader(filename_or_stream, block_size=block_size)
+    index = list(reader.offsets())
+    reader.close()
+    return index
+
+
+def split_ranges(filename, num_ranges, index=None):
+    """Splits an SD file into (approximately) equal ranges suitable for
+    use as the ``start`` and ``end`` of a set of SdfReaders.
+
+    Without an index the (plain) file is split into equal byte ranges.
+    With an index (see ``build_index()``) the ranges contain an equal number
+    of records, which is also the only way to split a compressed file.
+
+    :param filename: The SD file
+    :param num_ranges: The number of ranges required
+    :param index: An optional list of record offsets
+    :returns: A list of (start, end) tuples. The last end is None.
+    """
+    if num_ranges < 1:
+        raise ValueError('num_ranges must be 1 or more')
+
+    if index is None:
+        if compression_utils.detect_file(filename) is not None:
+            raise ValueError('Compressed files can only be split'
+                             ' using an index')
+        size = os.path.getsize(filename)
+        starts = [size * i // num_ranges for i in range(num_ranges)]
+    else:
+        starts = [index[len(index) * i // num_ranges] if index else 0
+                  for i in range(num_ranges)]
+
+    ranges = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < num_ranges else None
+        ranges.append((start, end))
+    return ranges
+
+
+def main():
+    reader = SdfReader(sys.stdin)
+    count = 0
+    for _ in reader:
+        count += 1
+    print("Found", count, "records")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+class SdfWriter():
+    """Writes SD file records from molblocks and a dictionary of
+    data items. The complement of the SdfReader.
+    """
+
+    def __init__(self, file):
+        if type(file) == str:
+            self.file = open(file, 'w')
+        else:
+            self.file = file
+        self.count = 0
+
+    def writeHeader(self):
+        pass
+
+    def writeFooter(self):
+        pass
+
+    def write(self, molblock, properties=None):
+        parts = [molblock]
+        if not molblock.endswith('\n'):
+            parts.append('\n')
+        if properties:
+            for name, value in properties.items():
+                if value is not None:
+                    parts.append('>  <%s>\n%s\n\n' % (name, value))
+        parts.append('$$$$\n')
+        self.file.write(''.join(parts))
+        self.count += 1
+
+    def close(self):
+        if self.file:
+            self.file.close()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Sharded output.
+
+A writer that splits its output into a number of files (shards) so that
+the next stage of a workflow can process them in parallel. Shards are
+named after the output base name and the shard number, i.e.
+``output.00001.data.gz``, ``output.00002.data.gz``, and each is a complete
+dataset (with its own ``.metadata`` when writing JSON).
+
+Records are either written to one shard until it reaches a number of
+records (or size) and then to the next (rolling), or are distributed
+across a fixed number of shards by the hash of a key field (partitioned),
+so that records with the same key are always in the same shard.
+
+When the writer is closed a manifest (``output.manifest.json``) listing
+each shard's files, records and size is written along with the metrics
+of the whole output.
+"""
+
+import json
+import os
+import zlib
+
+from . import compression_utils, utils
+from .BasicObjectWriter import BasicObjectWriter
+from .DatasetStats import DatasetStats
+from .TsvWriter import TsvWriter
+
+# The extension of the manifest (added to the output base name)
+MANIFEST_EXT = '.manifest.json'
+
+
+class _CountingFile(object):
+    """Counts the characters written to a file."""
+
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+
+    def write(self, text):
+        self.count += len(text)
+        self.file.write(text)
+
+    def close(self):
+        self.file.close()
+
+
+class ShardedWriter(object):
+    """Writes BasicObjects (the 'json' format) or TSV records to a set of
+    shards, each written by a BasicObjectWriter or TsvWriter.
+    """
+
+    def __init__(self, outputBase, outputFormat='json', fieldNames=None,
+                 compress=True, codec=compression_utils.DEFAULT_CODEC,
+                 maxRecords=None, maxBytes=None,
+                 numShards=None, keyField=None,
+                 valueClassMappings=None, datasetMetaProps=None,
+                 fieldMetaProps=None):
+        """Basic initialiser. Either a maximum number of records and/or
+        bytes (for rolling shards) or a number of shards and key field
+        (for partitioned shards) is expected.
+
+        :param outputBase: The output base name
+        :param outputFormat: The format of the shards, 'json' or 'tsv'
+        :param fieldNames: The column names (keys) and headers (TSV only)
+        :param compress: Set to compress the shards
+        :param codec: The compression codec (see compression_utils)
+        :param maxRecords: The maximum number of records in a shard
+        :param maxBytes: The (approximate) maximum size of a shard.
+                         The size is the number of characters written
+                         (before any compression).
+        :param numShards: The number of (partitioned) shards
+        :param keyField: The name of the value used to partition records.
+                         Records without it are written to the first shard.
+        :param valueClassMappings: A dict that describes the Java class of
+                                   the value properties (used by Squonk)
+        :param datasetMetaProps: A dict with metadata properties that
+                                 describe the dataset as a whole
+        :param fieldMetaProps: A list of dicts with additional field metadata
+        """
+        if outputFormat not in ['json', 'tsv']:
+            raise ValueError("Unsupported format: " + outputFormat)
+        if numShards is not None:
+            if numShards < 1 or keyField is None:
+                raise ValueError('Partitioned shards need a keyField'
+                                 ' and numShards of 1 or more')
+            if maxRecords is not None or maxBytes is not None:
+                raise ValueError('maxRecords and maxBytes cannot be used'
+                                 ' with numShards')
+        elif maxRecords is None and maxBytes is None:
+            raise ValueError('One of maxRecords, maxBytes or numShards'
+                             ' is required')
+        if outputFormat == 'tsv' and fieldNames is None:
+            raise ValueError('The tsv format requires fieldNames')
+
+        self.outputBase = outputBase
+        self.outputFormat = outputFormat
+        self.fieldNames = fieldNames
+        self.compress = compress
+        self.codec = codec
+        self.maxRecords = maxRecords
+        self.maxBytes = maxBytes
+        self.numShards = numShards
+        self.keyField = keyField
+        self.valueClassMappings = valueClassMappings
+        self.datasetMetaProps = datasetMetaProps
+        self.fieldMetaProps = fieldMetaProps
+
+        # The total number of records written
+        self.count = 0
+        # Open shard writers, keyed by shard number (from 1)
+        self._writers = {}
+        # The current (rolling) shard number
+        self._current = 0
+        # Manifest entries of closed shards, keyed by shard number
+        self._shards = {}
+
+    def writeHeader(self):
+        """Provided for compatibility with the other writers,
+        each shard's header is written when it's opened.
+        """
+        pass
+
+    def writeFooter(self):
+        """Provided for compatibility with the other writers,
+        each shard's footer is written when it's closed.
+        """
+        pass
+
+    def write(self, dictOfValues, objectUUID=None):
+        """Writes a record to its shard.
+
+        :param dictOfValues: The record's values
+        :param objectUUID: Optional uuid (json only).
+                           One is generated if not provided.
+        """
+        if self.numShards is not None:
+            number = self.shard_for(dictOfValues.get(self.keyField))
+        else:
+            if self._current == 0:
+                self._current = 1
+            number = self._current
+        writer = self._writers.get(number)
+        if writer is None:
+            writer = self._open_shard(number)
+
+        if self.outputFormat == 'json':
+            writer.write(dictOfValues, objectUUID=objectUUID)
+        else:
+            writer.write(dictOfValues)
+        self.count += 1
+
+        if self.numShards is None and \
+                ((self.maxRecords is not None and
+                  writer.stats.count >= self.maxRecords) or
+                 (self.maxBytes is not None and
+                  writer.file.count >= self.maxBytes)):
+            self._close_shard(number)
+            self._current += 1
+
+    def shard_for(self, key):
+        """Returns the shard number (from 1) for a (partition) key value.
+        The hash is stable, so a key is always written to the same shard.
+        """
+        if key is None:
+            return 1
+        digest = zlib.crc32(str(key).encode('utf-8')) & 0xffffffff
+        return digest % self.numShards + 1
+
+    def shard_base(self, number):
+        """Returns the base name of a shard."""
+        return '%s.%05d' % (self.outputBase, number)
+
+    def close(self):
+        """Closes all the shards, writing the manifest and metrics.
+        Every partitioned shard is written, even if it is empty, and there
+        is always at least one rolling shard.
+        """
+        if self.numShards is not None:
+            numbers = range(1, self.numShards + 1)
+        else:
+            numbers = [] if self._shards or self._writers else [1]
+        for number in numbers:
+            if number not in self._shards and number not in self._writers:
+                self._open_shard(number)
+        for number in sorted(self._writers):
+            self._close_shard(number)
+
+        shards = [self._shards[number] for number in sorted(self._shards)]
+        manifest = {'format': self.outputFormat,
+                    'records': self.count,
+                    'shards': shards}
+        with open(self.outputBase + MANIFEST_EXT, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+        utils.update_metrics(self.outputBase, {'__OutputCount__': self.count,
+                                               '__Shards__': len(shards)})
+
+    def _open_shard(self, number):
+        """Opens (and returns) the writer of a shard."""
+        base = self.shard_base(number)
+        if self.outputFormat == 'json':
+            stats = DatasetStats(base, metrics=False,
+                                 valueClassMappings=self.valueClassMappings,
+                                 datasetMetaProps=self.datasetMetaProps,
+                                 fieldMetaProps=self.fieldMetaProps)
+            output = utils.open_output(base, 'data', self.compress,
+                                       codec=self.codec)
+            writer = BasicObjectWriter(_CountingFile(output), stats=stats)
+        else:
+            stats = DatasetStats(base, metadata=False, metrics=False)
+            output = utils.open_output(base, 'tsv', self.compress,
+                                       codec=self.codec)
+            writer = TsvWriter(_CountingFile(output), self.fieldNames,
+                               stats=stats)
+        writer.writeHeader()
+        self._writers[number] = writer
+        return writer
+
+    def _close_shard(self, number):
+        """Closes a shard, adding it to the manifest."""
+        writer = self._writers.pop(number)
+        writer.writeFooter()
+        writer.close()
+        base = self.shard_base(number)
+        ext = '.data' if self.outputFormat == 'json' else '.tsv'
+        if self.compress:
+            ext += compression_utils.get_codec(self.codec).extension
+        entry = {'shard': number,
+                 'file': os.path.basename(base + ext),
+                 'records': writer.stats.count,
+                 'bytes': os.path.getsize(base + ext)}
+        if self.outputFormat == 'json':
+            entry['metadata'] = os.path.basename(base + '.metadata')
+        self._shards[number] = entry
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Streaming SMILES file reader.
+
+Reads (plain or compressed) SMILES files, where each line consists of a
+SMILES string, an optional identifier and optional extra columns. The file
+is read in large blocks and each line is split just once. Extra columns
+can be typed using the same ``name:type`` header convention (and converters)
+as the ``TypedColumnReader``.
+
+For very large files the lines can be handed out in fixed-size chunks to a
+pool of worker processes with ``SmilesReader.map_chunks()``.
+"""
+
+from __future__ import print_function
+import collections
+import multiprocessing
+import sys
+
+from . import instrumentation, utils
+from .TypedColumnReader import CONVERTERS, ContentError, UnknownTypeError
+
+# The default size of each block read from the underlying file
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+# The default number of lines in each chunk handed to a worker
+DEFAULT_CHUNK_SIZE = 10000
+
+
+class _LineParser(object):
+    """Converts SMILES file lines into (smiles, id, extras) tuples.
+    Kept separate from the reader so that it can be sent (pickled)
+    to worker processes.
+    """
+
+    def __init__(self, column_sep, converters):
+        self.column_sep = column_sep
+        self.converters = converters
+
+    def parse(self, line, line_num):
+        """Parses a line, returning None for blank lines.
+
+        :raises: ContentError if an extra column value does not comply
+                 with the column type or there are too many values.
+        """
+        parts = line.split(self.column_sep)
+        if not parts or (len(parts) == 1 and not parts[0].strip()):
+            return None
+        num_parts = len(parts)
+        mol_id = parts[1] if num_parts > 1 else None
+        if num_parts < 3:
+            return parts[0], mol_id, []
+
+        converters = self.converters
+        if converters is None:
+            return parts[0], mol_id, parts[2:]
+        if num_parts - 2 > len(converters):
+            raise ContentError(len(converters) + 3, line_num,
+                               None, 'Too many values')
+        extras = []
+        column = 2
+        for value in parts[2:]:
+            if value.strip():
+                try:
+                    value = converters[column - 2](value)
+                except ValueError:
+                    raise ContentError(column + 1, line_num, value,
+                                       'Does not comply with column type')
+            else:
+                value = None
+            extras.append(value)
+            column += 1
+        return parts[0], mol_id, extras
+
+    def parse_lines(self, lines, first_line_num):
+        """Parses a list of consecutive lines, skipping blank lines."""
+        records = []
+        line_num = first_line_num
+        for line in lines:
+            record = self.parse(line, line_num)
+            if record is not None:
+                records.append(record)
+            line_num += 1
+        return records
+
+
+class _ChunkWorker(object):
+    """The (picklable) callable run in worker processes by map_chunks()."""
+
+    def __init__(self, parser, func):
+        self.parser = parser
+        self.func = func
+
+    def __call__(self, chunk):
+        first_line_num, lines = chunk
+        return self.func(self.parser.parse_lines(lines, first_line_num))
+
+
+class SmilesReader(object):
+    """A generator of the records in a SMILES file. Each record is a tuple
+    of ``(smiles, id, extras)`` where ``id`` is None if the line has no
+    identifier and ``extras`` is a list of the values in any remaining
+    columns.
+
+    If the file has a header, or one is provided, the extra columns
+    are named and typed using the ``TypedColumnReader`` conventions. The
+    names of the extra columns are available from ``extra_names``. The
+    header's first two columns are the SMILES and identifier columns.
+    Without a header the extra column values are strings.
+
+    Blank lines are skipped.
+    """
+
+    def __init__(self, filename_or_stream,
+                 column_sep=None,
+                 type_sep=':',
+                 header=None,
+                 has_header=False,
+                 encoding='utf-8',
+                 block_size=DEFAULT_BLOCK_SIZE):
+        """Basic initialiser.
+
+        :param filename_or_stream: The SMILES file (which may be compressed)
+                                   or an open stream.
+        :param column_sep: The column separator.
+                           If None columns are separated by whitespace.
+        :param type_sep: The type separator used in the header.
+        :param header: An optional (comma-separated) header,
+                       i.e. "smiles,id,mw:float,hac:int".
+        :param has_header: True if the first line of the file is a header.
+                           If a header is also provided the file's header
+                           line is skipped.
+        :param encoding: The encoding of the file's content.
+        :param block_size: The size of each read from the file.
+        """
+        if isinstance(filename_or_stream, str):
+            self.stream = utils.open_file(filename_or_stream)
+        else:
+            self.stream = filename_or_stream
+        self._type_sep = type_sep
+        self._has_header = has_header
+        self._encoding = encoding
+        self._block_size = block_size
+        self._parser = _LineParser(column_sep, None)
+        self._recorder = instrumentation.recorder('SmilesReader')
+
+        # The names of the extra columns (if known)
+        self.extra_names = None
+        if header:
+            self._handle_hdr(header.split(','))
+
+    def __iter__(self):
+        """Returns the next record from the file.
+
+        :returns: A (smiles, id, extras) tuple
+
+        :raises: ContentError if an extra column value does not comply
+                 with the column type.
+        :raises: UnknownTypeError if a header column type is unknown.
+        """
+        parse = self._parser.parse
+        recorder = self._recorder
+        line_num = 0
+        for line in self._lines():
+            line_num += 1
+            if line_num == 1 and self._has_header:
+                if self.extra_names is None:
+                    self._handle_hdr(line.split(self._parser.column_sep))
+                continue
+            if recorder is not None:
+                start = instrumentation.clock()
+                record = parse(line, line_num)
+                recorder.add('parse_seconds', instrumentation.clock() - start)
+            else:
+                record = parse(line, line_num)
+            if record is not None:
+                if recorder is not None:
+                    recorder.add('records')
+                yield record
+
+        if recorder is not None:
+            recorder.flush()
+
+    def chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Returns a generator of lists of consecutive (raw) lines.
+        Each list is preceded by the (1-based) line number of its first line.
+
+        :param chunk_size: The number of lines in each chunk
+        :returns: A generator of (first_line_number, lines) tuples
+        """
+        chunk = []
+        first_line_num = 1
+        line_num = 0
+        for line in self._lines():
+            line_num += 1
+            if line_num == 1 and self._has_header:
+                if self.extra_names is None:
+                    self._handle_hdr(line.split(self._parser.column_sep))
+                first_line_num = 2
+                continue
+            chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield first_line_num, chunk
+                first_line_num = line_num + 1
+                chunk = []
+        if chunk:
+            yield first_line_num, chunk
+
+    def map_chunks(self, func,
+                   processes=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE,
+                   max_pending=None):
+        """Parses the file in chunks using a pool of worker processes,
+        calling ``func`` (in the worker) with each chunk's list of records.
+        The function must be picklable (i.e. defined at the top level
+        of a module).
+
+        The results of each call are returned in file order. Only a limited
+        number of chunks are dispatched ahead of the results being consumed
+        so memory use remains bounded.
+
+        :param func: A function that takes a list of records
+        :param processes: The number of worker processes
+                          (defaults to the number of CPUs)
+        :param chunk_size: The number of lines in each chunk
+        :param max_pending: The maximum number of chunks dispatched
+                            but not yet consumed (defaults to twice the
+                            number of processes)
+        :returns: A generator of the func results
+        """
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if max_pending is None:
+            max_pending = 2 * processes
+
+        pool = multiprocessing.Pool(processes)
+        try:
+            worker = None
+            pending = collections.deque()
+            for chunk in self.chunks(chunk_size):
+                # The worker's built on the first chunk,
+                # after any header's been read
+                if worker is None:
+                    worker = _ChunkWorker(self._parser, func)
+                pending.append(pool.apply_async(worker, (chunk,)))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _lines(self):
+        """Reads the file in blocks, returning a generator of its lines
+        (without line terminators).
+        """
+        remainder = b''
+        recorder = self._recorder
+        while True:
+            if recorder is not None:
+                start = instrumentation.clock()
+                block = self.stream.read(self._block_size)
+                recorder.add('read_seconds', instrumentation.clock() - start)
+            else:
+                block = self.stream.read(self._block_size)
+            if not block:
+                break
+            if not isinstance(block, bytes):
+                block = block.encode(self._encoding)
+            if recorder is not None:
+                recorder.add('bytes', len(block))
+            last = block.rfind(b'\n')
+            if last < 0:
+                remainder += block
+                continue
+            text = (remainder + block[:last]).decode(self._encoding)
+            remainder = block[last + 1:]
+            for line in text.splitlines():
+                yield line
+        if remainder:
+            for line in remainder.decode(self._encoding).splitlines():
+                yield line
+
+    def _handle_hdr(self, hdr):
+        """Builds the extra column names and converters from a header.
+
+        :param hdr: The list of header cells
+                    (including the SMILES and identifier columns)
+
+        :raises: ContentError for any formatting problems
+        :raises: UnknownTypeError if the type is not known
+        """
+        names = []
+        converters = []
+        column_number = 1
+        for cell in hdr:
+            cell_parts = cell.split(self._type_sep)
+            if len(cell_parts) not in [1, 2]:
+                raise ContentError(column_number, 1, cell,
+                                   'Expected name and type (up to 2 items)')
+            name = cell_parts[0].strip()
+            if len(name) == 0:
+                raise ContentError(column_number, 1, cell,
+                                   'Column name is empty')
+            if len(cell_parts) == 2:
+                column_type = cell_parts[1].strip().lower()
+                if column_type not in CONVERTERS:
+                    raise UnknownTypeError(column_number, column_type)
+            else:
+                column_type = 'string'
+            # The SMILES and identifier columns are not converted
+            if column_number > 2:
+                if name in names:
+                    raise ContentError(column_number, 1, name,
+                                       'Duplicate column name')
+                names.append(name)
+                converters.append(CONVERTERS[column_type])
+            column_number += 1
+
+        self.extra_names = names
+        self._parser.converters = converters
+
+    def close(self):
+        if self.stream:
+            self.stream.close()
+        if self._recorder is not None:
+            self._recorder.flush()
+
+
+def main():
+    reader = SmilesReader(sys.stdin)
+    count = 0
+    for _ in reader:
+        count += 1
+    print("Found", count, "records")
+
+
+if __name__ == "__main__":
+    main()
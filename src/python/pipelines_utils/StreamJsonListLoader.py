@@ -15,8 +15,12 @@
 # limitations under the License.
 
 from __future__ import print_function
-from builtins import object
-import sys, gzip, json
+import sys, json
+if sys.version_info[0] < 3:
+    # Python 2 iterators need the future package's object
+    from builtins import object
+
+from . import instrumentation, utils
 
 class StreamJsonListLoader(object):
     """
@@ -33,7 +37,8 @@ class StreamJsonListLoader(object):
 
     def __init__(self, filename_or_stream):
         if type(filename_or_stream) == str:
-            self.stream = open(filename_or_stream)
+            # The file may be compressed
+            self.stream = utils.open_file(filename_or_stream, as_text=True)
         else:
             self.stream = filename_or_stream
 
@@ -41,10 +46,26 @@ class StreamJsonListLoader(object):
         if not stream_character == '[':
             raise NotImplementedError('Only JSON-streams of lists (that start with a "[") are supported. Found "%s".' % stream_character)
 
+        self._recorder = instrumentation.recorder('StreamJsonListLoader')
+
     def __iter__(self):
         return self
 
     def __next__(self):
+        recorder = self._recorder
+        if recorder is None:
+            return self._next()
+        start = instrumentation.clock()
+        try:
+            json_obj = self._next()
+        except StopIteration:
+            recorder.flush()
+            raise
+        recorder.add('parse_seconds', instrumentation.clock() - start)
+        recorder.add('records')
+        return json_obj
+
+    def _next(self):
         read_buffer = self.stream.read(1)
         while True:
             try:
@@ -66,6 +87,8 @@ class StreamJsonListLoader(object):
     def close(self):
         if self.stream:
             self.stream.close()
+        if self._recorder is not None:
+            self._recorder.flush()
 
 
 def main():
@@ -14,16 +14,32 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from . import instrumentation
+
+
 class TsvWriter():
 
-    def __init__(self, file, headersAsOrderedDict):
+    def __init__(self, file, headersAsOrderedDict, stats=None):
+        """Basic initialiser.
+
+        :param file: The output file (a filename or open file)
+        :param headersAsOrderedDict: The column names (keys) and headers
+        :param stats: An optional DatasetStats object. Values are added to it
+                      as they're written and it's written when the writer
+                      is closed.
+        """
         if type(file) == str:
             self.file = open(file, 'w')
         else:
             self.file = file
         self.headersAsOrderedDict = headersAsOrderedDict
+        self.stats = stats
+        self._recorder = instrumentation.recorder('TsvWriter')
 
     def write(self, dictOfValues):
+        recorder = self._recorder
+        if recorder is not None:
+            start = instrumentation.clock()
         h = self.headersAsOrderedDict
         count = 0
         for k in h:
@@ -33,6 +49,11 @@ class TsvWriter():
                 self.file.write(str(dictOfValues[k]))
             count += 1
         self.file.write('\n')
+        if recorder is not None:
+            recorder.add('write_seconds', instrumentation.clock() - start)
+            recorder.add('records')
+        if self.stats is not None:
+            self.stats.add(dictOfValues)
 
     def writeHeader(self):
         d = self.headersAsOrderedDict
@@ -47,6 +68,27 @@ class TsvWriter():
     def writeFooter(self):
         pass
 
+    def get_state(self):
+        """Returns the writer's state, used to checkpoint it
+        (see Checkpoint).
+        """
+        return {'stats': self.stats.get_state() if self.stats else None}
+
+    def set_state(self, state):
+        """Restores the state returned by get_state(). The header
+        is considered written.
+        """
+        if self.stats is not None and state['stats'] is not None:
+            self.stats.set_state(state['stats'])
+
     def close(self):
+        recorder = self._recorder
+        if recorder is not None:
+            start = instrumentation.clock()
         if self.file:
             self.file.close()
+        if recorder is not None:
+            recorder.add('close_seconds', instrumentation.clock() - start)
+            recorder.flush()
+        if self.stats is not None:
+            self.stats.write()
@@ -27,6 +27,8 @@ October 2018
 
 import csv
 
+from . import instrumentation
+
 
 class Error(Exception):
     """Base class for exceptions in this module."""
@@ -191,6 +193,7 @@ class TypedColumnReader(object):
         self._converters = []
         # The ordered list of unique column names extracted from the header
         self._column_names = []
+        self._recorder = instrumentation.recorder('TypedColumnReader')
 
     def __iter__(self):
         """Return the next type-converted row from the file.
@@ -217,6 +220,7 @@ class TypedColumnReader(object):
         if not self._converters and self._header:
             self._handle_hdr(self._header.split(','))
 
+        recorder = self._recorder
         for row in self._c_reader:
 
             # Handle the first row?
@@ -231,6 +235,9 @@ class TypedColumnReader(object):
             if len(self._converters) == 0:
                 raise ContentError(1, 1, None, 'Missing header')
 
+            if recorder is not None:
+                start = instrumentation.clock()
+
             # Construct a dictionary of row column names and values,
             # applying type conversions based on the
             # type defined in the header
@@ -254,8 +261,14 @@ class TypedColumnReader(object):
                 row_content[self._column_names[col_index]] = col_val
                 col_index += 1
 
+            if recorder is not None:
+                recorder.add('parse_seconds', instrumentation.clock() - start)
+                recorder.add('records')
             yield row_content
 
+        if recorder is not None:
+            recorder.flush()
+
     def _handle_hdr(self, hdr):
         """Given the file header line (or one provided when the object
         is instantiated) this method populates the ``self._converters`` array,
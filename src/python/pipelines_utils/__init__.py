@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""The Informatics Matters pipelines utilities.
+
+Importing the package imports none of its modules. On Python 3.7 or later
+modules are imported when they're first used as an attribute of the package
+(i.e. ``pipelines_utils.utils`` after ``import pipelines_utils``).
+"""
+
+_SUBMODULES = ['ArrowWriter',
+               'BasicObjectWriter',
+               'Checkpoint',
+               'DatasetStats',
+               'Deduplicator',
+               'JsonLinesReader',
+               'LookupTable',
+               'MoleculeObjectWriter',
+               'ParallelGzipWriter',
+               'SdfReader',
+               'SdfWriter',
+               'ShardedWriter',
+               'SmilesReader',
+               'StreamJsonListLoader',
+               'TsvWriter',
+               'TypedColumnReader',
+               'cli',
+               'compression_utils',
+               'external_sort',
+               'file_utils',
+               'instrumentation',
+               'log_utils',
+               'metrics_utils',
+               'parameter_utils',
+               'profile_utils',
+               'utils']
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        __import__(__name__ + '.' + name)
+        return globals()[name]
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES))
@@ -0,0 +1,480 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""The pipelines_utils command-line utility.
+
+Installed as the ``pipelines_utils`` console command. The ``convert``
+command streams records between the formats supported by this package: -
+
+*   json    Squonk BasicObject or MoleculeObject datasets (``.data.gz``)
+*   ndjson  Line-delimited JSON BasicObjects (``.ndjson``)
+*   tsv     Typed TSV (read with the TypedColumnReader, written with the
+            TsvWriter using a typed header)
+*   csv     Typed CSV (input only)
+*   sdf     SD files
+*   smi     SMILES files (input only)
+
+Records are converted one at a time so memory use does not depend on the
+size of the input. Files can be compressed with any of the codecs in
+compression_utils (i.e. ``.gz``, ``.bz2``, ``.xz``), which are recognised
+by their extension (output) or content (input). Gzipped output can be
+compressed in parallel.
+
+The ``merge-metrics`` command merges the metrics of the workers (or shards)
+of a pipeline into one metrics file (see metrics_utils).
+"""
+
+from __future__ import print_function
+import argparse
+import os
+import sys
+import time
+from collections import OrderedDict
+
+from . import compression_utils, utils
+
+# Supported formats
+INPUT_FORMATS = ['json', 'ndjson', 'tsv', 'csv', 'sdf', 'smi']
+OUTPUT_FORMATS = ['json', 'ndjson', 'tsv', 'sdf']
+
+# File extensions (without any compression extension) and their formats
+_FORMAT_EXTENSIONS = [('.data', 'json'),
+                      ('.ndjson', 'ndjson'),
+                      ('.jsonl', 'ndjson'),
+                      ('.json', 'json'),
+                      ('.tsv', 'tsv'),
+                      ('.csv', 'csv'),
+                      ('.sdf', 'sdf'),
+                      ('.smi', 'smi')]
+
+# Python types and their TypedColumnReader type names
+_COLUMN_TYPES = {bool: 'boolean', int: 'int', float: 'float'}
+
+
+def guess_format(filename):
+    """Returns the format implied by a filename's extension, or None."""
+    name = compression_utils.split_extension(filename.lower())[0]
+    for extension, file_format in _FORMAT_EXTENSIONS:
+        if name.endswith(extension):
+            return file_format
+    return None
+
+
+def output_base(filename):
+    """Returns the base name of an output file,
+    i.e. 'a/b' for 'a/b.data.gz'.
+    """
+    return os.path.splitext(compression_utils.split_extension(filename)[0])[0]
+
+
+def read_records(filename, file_format, smiles_header=False):
+    """Returns a generator of records from the named file (or STDIN if
+    the filename is '-'). Every record is a dictionary with 'uuid',
+    'source', 'format' and 'values' keys, the first three of which
+    may be None.
+    """
+    from .JsonLinesReader import JsonLinesReader
+    from .StreamJsonListLoader import StreamJsonListLoader
+    from .TypedColumnReader import TypedColumnReader
+    from .SdfReader import SdfReader
+    from .SmilesReader import SmilesReader
+
+    if file_format == 'json':
+        stream = sys.stdin if filename == '-' \
+            else utils.open_file(filename, as_text=True)
+        loader = StreamJsonListLoader(stream)
+        for obj in loader:
+            yield {'uuid': obj.get('uuid'),
+                   'source': obj.get('source'),
+                   'format': obj.get('format'),
+                   'values': obj.get('values') or {}}
+        loader.close()
+
+    elif file_format == 'ndjson':
+        reader = JsonLinesReader(sys.stdin if filename == '-' else filename)
+        for obj in reader:
+            yield {'uuid': obj.get('uuid'),
+                   'source': obj.get('source'),
+                   'format': obj.get('format'),
+                   'values': obj.get('values') or {}}
+        reader.close()
+
+    elif file_format in ['tsv', 'csv']:
+        stream = sys.stdin if filename == '-' \
+            else utils.open_file(filename, as_text=True)
+        reader = TypedColumnReader(stream,
+                                   column_sep='\t' if file_format == 'tsv' else ',')
+        for row in reader:
+            yield {'uuid': None, 'source': None, 'format': None, 'values': row}
+        stream.close()
+
+    elif file_format == 'sdf':
+        reader = SdfReader(sys.stdin if filename == '-' else filename)
+        for record in reader:
+            yield {'uuid': None, 'source': record.molblock, 'format': 'mol',
+                   'values': record.properties}
+        reader.close()
+
+    elif file_format == 'smi':
+        reader = SmilesReader(sys.stdin if filename == '-' else filename,
+                              has_header=smiles_header)
+        for smiles, mol_id, extras in reader:
+            values = {}
+            if mol_id is not None:
+                values['id'] = mol_id
+            names = reader.extra_names
+            for i, value in enumerate(extras):
+                values[names[i] if names else 'column_%d' % (i + 3)] = value
+            yield {'uuid': None, 'source': smiles, 'format': 'smiles',
+                   'values': values}
+        reader.close()
+
+    else:
+        raise ValueError("Unsupported format: " + str(file_format))
+
+
+def open_text_output(filename, threads=1, level=6):
+    """Opens a (text) output file, which is compressed if its name ends with
+    a codec's extension (see compression_utils). With more than one thread
+    gzipped output is compressed in parallel. The filename '-' is STDOUT.
+    """
+    if filename == '-':
+        return sys.stdout
+    codec = compression_utils.codec_for_filename(filename)
+    if codec is None:
+        return open(filename, 'w')
+    if codec.name == 'gzip' and threads > 1:
+        from .ParallelGzipWriter import ParallelGzipWriter
+        return ParallelGzipWriter(filename, threads=threads, level=level)
+    return codec.open(filename, 'wt', level=level)
+
+
+class _JsonOutput(object):
+    """Writes records as a Squonk dataset. MoleculeObjects are written
+    if the first record has a source, otherwise BasicObjects.
+    With 'lines' BasicObjects are written as line-delimited JSON.
+    A dataset can't have both, so records with and without a source
+    can't be mixed.
+    """
+
+    def __init__(self, file, base, lines=False):
+        self.file = file
+        self.base = base
+        self.lines = lines
+        self.writer = None
+        self.molecules = None
+
+    def _create_writer(self, molecules):
+        from .BasicObjectWriter import BasicObjectWriter
+        from .DatasetStats import DatasetStats
+        from .MoleculeObjectWriter import MoleculeObjectWriter
+
+        self.molecules = molecules
+        stats = DatasetStats(self.base, metrics=False, thinOutput=not molecules)
+        if molecules:
+            if self.lines:
+                raise ValueError('Molecules cannot be written as ndjson')
+            self.writer = MoleculeObjectWriter(self.file, stats=stats)
+        else:
+            self.writer = BasicObjectWriter(self.file, stats=stats,
+                                            lines=self.lines)
+        self.writer.writeHeader()
+
+    def write(self, record):
+        molecule = record['source'] is not None
+        if self.writer is None:
+            self._create_writer(molecule)
+        elif molecule != self.molecules:
+            raise ValueError('Records with and without a molecule (source)'
+                             ' cannot be written to one dataset')
+        if molecule:
+            self.writer.write(record['source'], record['format'],
+                              record['values'], objectUUID=record['uuid'])
+        else:
+            self.writer.write(record['values'], objectUUID=record['uuid'])
+
+    def close(self):
+        if self.writer is None:
+            self._create_writer(False)
+        self.writer.writeFooter()
+        self.writer.close()
+
+
+class _TsvOutput(object):
+    """Writes records as a typed TSV file. The columns (and their types)
+    are taken from an initial sample of the records. Values for columns
+    not seen in the sample are not written. SMILES are written (as the
+    'smiles' column) but molfiles, which span lines, can't be.
+    """
+
+    def __init__(self, file, sample_size):
+        self.file = file
+        self.sample_size = sample_size
+        self.sample = []
+        self.writer = None
+
+    def _create_writer(self):
+        from .TsvWriter import TsvWriter
+
+        column_types = OrderedDict()
+        for record in self.sample:
+            if record['format'] == 'smiles' and 'smiles' not in column_types:
+                column_types['smiles'] = str
+            for name, value in record['values'].items():
+                if value is None:
+                    column_types.setdefault(name, None)
+                    continue
+                value_type = type(value)
+                known_type = column_types.get(name)
+                if known_type is None:
+                    column_types[name] = value_type
+                elif known_type != value_type:
+                    if set([known_type, value_type]) == set([int, float]):
+                        column_types[name] = float
+                    else:
+                        column_types[name] = str
+        header = OrderedDict()
+        for name, value_type in column_types.items():
+            type_name = _COLUMN_TYPES.get(value_type)
+            header[name] = name + ':' + type_name if type_name else name
+        self.writer = TsvWriter(self.file, header)
+        self.writer.writeHeader()
+        for record in self.sample:
+            self._write(record)
+        self.sample = None
+
+    def _write(self, record):
+        values = {}
+        if record['format'] == 'smiles':
+            values['smiles'] = record['source']
+        for name, value in record['values'].items():
+            if value is None:
+                continue
+            if not isinstance(value, (bool, int, float)):
+                # Tabs and newlines would break the row
+                value = str(value).replace('\t', ' ').replace('\n', ' ')
+            values[name] = value
+        self.writer.write(values)
+
+    def write(self, record):
+        if record['format'] == 'mol':
+            raise ValueError('Molfile records cannot be written as TSV,'
+                             ' write them as SDF or JSON')
+        if self.writer is None:
+            self.sample.append(record)
+            if len(self.sample) >= self.sample_size:
+                self._create_writer()
+        else:
+            self._write(record)
+
+    def close(self):
+        if self.writer is None:
+            self._create_writer()
+        self.writer.writeFooter()
+        self.writer.close()
+
+
+class _SdfOutput(object):
+    """Writes (molfile) records to an SD file."""
+
+    def __init__(self, file):
+        from .SdfWriter import SdfWriter
+
+        self.writer = SdfWriter(file)
+
+    def write(self, record):
+        if record['format'] != 'mol':
+            raise ValueError('Only molfile records can be written as SDF'
+                             ' (found format %s)' % record['format'])
+        self.writer.write(record['source'], record['values'])
+
+    def close(self):
+        self.writer.close()
+
+
+def convert(input_file, output_file, informat=None, outformat=None,
+            threads=1, level=6, sample_size=1000, smiles_header=False,
+            sort_key=None, sort_type=None, reverse=False,
+            max_memory=None, processes=None):
+    """Converts the input file to the output file, streaming one record
+    at a time. The records can be sorted by one of their values
+    (using an external sort, see external_sort).
+
+    :param input_file: The input filename ('-' for STDIN)
+    :param output_file: The output filename ('-' for STDOUT)
+    :param informat: The input format (guessed from the filename if None)
+    :param outformat: The output format (guessed from the filename if None)
+    :param threads: The number of (gzip) compression threads
+    :param level: The compression level
+    :param sample_size: The number of records used to determine
+                        the TSV output columns
+    :param smiles_header: True if the SMILES input has a header line
+    :param sort_key: The name of the value to sort the records by
+    :param sort_type: The type of the sort value ('int', 'float',
+                      'boolean' or 'string'), if it needs converting
+    :param reverse: Set to sort in descending order
+    :param max_memory: The memory (bytes) used to sort the records
+    :param processes: The number of processes used to sort the records
+                      (None or 0 for one per CPU)
+    :returns: The number of records converted
+    """
+    informat = informat or guess_format(input_file)
+    outformat = outformat or guess_format(output_file)
+    if informat not in INPUT_FORMATS:
+        raise ValueError('Unknown input format for %s' % input_file)
+    if outformat not in OUTPUT_FORMATS:
+        raise ValueError('Unknown output format for %s' % output_file)
+
+    out_file = open_text_output(output_file, threads, level)
+    if outformat in ['json', 'ndjson']:
+        base = None if output_file == '-' else output_base(output_file)
+        output = _JsonOutput(out_file, base, lines=outformat == 'ndjson')
+    elif outformat == 'tsv':
+        output = _TsvOutput(out_file, sample_size)
+    else:
+        output = _SdfOutput(out_file)
+
+    records = read_records(input_file, informat, smiles_header)
+    if sort_key is not None:
+        from .external_sort import DEFAULT_MAX_MEMORY, sort_records
+        records = sort_records(records, sort_key, key_type=sort_type,
+                               reverse=reverse,
+                               max_memory=max_memory or DEFAULT_MAX_MEMORY,
+                               processes=processes)
+
+    count = 0
+    completed = False
+    try:
+        for record in records:
+            output.write(record)
+            count += 1
+        output.close()
+        completed = True
+    finally:
+        if not completed and out_file is not sys.stdout:
+            # Stop any compression threads and remove the incomplete output
+            out_file.close()
+            os.remove(output_file)
+    return count
+
+
+def _convert_command(args):
+    """Handles the 'convert' command."""
+    start = time.time()
+    count = convert(args.input, args.output,
+                    informat=args.informat, outformat=args.outformat,
+                    threads=args.threads, level=args.level,
+                    sample_size=args.sample, smiles_header=args.smiles_header,
+                    sort_key=args.sort, sort_type=args.sort_type,
+                    reverse=args.reverse,
+                    max_memory=args.memory * 1024 * 1024,
+                    processes=args.processes)
+    if args.stats:
+        elapsed = max(time.time() - start, 1e-6)
+        bytes_in = os.path.getsize(args.input) if args.input != '-' else 0
+        bytes_out = os.path.getsize(args.output) if args.output != '-' else 0
+        utils.log('Records: %d in %.2fs (%.0f records/s)'
+                  % (count, elapsed, count / elapsed))
+        utils.log('Input: %d bytes (%.2f MB/s)'
+                  % (bytes_in, bytes_in / elapsed / 1e6))
+        utils.log('Output: %d bytes (%.2f MB/s)'
+                  % (bytes_out, bytes_out / elapsed / 1e6))
+    return 0
+
+
+def _merge_metrics_command(args):
+    """Handles the 'merge-metrics' command."""
+    from .metrics_utils import merge_metrics
+
+    rules = {}
+    for rule in args.rule or []:
+        name, _, rule_name = rule.rpartition('=')
+        rules[name] = rule_name
+    merge_metrics(args.inputs, args.output, rules=rules)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='pipelines_utils',
+                                     description='Informatics Matters'
+                                                 ' pipelines utilities')
+    subparsers = parser.add_subparsers(dest='command')
+
+    convert_parser = subparsers.add_parser(
+        'convert', help='Convert between Squonk JSON, NDJSON, TSV, CSV,'
+                        ' SDF and SMILES files')
+    convert_parser.add_argument('input',
+                                help="Input file ('-' for STDIN)")
+    convert_parser.add_argument('output',
+                                help="Output file ('-' for STDOUT)")
+    convert_parser.add_argument('-if', '--informat', choices=INPUT_FORMATS,
+                                help='Input format. Guessed from the'
+                                     ' filename if not defined.')
+    convert_parser.add_argument('-of', '--outformat', choices=OUTPUT_FORMATS,
+                                help='Output format. Guessed from the'
+                                     ' filename if not defined.')
+    convert_parser.add_argument('--threads', type=int, default=1,
+                                help='Number of threads used to compress'
+                                     ' gzipped output')
+    convert_parser.add_argument('--level', type=int, default=6,
+                                help='Compression level (1-9 for gzip)')
+    convert_parser.add_argument('--sample', type=int, default=1000,
+                                help='Number of records used to determine'
+                                     ' TSV output columns')
+    convert_parser.add_argument('--smiles-header', action='store_true',
+                                help='The SMILES input has a header line')
+    convert_parser.add_argument('--sort', metavar='NAME',
+                                help='Sort the records by this value')
+    convert_parser.add_argument('--sort-type',
+                                choices=['int', 'float', 'boolean', 'string'],
+                                help='Convert the sort value to this type'
+                                     ' (i.e. to sort numbers read as text)')
+    convert_parser.add_argument('--reverse', action='store_true',
+                                help='Sort in descending order')
+    convert_parser.add_argument('--memory', type=int, default=256,
+                                help='Memory (MiB) used to sort records.'
+                                     ' More records are sorted using'
+                                     ' temporary files.')
+    convert_parser.add_argument('--processes', type=int, default=0,
+                                help='Number of processes used to sort'
+                                     ' records (one per CPU by default)')
+    convert_parser.add_argument('--stats', action='store_true',
+                                help='Report records and bytes per second')
+
+    metrics_parser = subparsers.add_parser(
+        'merge-metrics', help='Merge the metrics of parallel (or sharded)'
+                              ' outputs into one metrics file')
+    metrics_parser.add_argument('output',
+                                help='Output base name of the merged metrics')
+    metrics_parser.add_argument('inputs', nargs='+',
+                                help='Output base names of the metrics'
+                                     ' to merge')
+    metrics_parser.add_argument('--rule', action='append',
+                                metavar='NAME=RULE',
+                                help='Merge rule (last, first, min, max or'
+                                     ' sum) for an untyped metric')
+
+    args = parser.parse_args(argv)
+    if args.command == 'convert':
+        return _convert_command(args)
+    if args.command == 'merge-metrics':
+        return _merge_metrics_command(args)
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A registry of compression codecs.
+
+Each codec has a name, a file extension and the magic bytes that start its
+files. Files that are read are recognised by their magic bytes, files that
+are written by their extension (or a codec can be named). The built-in
+codecs are:
+
+=======  =========  ==================================================
+Name     Extension  Module
+=======  =========  ==================================================
+gzip     .gz        gzip
+bz2      .bz2       bz2
+xz       .xz        lzma
+zstd     .zst       zstandard (if installed)
+lz4      .lz4       lz4 (if installed)
+=======  =========  ==================================================
+
+Other codecs can be added with ``register()``. Every codec can append to
+an existing file (adding a new member, stream or frame) and reads files
+made of several of them, as written by a Checkpoint. On Python 2 the bz2
+codec needs the ``bz2file`` module (the ``bz2`` module can do neither) and
+files opened in a text mode are the binary files, as a (native) string is
+bytes.
+"""
+
+import io
+import sys
+from collections import OrderedDict
+
+# The (default) codec used for compressed output
+DEFAULT_CODEC = 'gzip'
+# The number of bytes read to detect a codec
+_MAGIC_SIZE = 8
+_PY2 = sys.version_info[0] == 2
+
+_CODECS = OrderedDict()
+
+
+class Codec(object):
+    """A compression codec."""
+
+    def __init__(self, name, extension, magic, opener, module=None):
+        """Basic initialiser.
+
+        :param name: The codec name
+        :param extension: The file extension (including the '.')
+        :param magic: The bytes at the start of a compressed file
+        :param opener: A function, called with a filename, a mode
+                       ('rb', 'wb', 'ab', 'rt', 'wt' or 'at'), a compression
+                       level (None for the codec's default) and a text
+                       encoding (None for the default), that returns
+                       an open file.
+        :param module: The name of a module the codec needs. The codec
+                       is unavailable if it's not installed.
+        """
+        self.name = name
+        self.extension = extension
+        self.magic = magic
+        self.opener = opener
+        self.module = module
+
+    @property
+    def available(self):
+        """True if the codec's module (if it needs one) is installed."""
+        if self.module is None:
+            return True
+        try:
+            __import__(self.module)
+        except ImportError:
+            return False
+        return True
+
+    def open(self, filename, mode='rb', level=None, encoding=None):
+        """Opens a (compressed) file.
+
+        :param filename: The file
+        :param mode: The mode, 'rb', 'wb', 'ab', 'rt', 'wt' or 'at'
+        :param level: The compression level (None for the codec's default)
+        :param encoding: The text encoding (None for the default)
+        :returns: A file object
+        """
+        if not self.available:
+            raise ValueError('The %s codec requires the %s module'
+                             % (self.name, self.module))
+        return self.opener(filename, mode, level, encoding)
+
+
+def register(codec):
+    """Adds (or replaces) a codec.
+
+    :param codec: The Codec
+    """
+    _CODECS[codec.name] = codec
+
+
+def get_codec(name):
+    """Returns the named codec.
+
+    :raises: ValueError if the codec is unknown or unavailable
+    """
+    codec = _CODECS.get(name)
+    if codec is None:
+        raise ValueError('Unknown codec: ' + str(name))
+    if not codec.available:
+        raise ValueError('The %s codec requires the %s module'
+                         % (codec.name, codec.module))
+    return codec
+
+
+def codec_names(available=True):
+    """Returns the names of the (available) codecs."""
+    return [codec.name for codec in _CODECS.values()
+            if codec.available or not available]
+
+
+def codec_for_filename(filename):
+    """Returns the codec implied by a filename's extension, or None."""
+    name = filename.lower()
+    for codec in _CODECS.values():
+        if name.endswith(codec.extension):
+            return codec
+    return None
+
+
+def split_extension(filename):
+    """Splits a filename into its name without any codec extension
+    and the codec, i.e. ('a.sdf', <gzip>) for 'a.sdf.gz'.
+    The codec is None if the filename has no codec extension.
+    """
+    codec = codec_for_filename(filename)
+    if codec is None:
+        return filename, None
+    return filename[:-len(codec.extension)], codec
+
+
+def detect(data):
+    """Returns the codec whose magic bytes start the data, or None."""
+    for codec in _CODECS.values():
+        if data.startswith(codec.magic):
+            return codec
+    return None
+
+
+def detect_file(filename):
+    """Returns the codec of a file (from its magic bytes), or None."""
+    with open(filename, 'rb') as raw:
+        return detect(raw.read(_MAGIC_SIZE))
+
+
+def open_file(filename, mode='rb', codec=None, level=None, encoding=None):
+    """Opens a file, compressed or not. A file that is read is decompressed
+    if it starts with a codec's magic bytes. A file that is written
+    (or appended to) is compressed if its extension is a codec's.
+
+    :param filename: The file
+    :param mode: The mode, 'rb', 'wb', 'ab', 'rt', 'wt' or 'at'
+    :param codec: The name of the codec to use, rather than detecting it
+    :param level: The compression level (None for the codec's default)
+    :param encoding: The text encoding (None for the default)
+    :returns: A file object
+    """
+    if codec is not None:
+        found = get_codec(codec)
+    elif mode.startswith('r'):
+        found = detect_file(filename)
+    else:
+        found = codec_for_filename(filename)
+    if found is None:
+        if 't' in mode and not _PY2:
+            return io.open(filename, mode, encoding=encoding)
+        return open(filename, mode[0] + 'b')
+    return found.open(filename, mode, level, encoding)
+
+
+def _text(stream, mode, encoding):
+    """Returns a text file reading (or writing) a binary stream if the mode
+    is a text mode (and this is Python 3), otherwise the stream.
+    """
+    if 't' in mode and not _PY2:
+        return io.TextIOWrapper(stream, encoding=encoding)
+    return stream
+
+
+def _stdlib_opener(module_name, class_name, level_arg):
+    """Returns an opener for a module's (binary) compressed file class."""
+
+    def opener(filename, mode, level, encoding):
+        module = __import__(module_name)
+        kwargs = {}
+        if level is not None and not mode.startswith('r'):
+            kwargs[level_arg] = level
+        stream = getattr(module, class_name)(filename, mode[0] + 'b',
+                                             **kwargs)
+        return _text(stream, mode, encoding)
+
+    return opener
+
+
+def _open_zstd(filename, mode, level, encoding):
+    import zstandard
+    if mode.startswith('r'):
+        # Read every frame (appended files have more than one)
+        stream = zstandard.ZstdDecompressor().stream_reader(
+            open(filename, 'rb'), read_across_frames=True, closefd=True)
+    else:
+        compressor = zstandard.ZstdCompressor(
+            level=3 if level is None else level)
+        stream = compressor.stream_writer(open(filename, mode[0] + 'b'),
+                                          closefd=True)
+    return _text(stream, mode, encoding)
+
+
+def _open_lz4(filename, mode, level, encoding):
+    import lz4.frame
+    kwargs = {}
+    if level is not None and not mode.startswith('r'):
+        kwargs['compression_level'] = level
+    if 't' in mode:
+        kwargs['encoding'] = encoding
+    return lz4.frame.open(filename, mode, **kwargs)
+
+
+_BZ2_MODULE = 'bz2file' if _PY2 else 'bz2'
+
+register(Codec('gzip', '.gz', b'\x1f\x8b',
+               _stdlib_opener('gzip', 'GzipFile', 'compresslevel')))
+register(Codec('bz2', '.bz2', b'BZh',
+               _stdlib_opener(_BZ2_MODULE, 'BZ2File', 'compresslevel'),
+               module=_BZ2_MODULE))
+register(Codec('xz', '.xz', b'\xfd7zXZ\x00',
+               _stdlib_opener('lzma', 'LZMAFile', 'preset'), module='lzma'))
+register(Codec('zstd', '.zst', b'\x28\xb5\x2f\xfd',
+               _open_zstd, module='zstandard'))
+register(Codec('lz4', '.lz4', b'\x04\x22\x4d\x18',
+               _open_lz4, module='lz4.frame'))
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""External (merge) sort of records.
+
+Sorts a stream of records (dictionaries, i.e. from the TypedColumnReader,
+StreamJsonListLoader or JsonLinesReader) that is too large to be sorted in
+memory. Records are collected into runs that fit within a memory budget,
+each run is sorted and written to a temporary file and the runs are then
+merged, returning the records in order. Runs can be sorted and written by
+a pool of processes.
+
+Records are sorted by the value of a field, optionally converted using one
+of the TypedColumnReader's type converters (so that, for example, numbers
+read as strings are ordered numerically). Records without a value are
+placed at the end. The sort is stable.
+"""
+
+import collections
+import heapq
+import itertools
+import multiprocessing
+import operator
+import os
+import pickle
+import tempfile
+
+from .TypedColumnReader import CONVERTERS
+
+# The default memory budget (bytes)
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024
+# The maximum number of runs merged at once.
+# More runs are merged in several passes.
+MAX_MERGE_WIDTH = 64
+# The number of records used to estimate the size of a record
+_SAMPLE_SIZE = 100
+# The smallest run (records)
+_MIN_RUN_SIZE = 100
+
+
+class FieldKey(object):
+    """Returns the sort key of a record, the value of one of its fields.
+    If the record has a 'values' dictionary (i.e. it's a Squonk object)
+    the field is one of its values. Records without a value sort after
+    those with one.
+    """
+
+    def __init__(self, field, key_type=None, reverse=False):
+        """Basic initialiser.
+
+        :param field: The field (name)
+        :param key_type: The name of a TypedColumnReader type ('int',
+                         'float', 'boolean' or 'string') used to convert
+                         the value before it's compared.
+        :param reverse: Set if the sort is in descending order
+                        (so records without a value still sort last)
+        """
+        self.field = field
+        self.converter = CONVERTERS[key_type.lower()] if key_type else None
+        self.missing = -1 if reverse else 1
+
+    def __call__(self, record):
+        values = record.get('values')
+        if not isinstance(values, dict):
+            values = record
+        value = values.get(self.field)
+        if value is None:
+            return self.missing, 0
+        if self.converter is not None and not isinstance(value, bool):
+            value = self.converter(str(value))
+        return 0, value
+
+
+class _Reversed(object):
+    """Reverses the order of a key."""
+
+    __slots__ = ['key']
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def sort_records(records, key, key_type=None, reverse=False,
+                 max_memory=DEFAULT_MAX_MEMORY, processes=None, tmp_dir=None):
+    """Returns a generator of the records sorted by a key. The records
+    can be written to any of the writers as they're returned.
+
+    :param records: An iterable of records (dictionaries)
+    :param key: The name of the field to sort by (see FieldKey)
+                or a function that returns a record's key. When using more
+                than one process the function must be picklable.
+    :param key_type: The type of the field's value (see FieldKey)
+    :param reverse: Set to sort in descending order
+    :param max_memory: The (approximate) memory, in bytes, used to hold
+                       records, estimated from their pickled size.
+                       Records are written to temporary files
+                       if they do not fit.
+    :param processes: The number of processes used to sort runs
+                      (None or 0 for one per CPU). The records are
+                      sorted in this process if they fit in memory.
+    :param tmp_dir: The directory used for temporary files
+                    (the system default if None)
+    :returns: A generator of records
+    """
+    if not callable(key):
+        key = FieldKey(key, key_type, reverse)
+    if not processes:
+        processes = multiprocessing.cpu_count()
+
+    records = iter(records)
+    sample = list(itertools.islice(records, _SAMPLE_SIZE))
+    if not sample:
+        return
+    record_size = max(1, len(pickle.dumps(sample, pickle.HIGHEST_PROTOCOL))
+                      // len(sample))
+    # With a pool there's a run being collected
+    # as well as one being sorted by each process
+    runs_in_memory = processes + 1 if processes > 1 else 1
+    run_size = max(_MIN_RUN_SIZE, max_memory // record_size // runs_in_memory)
+
+    first_run = sample + list(itertools.islice(records, run_size - len(sample)))
+    if len(first_run) < run_size:
+        # Everything fits in memory
+        first_run.sort(key=key, reverse=reverse)
+        for record in first_run:
+            yield record
+        return
+
+    # Every temporary file (removed when done)
+    temp_files = []
+    try:
+        sort_run = _SortRun(key, reverse, tmp_dir)
+        chunks = itertools.chain([first_run], _chunks(records, run_size))
+        first_run = None
+        runs = []
+        if processes > 1:
+            # Only a limited number of runs are submitted at once
+            # (the pool's map functions would read all the records)
+            pool = multiprocessing.Pool(processes)
+            try:
+                pending = collections.deque()
+                for chunk in chunks:
+                    pending.append(pool.apply_async(sort_run, (chunk,)))
+                    chunk = None
+                    if len(pending) >= processes:
+                        runs.append(pending.popleft().get())
+                        temp_files.append(runs[-1])
+                while pending:
+                    runs.append(pending.popleft().get())
+                    temp_files.append(runs[-1])
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            for chunk in chunks:
+                runs.append(sort_run(chunk))
+                temp_files.append(runs[-1])
+            chunk = None
+
+        # Merge (in several passes if there are too many runs)
+        while len(runs) > MAX_MERGE_WIDTH:
+            merged = []
+            for i in range(0, len(runs), MAX_MERGE_WIDTH):
+                group = runs[i:i + MAX_MERGE_WIDTH]
+                merged.append(_write_run(_merge(group, reverse), tmp_dir))
+                temp_files.append(merged[-1])
+                for filename in group:
+                    os.remove(filename)
+            runs = merged
+
+        for _, _, _, record in _merge(runs, reverse):
+            yield record
+
+    finally:
+        for filename in temp_files:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+def _chunks(records, size):
+    """Returns a generator of lists of (up to) size records."""
+    while True:
+        chunk = list(itertools.islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _SortRun(object):
+    """Sorts a run of records and writes them to a temporary file
+    (returning its name). A class, rather than a closure,
+    so it can be used by a process pool.
+    """
+
+    def __init__(self, key, reverse, tmp_dir):
+        self.key = key
+        self.reverse = reverse
+        self.tmp_dir = tmp_dir
+
+    def __call__(self, chunk):
+        key = self.key
+        entries = [(key(record), record) for record in chunk]
+        # The sort is stable (also when reversed)
+        entries.sort(key=operator.itemgetter(0), reverse=self.reverse)
+        return _write_run(entries, self.tmp_dir)
+
+
+def _write_run(entries, tmp_dir):
+    """Writes (key, record) entries to a temporary file,
+    returning its name. Merge entries can also be written.
+    """
+    handle, filename = tempfile.mkstemp(prefix='pipelines-sort-',
+                                        suffix='.run', dir=tmp_dir)
+    with os.fdopen(handle, 'wb') as run_file:
+        pickler = pickle.Pickler(run_file, pickle.HIGHEST_PROTOCOL)
+        for entry in entries:
+            key = entry[0]
+            if isinstance(key, _Reversed):
+                key = key.key
+            pickler.dump((key, entry[-1]))
+            # The pickler's memo would otherwise keep every record
+            pickler.clear_memo()
+    return filename
+
+
+def _read_run(filename, run_number, reverse):
+    """Returns a generator of merge entries, (key, run, position, record),
+    from a run file. The run and position keep the merge stable.
+    """
+    with open(filename, 'rb') as run_file:
+        unpickler = pickle.Unpickler(run_file)
+        position = 0
+        while True:
+            try:
+                key, record = unpickler.load()
+            except EOFError:
+                return
+            yield (_Reversed(key) if reverse else key,
+                   run_number, position, record)
+            position += 1
+
+
+def _merge(runs, reverse):
+    """Returns a generator of the merged entries of a set of runs."""
+    return heapq.merge(*[_read_run(filename, i, reverse)
+                         for i, filename in enumerate(runs)])
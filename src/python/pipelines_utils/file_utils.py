@@ -16,7 +16,7 @@
 
 from __future__ import print_function
 import os
-from . import utils
+from . import compression_utils, utils
 
 # Files are normally located in sub-directories of the pipeline module path.
 # For example a pipeline module 'pipeline_a.py'  that expects to use a file
@@ -54,7 +54,8 @@ def pick_sdf(filename, directory=None):
     """Returns a full path to the chosen SDF file. The supplied file
     is not expected to contain a recognised SDF extension, this is added
     automatically.
-    If a file with the extension `.sdf.gz` or `.sdf` is found the path to it
+    If a file with the extension `.sdf.gz` (or that of another compression
+    codec) or `.sdf` is found the path to it
     (excluding the extension) is returned. If this fails, `None` is returned.
 
     :param filename: The SDF file basename, whose path is required.
@@ -75,19 +76,15 @@ def pick_sdf(filename, directory=None):
             directory = directory[len(os.getcwd()) + 1:]
 
     file_path = os.path.join(directory, filename)
-    if os.path.isfile(file_path + '.sdf.gz'):
-        return file_path + '.sdf.gz'
-    elif os.path.isfile(file_path + '.sdf'):
-        return file_path + '.sdf'
-    # Couldn't find a suitable SDF file
-    return None
+    return _pick_extension(file_path, '.sdf')
 
 
 def pick_csv(filename, directory=None):
     """Returns a full path to the chosen CSV file. The supplied file
     is not expected to contain a recognised CSV extension, this is added
     automatically.
-    If a file with the extension `.csv.gz` or `.csv` is found the path to it
+    If a file with the extension `.csv.gz` (or that of another compression
+    codec) or `.csv` is found the path to it
     (excluding the extension) is returned. If this fails, `None` is returned.
 
     :param filename: The CSV file basename, whose path is required.
@@ -108,19 +105,15 @@ def pick_csv(filename, directory=None):
             directory = directory[len(os.getcwd()) + 1:]
 
     file_path = os.path.join(directory, filename)
-    if os.path.isfile(file_path + '.csv.gz'):
-        return file_path + '.csv.gz'
-    elif os.path.isfile(file_path + '.csv'):
-        return file_path + '.csv'
-    # Couldn't find a suitable CSV file
-    return None
+    return _pick_extension(file_path, '.csv')
 
 
 def pick_smi(filename, directory=None):
     """Returns a full path to the chosen SMI file. The supplied file
     is not expected to contain a recognised SMI extension, this is added
     automatically.
-    If a file with the extension `.smi.gz` or `.smi` is found the path to it
+    If a file with the extension `.smi.gz` (or that of another compression
+    codec) or `.smi` is found the path to it
     (excluding the extension) is returned. If this fails, `None` is returned.
 
     :param filename: The SMI file basename, whose path is required.
@@ -141,9 +134,18 @@ def pick_smi(filename, directory=None):
             directory = directory[len(os.getcwd()) + 1:]
 
     file_path = os.path.join(directory, filename)
-    if os.path.isfile(file_path + '.smi.gz'):
-        return file_path + '.smi.gz'
-    elif os.path.isfile(file_path + '.smi'):
-        return file_path + '.smi'
-    # Couldn't find a suitable SMI file
+    return _pick_extension(file_path, '.smi')
+
+
+def _pick_extension(file_path, extension):
+    """Returns the file with the extension, compressed (with any of the
+    available codecs, gzip first) or not, or None if there isn't one.
+    """
+    for name in compression_utils.codec_names():
+        candidate = file_path + extension + \
+            compression_utils.get_codec(name).extension
+        if os.path.isfile(candidate):
+            return candidate
+    if os.path.isfile(file_path + extension):
+        return file_path + extension
     return None
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Optional instrumentation of the readers and writers.
+
+Instrumentation is enabled by setting the ``PIPELINES_UTILS_INSTRUMENT``
+environment variable (to anything other than an empty string, ``0``,
+``false``, ``no`` or ``off``). Each reader and writer then counts the
+records it handles and accumulates the time it spends reading, parsing,
+encoding and writing. Readers count the ``bytes`` of the (uncompressed)
+content they read and the JSON writers the ``chars`` of the text they
+write, before it's encoded and compressed. Reading and writing times
+include any decompression and compression, as does the time to close
+a writer (``close_seconds``), which compresses what's left.
+
+Components decide whether to record anything when they are created
+(by calling ``recorder()``, which returns None when instrumentation is off)
+so, when disabled, the cost is a test of a local variable. When enabled,
+values are accumulated by each component and added to the process-wide
+totals as it finishes (i.e. when a reader is exhausted or a writer closed).
+
+The totals are available as a dictionary (``snapshot()``) and are
+written to the metrics file whenever ``utils.write_metrics()`` (or
+``utils.update_metrics()``) is called.
+"""
+
+import os
+
+try:
+    from _thread import allocate_lock
+    from time import perf_counter as clock
+except ImportError:
+    # Python 2
+    from thread import allocate_lock
+    from time import time as clock
+
+# The environment variable that enables instrumentation
+ENV_VAR = 'PIPELINES_UTILS_INSTRUMENT'
+# The prefix of the instrumentation metrics keys
+METRICS_PREFIX = 'pipelines_utils.'
+
+_FALSE_VALUES = ['', '0', 'false', 'no', 'off']
+
+_enabled = os.environ.get(ENV_VAR, '').strip().lower() not in _FALSE_VALUES
+_lock = allocate_lock()
+# The totals, a dictionary of component name and dictionary of values
+_totals = {}
+
+
+class Recorder(object):
+    """Accumulates the values of a single component instance.
+    Values are held locally (without locking) until flushed.
+    """
+
+    def __init__(self, component):
+        self.component = component
+        self.values = {}
+
+    def add(self, name, value=1):
+        """Adds a value to a counter (or timer) of this component."""
+        self.values[name] = self.values.get(name, 0) + value
+
+    def flush(self):
+        """Adds the accumulated values to the process totals."""
+        if self.values:
+            add_values(self.component, self.values)
+            self.values = {}
+
+
+def is_enabled():
+    """Returns True if instrumentation is enabled."""
+    return _enabled
+
+
+def enable(enabled=True):
+    """Enables (or disables) instrumentation. Only components created
+    after the call are affected.
+    """
+    global _enabled
+    _enabled = enabled
+
+
+def recorder(component):
+    """Returns a Recorder for a component, or None if instrumentation
+    is not enabled.
+
+    :param component: The component name, i.e. 'SdfReader'
+    """
+    if _enabled:
+        return Recorder(component)
+    return None
+
+
+def add_values(component, values):
+    """Adds values to the totals of a component.
+
+    :param component: The component name
+    :param values: A dictionary of counter (or timer) names and values
+    """
+    with _lock:
+        totals = _totals.setdefault(component, {})
+        for name, value in values.items():
+            totals[name] = totals.get(name, 0) + value
+
+
+def reset():
+    """Discards all the totals."""
+    with _lock:
+        _totals.clear()
+
+
+def snapshot():
+    """Returns a copy of the totals, a dictionary of component names
+    and a dictionary of their values. Timers (whose names end
+    ``_seconds``) are in seconds.
+    """
+    with _lock:
+        return dict((component, dict(values))
+                    for component, values in _totals.items())
+
+
+def as_metrics():
+    """Returns the totals as a flat dictionary suitable for the metrics
+    file, with keys of the form ``pipelines_utils.<component>.<name>``.
+    """
+    metrics = {}
+    for component, values in snapshot().items():
+        for name, value in values.items():
+            if isinstance(value, float):
+                value = round(value, 6)
+            metrics[METRICS_PREFIX + component + '.' + name] = value
+    return metrics
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Buffered logging and progress reporting.
+
+A ``Logger`` writes (optionally structured) lines to STDERR. Lines are
+collected in a buffer that is written when it's full, when a second has
+passed since it was last written and when a warning or error is logged,
+rather than with a write for every line. The default logger
+(``get_logger()``) is also flushed when the process exits, other loggers
+must be flushed by their owner. Lines
+below the logger's level are dropped before their message is formatted,
+so they cost little more than a method call. The default level is set by
+the ``PIPELINES_UTILS_LOG_LEVEL`` environment variable (``debug``,
+``info``, ``warning`` or ``error``, ``info`` if not set).
+
+A ``ProgressReporter`` counts the records (and bytes) a pipeline processes
+and logs the throughput at a fixed interval, rather than for every record.
+Given the input file it also logs the percentage complete and an ETA,
+based on the position in the (compressed) input file::
+
+    reader = SdfReader(inputFile)
+    progress = ProgressReporter(source=reader.stream)
+    for record in reader:
+        ...
+        progress.update()
+    progress.finish()
+"""
+
+from __future__ import print_function
+import atexit
+import os
+import sys
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+
+# The environment variable that sets the default level
+ENV_VAR = 'PIPELINES_UTILS_LOG_LEVEL'
+# The default size (characters) and age (seconds) of the buffer
+DEFAULT_BUFFER_SIZE = 65536
+DEFAULT_FLUSH_SECONDS = 1.0
+# The default interval (seconds) between progress reports
+DEFAULT_INTERVAL = 10.0
+
+_LEVEL_NAMES = dict((level, name.upper()) for name, level in LEVELS.items())
+# Attributes that lead from a (text or compressed) file to the file below it
+_WRAPPED_FILE_ATTRS = ['buffer', 'fileobj', '_fp', 'raw']
+
+
+def default_level():
+    """Returns the level set by the environment (INFO if it's not)."""
+    return LEVELS.get(os.environ.get(ENV_VAR, '').strip().lower(), INFO)
+
+
+class Logger(object):
+    """A buffered logger (see the module documentation)."""
+
+    def __init__(self, level=None, stream=None, structured=False,
+                 buffer_size=DEFAULT_BUFFER_SIZE,
+                 flush_seconds=DEFAULT_FLUSH_SECONDS):
+        """Basic initialiser.
+
+        :param level: The lowest level logged (the default level if None)
+        :param stream: The stream written to (STDERR if None)
+        :param structured: Set to write each line as a JSON object
+                           (with 'time', 'level' and 'message' keys and
+                           any additional fields)
+        :param buffer_size: The size (characters) of the buffer
+        :param flush_seconds: The longest time a line is buffered (roughly,
+                              it's written by the next line logged after
+                              this time)
+        """
+        self.level = default_level() if level is None else level
+        self.stream = stream
+        self.structured = structured
+        self.buffer_size = buffer_size
+        self.flush_seconds = flush_seconds
+        self._buffer = []
+        self._buffered = 0
+        self._last_flush = time.time()
+
+    def enabled(self, level):
+        """Returns True if lines of a level are logged."""
+        return level >= self.level
+
+    def debug(self, message, *args, **fields):
+        if DEBUG >= self.level:
+            self.log(DEBUG, message, *args, **fields)
+
+    def info(self, message, *args, **fields):
+        if INFO >= self.level:
+            self.log(INFO, message, *args, **fields)
+
+    def warning(self, message, *args, **fields):
+        if WARNING >= self.level:
+            self.log(WARNING, message, *args, **fields)
+
+    def error(self, message, *args, **fields):
+        if ERROR >= self.level:
+            self.log(ERROR, message, *args, **fields)
+
+    def log(self, level, message, *args, **fields):
+        """Logs a line.
+
+        :param level: The level of the line
+        :param message: The message, formatted with any args
+                        (using the % operator)
+        :param fields: Additional (JSON-serialisable) values, written as
+                       name=value pairs after the message or as
+                       members of a structured line
+        """
+        if level < self.level:
+            return
+        if args:
+            message = message % args
+        now = time.time()
+        if self.structured:
+            import json
+            entry = {'time': round(now, 3), 'level': _LEVEL_NAMES[level],
+                     'message': message}
+            entry.update(fields)
+            line = json.dumps(entry, sort_keys=True) + '\n'
+        else:
+            if fields:
+                message += ' ' + ' '.join(['%s=%s' % (name, fields[name])
+                                           for name in sorted(fields)])
+            if level != INFO:
+                message = _LEVEL_NAMES[level] + ' ' + message
+            line = message + '\n'
+        self._buffer.append(line)
+        self._buffered += len(line)
+        if level >= WARNING or self._buffered >= self.buffer_size or \
+                now - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """Writes any buffered lines."""
+        if self._buffer:
+            stream = self.stream or sys.stderr
+            stream.write(''.join(self._buffer))
+            stream.flush()
+            self._buffer = []
+            self._buffered = 0
+        self._last_flush = time.time()
+
+
+_logger = None
+
+
+def get_logger():
+    """Returns the (process-wide) default Logger."""
+    global _logger
+    if _logger is None:
+        _logger = Logger()
+        atexit.register(_logger.flush)
+    return _logger
+
+
+def raw_file(stream):
+    """Returns the (compressed) file below a file object, i.e. the file
+    a gzip file (or a text file wrapping it) reads from.
+    """
+    while True:
+        for attr in _WRAPPED_FILE_ATTRS:
+            below = getattr(stream, attr, None)
+            if below is not None and below is not stream and \
+                    hasattr(below, 'tell'):
+                stream = below
+                break
+        else:
+            return stream
+
+
+class ProgressReporter(object):
+    """Logs the progress of a pipeline at a fixed interval
+    (see the module documentation).
+    """
+
+    def __init__(self, source=None, total_bytes=None,
+                 interval=DEFAULT_INTERVAL, logger=None, name='Progress'):
+        """Basic initialiser.
+
+        :param source: The input file object (i.e. a reader's stream).
+                       The position in the underlying (compressed) file is
+                       used to estimate the percentage complete and the ETA.
+        :param total_bytes: The size of the (compressed) input file
+                            (the size of the source's file if None)
+        :param interval: The time (seconds) between reports
+        :param logger: The Logger (the default Logger if None)
+        :param name: The name reports start with
+        """
+        self.interval = interval
+        self.logger = logger or get_logger()
+        self.name = name
+        # The records and (uncompressed) bytes processed
+        self.records = 0
+        self.bytes = 0
+        self._raw = raw_file(source) if source is not None else None
+        self.total_bytes = total_bytes
+        if self.total_bytes is None and self._raw is not None:
+            try:
+                self.total_bytes = os.fstat(self._raw.fileno()).st_size
+            except (AttributeError, OSError, ValueError):
+                self.total_bytes = None
+        self.start = time.time()
+        self._next_report = self.start + interval
+
+    def update(self, records=1, bytes=0):
+        """Adds to the records (and bytes) processed,
+        logging the progress if it's time to.
+        """
+        self.records += records
+        self.bytes += bytes
+        now = time.time()
+        if now >= self._next_report:
+            self._next_report = now + self.interval
+            self.report(now)
+
+    def position(self):
+        """Returns the position in the (compressed) input file,
+        or None if it's not known.
+        """
+        if self._raw is None:
+            return None
+        try:
+            return self._raw.tell()
+        except (OSError, ValueError):
+            return None
+
+    def report(self, now=None):
+        """Logs the progress."""
+        elapsed = max((now or time.time()) - self.start, 1e-6)
+        message = '%s: %d records (%.0f records/s)' \
+                  % (self.name, self.records, self.records / elapsed)
+        fields = {'records': self.records,
+                  'seconds': round(elapsed, 1)}
+        if self.bytes:
+            message += ', %.1f MB (%.2f MB/s)' \
+                       % (self.bytes / 1e6, self.bytes / elapsed / 1e6)
+            fields['bytes'] = self.bytes
+        position = self.position()
+        if position and self.total_bytes:
+            fraction = min(1.0, float(position) / self.total_bytes)
+            eta = elapsed * (1 - fraction) / fraction
+            message += ', %.1f%% ETA %s' % (fraction * 100,
+                                            format_seconds(eta))
+            fields['eta_seconds'] = round(eta, 1)
+        if self.logger.structured:
+            self.logger.info(message, **fields)
+        else:
+            self.logger.info(message)
+
+    def finish(self):
+        """Logs the final progress (and flushes the logger)."""
+        elapsed = max(time.time() - self.start, 1e-6)
+        message = '%s: %d records in %s (%.0f records/s)' \
+                  % (self.name, self.records, format_seconds(elapsed),
+                     self.records / elapsed)
+        if self.bytes:
+            message += ', %.1f MB (%.2f MB/s)' \
+                       % (self.bytes / 1e6, self.bytes / elapsed / 1e6)
+        self.logger.info(message)
+        self.logger.flush()
+
+
+def format_seconds(seconds):
+    """Formats a duration as H:MM:SS."""
+    seconds = int(round(seconds))
+    return '%d:%02d:%02d' % (seconds // 3600, seconds // 60 % 60,
+                             seconds % 60)
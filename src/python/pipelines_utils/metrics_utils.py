@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Typed metrics, and the merging of metrics from parallel runs.
+
+A ``Metrics`` object collects typed values:
+
+*   counters, which are added to and summed when merged
+*   gauges, values that are set, merged by a declared rule
+    ('last', 'first', 'min', 'max' or 'sum')
+*   timers, which accumulate seconds (and a count of what was timed)
+    and are summed when merged
+
+Values are held in memory and appended, when flushed, to a journal
+(``<output>_metrics.journal``) as one JSON line per changed metric. Each
+flush is a single append, so the journal is never rewritten and a reader
+never sees a partly written flush (an incomplete last line, left by a
+process that was killed, is ignored). When closed the totals are also
+added to the ``<output>_metrics.txt`` file (see ``utils.update_metrics()``).
+
+The metrics of a number of workers (or shards) are combined with
+``merge_metrics()``, which reads their ``_metrics.txt`` files (which also
+have the metrics of their writers, i.e. ``__OutputCount__``) and journals
+and writes one ``_metrics.txt`` file that the PipelineTester ``metrics``
+block can check::
+
+    metrics = Metrics(outputBase)
+    metrics.counter('__InputCount__')
+    metrics.gauge('maxHeavyAtoms', hac, rule='max')
+    with metrics.timer('scoring'):
+        score(molecule)
+    metrics.close()
+
+    merge_metrics(['shard.00001', 'shard.00002'], 'output')
+"""
+
+import json
+import os
+import time
+
+from . import utils
+
+# The extension of a metrics journal (added to the output base name)
+JOURNAL_EXT = '_metrics.journal'
+# The metrics (summary) file extension
+METRICS_EXT = '_metrics.txt'
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+TIMER = 'timer'
+# The merge rules (for gauges), and the functions that apply them
+MERGE_RULES = {'last': lambda old, new: new,
+               'first': lambda old, new: old,
+               'min': min,
+               'max': max,
+               'sum': lambda old, new: old + new}
+# The suffix of the (summary) key for a timer's count
+TIMER_COUNT_SUFFIX = '.count'
+
+
+class Metric(object):
+    """A typed metric value."""
+
+    __slots__ = ['name', 'type', 'rule', 'value', 'count']
+
+    def __init__(self, name, metric_type, rule, value, count=0):
+        self.name = name
+        self.type = metric_type
+        self.rule = rule
+        self.value = value
+        # The number of things timed (timers)
+        self.count = count
+
+    def merge(self, other):
+        """Merges another value of the metric into this one.
+
+        :raises: ValueError if the metrics are of different types or rules
+        """
+        if other.type != self.type or other.rule != self.rule:
+            raise ValueError('Metric %s is a %s (%s) and a %s (%s)'
+                             % (self.name, self.type, self.rule,
+                                other.type, other.rule))
+        self.value = MERGE_RULES[self.rule](self.value, other.value)
+        self.count += other.count
+
+    def summary(self):
+        """Returns the (summary) key/value pairs of the metric."""
+        if self.type == TIMER:
+            return {self.name: self.value,
+                    self.name + TIMER_COUNT_SUFFIX: self.count}
+        return {self.name: self.value}
+
+    def to_json(self):
+        entry = {'name': self.name, 'type': self.type, 'value': self.value}
+        if self.type == GAUGE:
+            entry['rule'] = self.rule
+        if self.type == TIMER:
+            entry['count'] = self.count
+        return entry
+
+    @classmethod
+    def from_json(cls, entry):
+        metric_type = entry['type']
+        if metric_type == GAUGE:
+            rule = entry.get('rule', 'last')
+        else:
+            rule = 'sum'
+        return cls(entry['name'], metric_type, rule, entry['value'],
+                   entry.get('count', 0))
+
+
+class _Timing(object):
+    """A context manager that adds the time it's active to a timer."""
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.add_time(self.name, time.time() - self.start)
+        return False
+
+
+class Metrics(object):
+    """Collects typed metrics, journaling them when flushed
+    (see the module documentation).
+    """
+
+    def __init__(self, outputBase):
+        """Basic initialiser.
+
+        :param outputBase: The output base name. The journal and metrics
+                           file are named after it.
+        """
+        self.outputBase = outputBase
+        self.journal = outputBase + JOURNAL_EXT
+        # The totals, keyed by name
+        self.metrics = {}
+        # Changes since the last flush, keyed by name
+        self._pending = {}
+
+    def counter(self, name, value=1):
+        """Adds to a counter."""
+        self._update(Metric(name, COUNTER, 'sum', value))
+
+    def gauge(self, name, value, rule='last'):
+        """Sets a gauge.
+
+        :param name: The metric name
+        :param value: The value
+        :param rule: How values are merged, 'last', 'first', 'min', 'max'
+                     or 'sum'. This also applies to the values set here.
+        """
+        if rule not in MERGE_RULES:
+            raise ValueError('Unknown merge rule: ' + str(rule))
+        self._update(Metric(name, GAUGE, rule, value))
+
+    def add_time(self, name, seconds, count=1):
+        """Adds time to a timer."""
+        self._update(Metric(name, TIMER, 'sum', seconds, count))
+
+    def timer(self, name):
+        """Returns a context manager that adds the time
+        it's active to a timer.
+        """
+        return _Timing(self, name)
+
+    def value(self, name, default=None):
+        """Returns the value of a metric."""
+        metric = self.metrics.get(name)
+        return default if metric is None else metric.value
+
+    def flush(self):
+        """Appends the changes since the last flush to the journal."""
+        if not self._pending:
+            return
+        lines = [json.dumps(metric.to_json(), sort_keys=True)
+                 for metric in self._pending.values()]
+        append_journal(self.journal, lines)
+        self._pending = {}
+
+    def close(self):
+        """Flushes the journal and writes the totals to the metrics file."""
+        self.flush()
+        utils.update_metrics(self.outputBase, summary(self.metrics))
+
+    def _update(self, metric):
+        for metrics in [self.metrics, self._pending]:
+            existing = metrics.get(metric.name)
+            if existing is None:
+                metrics[metric.name] = Metric(metric.name, metric.type,
+                                              metric.rule, metric.value,
+                                              metric.count)
+            else:
+                existing.merge(metric)
+
+
+def append_journal(filename, lines):
+    """Appends lines to a journal with a single write."""
+    data = ''.join([line + '\n' for line in lines]).encode('utf-8')
+    fd = os.open(filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        # A write can be short (i.e. if interrupted by a signal)
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+
+def read_journal(filename, metrics=None):
+    """Reads (and merges) the metrics in a journal.
+
+    :param filename: The journal
+    :param metrics: A dictionary of metrics the journal's are merged into
+    :returns: A dictionary of Metric objects, keyed by name
+    """
+    if metrics is None:
+        metrics = {}
+    with open(filename, 'r') as journal:
+        lines = journal.read().split('\n')
+    # The last line is empty unless a write was incomplete
+    for line in lines[:-1]:
+        if line:
+            _merge_into(metrics, Metric.from_json(json.loads(line)))
+    return metrics
+
+
+def read_metrics_file(baseName, metrics=None, rules=None):
+    """Reads (and merges) the metrics in a (summary) metrics file.
+    The file has no types so numbers are merged as counters (summed)
+    and anything else as a gauge (the last value), unless they're
+    given a rule.
+
+    :param baseName: The output base name
+    :param metrics: A dictionary of metrics the file's are merged into
+    :param rules: An optional dictionary of merge rules (by metric name).
+                  Values with a rule are read as gauges.
+    :returns: A dictionary of Metric objects, keyed by name
+    """
+    if metrics is None:
+        metrics = {}
+    for name, text in utils.read_metrics(baseName).items():
+        value = _number(text)
+        if rules and name in rules:
+            metric = Metric(name, GAUGE, rules[name],
+                            text if value is None else value)
+        elif value is None:
+            metric = Metric(name, GAUGE, 'last', text)
+        else:
+            metric = Metric(name, COUNTER, 'sum', value)
+        _merge_into(metrics, metric)
+    return metrics
+
+
+def merge_metrics(inputBases, outputBase, rules=None):
+    """Merges the metrics of a number of outputs (i.e. the workers or
+    shards of a pipeline) into one metrics file. The metrics file and
+    journal of each output are read, the (typed) metrics in the journal
+    taking precedence over the metrics file's values of the same name.
+
+    :param inputBases: The output base names of the metrics to merge
+    :param outputBase: The output base name of the merged metrics file
+    :param rules: An optional dictionary of merge rules (by metric name)
+                  for values without a declared rule (those read from
+                  metrics files), i.e. {'__Shards__': 'max'}. Metrics read
+                  from journals keep their declared type and rule.
+    :returns: The merged metrics (a dictionary of Metric objects)
+    :raises: ValueError if a rule is unknown
+    """
+    for name, rule in (rules or {}).items():
+        if rule not in MERGE_RULES:
+            raise ValueError('Unknown merge rule for %s: %s' % (name, rule))
+    metrics = {}
+    for base in inputBases:
+        found = read_metrics_file(base, rules=rules)
+        if os.path.exists(base + JOURNAL_EXT):
+            journal = read_journal(base + JOURNAL_EXT)
+            for metric in journal.values():
+                found.pop(metric.name, None)
+                if metric.type == TIMER:
+                    found.pop(metric.name + TIMER_COUNT_SUFFIX, None)
+            found.update(journal)
+        for metric in found.values():
+            _merge_into(metrics, metric)
+    utils.write_metrics(outputBase, summary(metrics))
+    return metrics
+
+
+def summary(metrics):
+    """Returns the (summary) key/value pairs of a dictionary of metrics."""
+    values = {}
+    for metric in metrics.values():
+        values.update(metric.summary())
+    return values
+
+
+def _merge_into(metrics, metric):
+    existing = metrics.get(metric.name)
+    if existing is None:
+        metrics[metric.name] = metric
+    else:
+        existing.merge(metric)
+
+
+def _number(text):
+    """Returns the number represented by text, or None."""
+    for number_type in [int, float]:
+        try:
+            return number_type(text)
+        except ValueError:
+            pass
+    return None
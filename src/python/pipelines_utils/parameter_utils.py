@@ -20,6 +20,10 @@ A number of utilities relating to the splitting (normalising) of
 parameter values into lists/tuples.
 """
 
+import argparse
+
+from . import profile_utils
+
 
 def add_default_input_args(parser):
     parser.add_argument('-i', '--input',
@@ -40,9 +44,39 @@ def add_default_output_args(parser):
                         help='Write metadata and metrics files')
 
 
-def add_default_io_args(parser):
+class _ProfileAction(argparse.Action):
+    """Starts the profiler when the --profile option is parsed so the
+    rest of the program is profiled. The profile is written on exit using
+    the (parsed) output base name.
+    """
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        setattr(namespace, self.dest, values)
+        try:
+            profile_utils.start_at_exit_writer(
+                values, lambda: getattr(namespace, 'output', None))
+        except ValueError as ex:
+            parser.error(str(ex))
+
+
+def add_profile_args(parser):
+    parser.add_argument('--profile', nargs='?', const='deterministic',
+                        choices=profile_utils.MODES, action=_ProfileAction,
+                        help="Profile the program, writing the profile"
+                             " and a summary of the hottest functions"
+                             " to files named after the output base name"
+                             " ('deterministic' if the mode is not defined).")
+
+
+def add_default_io_args(parser, profile=False):
+    """Adds the default input and output arguments and, if profile is set,
+    the --profile option (see add_profile_args()). It's not added by default
+    as a pipeline may already have its own --profile option.
+    """
     add_default_input_args(parser)
     add_default_output_args(parser)
+    if profile:
+        add_profile_args(parser)
 
 
 def splitValues(textStr):
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+# Copyright 2018 Informatics Matters Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""profile_utils.py
+
+Profiling of pipelines without changing their code. Pipelines that use
+``parameter_utils.add_default_io_args()`` accept a ``--profile`` option
+that starts a profiler as the arguments are parsed. When the program exits
+the profile is written next to the output files: -
+
+*   deterministic   A cProfile profile (``<output>_profile.prof``),
+                    which can be loaded with ``pstats`` or snakeviz
+*   sampling        A statistical profile (``<output>_profile.folded``)
+                    in the 'folded stacks' format used by flame graph
+                    tools. Its overhead is low and does not depend on the
+                    number of function calls (Unix only).
+
+Both also write a summary of the hottest functions
+(``<output>_profile.txt``).
+"""
+
+from __future__ import print_function
+import atexit
+import collections
+import os
+import sys
+
+MODES = ['deterministic', 'sampling']
+# The default number of functions listed in the summary
+DEFAULT_TOP = 25
+# The default sampling interval (seconds of CPU time)
+DEFAULT_INTERVAL = 0.005
+# The base name used if the pipeline has no output base name
+DEFAULT_OUTPUT_BASE = 'output'
+
+_profiler = None
+
+
+class SamplingProfiler(object):
+    """A statistical profiler that records the stack of the main thread
+    at regular intervals of CPU time (using SIGPROF).
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        import signal
+        if not hasattr(signal, 'setitimer'):
+            raise ValueError('Sampling profiles are not supported'
+                             ' on this platform')
+        self._signal = signal
+        self.interval = interval
+        self.samples = collections.Counter()
+        self._previous_handler = None
+
+    def start(self):
+        signal = self._signal
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal = self._signal
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append('%s (%s:%d)' % (code.co_name,
+                                         os.path.basename(code.co_filename),
+                                         code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        self.samples[tuple(stack)] += 1
+
+    def write(self, filename):
+        """Writes the samples as folded stacks."""
+        out = open(filename, 'w')
+        for stack, count in self.samples.most_common():
+            out.write('%s %d\n' % (';'.join(stack), count))
+        out.close()
+
+    def summary(self, top=DEFAULT_TOP):
+        """Returns a summary of the functions found most often,
+        at the top of the stack ('self') or anywhere in it ('total').
+        """
+        own = collections.Counter()
+        total = collections.Counter()
+        num_samples = 0
+        for stack, count in self.samples.items():
+            num_samples += count
+            own[stack[-1]] += count
+            for function in set(stack):
+                total[function] += count
+        lines = ['%d samples (%.3fs interval)' % (num_samples, self.interval),
+                 '',
+                 '%7s %7s  %s' % ('self%', 'total%', 'function')]
+        for function, count in own.most_common(top):
+            lines.append('%7.1f %7.1f  %s'
+                         % (100.0 * count / num_samples,
+                            100.0 * total[function] / num_samples,
+                            function))
+        return '\n'.join(lines) + '\n'
+
+
+class _DeterministicProfiler(object):
+    """A cProfile based profiler."""
+
+    def __init__(self):
+        import cProfile
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def write(self, filename):
+        self._profile.dump_stats(filename)
+
+    def summary(self, top=DEFAULT_TOP):
+        import pstats
+        try:
+            from StringIO import StringIO
+        except ImportError:
+            from io import StringIO
+        stream = StringIO()
+        stats = pstats.Stats(self._profile, stream=stream)
+        stats.sort_stats('cumulative').print_stats(top)
+        return stream.getvalue()
+
+
+def is_profiling():
+    """Returns True if a profiler is running."""
+    return _profiler is not None
+
+
+def start(mode='deterministic', interval=DEFAULT_INTERVAL):
+    """Starts profiling. Nothing happens if a profiler is already running.
+
+    :param mode: 'deterministic' or 'sampling'
+    :param interval: The sampling interval (seconds) of a sampling profiler
+    :raises: ValueError if the mode is not known or not supported
+    """
+    global _profiler
+    if _profiler is not None:
+        return
+    if mode == 'deterministic':
+        profiler = _DeterministicProfiler()
+    elif mode == 'sampling':
+        profiler = SamplingProfiler(interval)
+    else:
+        raise ValueError('Unknown profile mode: ' + str(mode))
+    profiler.start()
+    _profiler = profiler
+
+
+def stop(outputBase=None, top=DEFAULT_TOP):
+    """Stops profiling, writing the profile and its summary.
+    Nothing happens if a profiler is not running.
+
+    :param outputBase: The base name of the profile files
+                       (DEFAULT_OUTPUT_BASE if not defined)
+    :param top: The number of functions in the summary
+    :returns: The list of files written
+    """
+    global _profiler
+    if _profiler is None:
+        return []
+    profiler = _profiler
+    _profiler = None
+    profiler.stop()
+
+    base = (outputBase or DEFAULT_OUTPUT_BASE) + '_profile'
+    if isinstance(profiler, SamplingProfiler):
+        profile_file = base + '.folded'
+    else:
+        profile_file = base + '.prof'
+    summary_file = base + '.txt'
+    profiler.write(profile_file)
+    out = open(summary_file, 'w')
+    out.write(profiler.summary(top))
+    out.close()
+    print('Profile written to %s (summary in %s)'
+          % (profile_file, summary_file), file=sys.stderr)
+    return [profile_file, summary_file]
+
+
+def start_at_exit_writer(mode, outputBase=None, top=DEFAULT_TOP):
+    """Starts profiling, writing the profile when the program exits.
+
+    :param mode: 'deterministic' or 'sampling'
+    :param outputBase: The base name of the profile files. If callable it's
+                       called (at exit) to obtain the name.
+    :param top: The number of functions in the summary
+    """
+    start(mode)
+
+    def _stop():
+        base = outputBase() if callable(outputBase) else outputBase
+        stop(base, top)
+
+    atexit.register(_stop)
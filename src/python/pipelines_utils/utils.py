@@ -14,16 +14,49 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+# Only light-weight modules are imported here, pipelines are short-lived
+# so other modules (and our writers) are imported when they're first used.
 from __future__ import print_function
-import inspect, os, sys, gzip, json, uuid
+import os, sys
 from math import log10, floor
-from pipelines_utils.BasicObjectWriter import BasicObjectWriter
-from pipelines_utils.TsvWriter import TsvWriter
+from pipelines_utils import compression_utils, instrumentation, log_utils
+
+# The names this module used to import, which are kept (for compatibility)
+# as aliases that are imported when they're first used (Python 3.7 or
+# later): the name and its module (and attribute, if any).
+_COMPATIBILITY_ALIASES = {
+    'BasicObjectWriter': ('pipelines_utils.BasicObjectWriter', 'BasicObjectWriter'),
+    'TsvWriter': ('pipelines_utils.TsvWriter', 'TsvWriter'),
+    'gzip': ('gzip', None),
+    'inspect': ('inspect', None),
+    'json': ('json', None),
+    'uuid': ('uuid', None)}
+
+# The metrics added (by update_metrics()) by the components of this process,
+# i.e. the writers, keyed by base name. They're kept by write_metrics().
+_contributed_metrics = {}
+
+
+def __getattr__(name):
+    """Imports the compatibility aliases when they're first used."""
+    if name in _COMPATIBILITY_ALIASES:
+        import importlib
+        module_name, attribute = _COMPATIBILITY_ALIASES[name]
+        value = importlib.import_module(module_name)
+        if attribute is not None:
+            value = getattr(value, attribute)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 
 def log(*args, **kwargs):
-    """Log output to STDERR
+    """Log output to STDERR (unbuffered). Lines buffered by the
+    log_utils Logger are written first, to keep the output in order.
+    For buffered, levelled logging and progress reports see log_utils.
     """
+    if log_utils._logger is not None:
+        log_utils._logger.flush()
     print(*args, file=sys.stderr, **kwargs)
 
 
@@ -33,43 +66,124 @@ def round_sig(x, sig):
 
 
 def open_file(filename, as_text=False):
-    """Open the file gunzipping it if it ends with .gz.
+    """Open the file, decompressing it if it's compressed (with any of the
+    codecs in compression_utils, recognised by the file's magic bytes).
     If as_text the file is opened in text mode,
     otherwise the file's opened in binary mode."""
-    if filename.lower().endswith('.gz'):
-        if as_text:
-            return gzip.open(filename, 'rt')
-        else:
-            return gzip.open(filename, 'rb')
-    else:
-        if as_text:
-            return open(filename, 'rt')
-        else:
-            return open(filename, 'rb')
+    return compression_utils.open_file(filename, 'rt' if as_text else 'rb')
 
 
 def create_simple_writer(outputDef, defaultOutput, outputFormat, fieldNames,
                          compress=True, valueClassMappings=None,
-                         datasetMetaProps=None, fieldMetaProps=None):
+                         datasetMetaProps=None, fieldMetaProps=None,
+                         checkpoint=None,
+                         codec=compression_utils.DEFAULT_CODEC, level=None,
+                         batchSize=None):
     """Create a simple writer suitable for writing flat data
-    e.g. as BasicObject or TSV."""
+    e.g. as BasicObject or TSV.
+
+    The writer collects statistics as records are written and, when it is
+    closed, writes the complete metadata (including the dataset size and
+    value class mappings derived from the values) and metrics.
+
+    The 'ndjson' format writes BasicObjects as line-delimited JSON
+    (to a '.ndjson' file), which can be read with the JsonLinesReader.
+
+    The 'parquet' and 'arrow' formats write the values as columns
+    (to a '.parquet' or Arrow IPC '.arrow' file, see ArrowWriter) in
+    batches of batchSize records. They need the pyarrow module, a file
+    (not STDOUT) and can't be checkpointed. Compressed columnar output uses
+    the format's own compression rather than the codec.
+
+    If a Checkpoint is provided the output file is opened by it and the
+    writer is tracked by it (restoring its state if resuming).
+
+    Compressed output uses the named codec (see compression_utils)
+    and compression level."""
+    from pipelines_utils.BasicObjectWriter import BasicObjectWriter
+    from pipelines_utils.DatasetStats import DatasetStats
+    from pipelines_utils.TsvWriter import TsvWriter
 
     if not outputDef:
         outputBase = defaultOutput
     else:
         outputBase = outputDef
 
-    if outputFormat == 'json':
+    if outputFormat in ['json', 'ndjson']:
         write_squonk_datasetmetadata(outputBase, True, valueClassMappings,
                                      datasetMetaProps, fieldMetaProps)
-        return BasicObjectWriter(open_output(outputDef, 'data', compress)), outputBase
+        stats = DatasetStats(outputBase,
+                             valueClassMappings=valueClassMappings,
+                             datasetMetaProps=datasetMetaProps,
+                             fieldMetaProps=fieldMetaProps)
+        lines = outputFormat == 'ndjson'
+        writer = BasicObjectWriter(open_output(outputDef,
+                                               'ndjson' if lines else 'data',
+                                               compress, checkpoint,
+                                               codec, level),
+                                   stats=stats, lines=lines)
 
     elif outputFormat == 'tsv':
-        return TsvWriter(open_output(outputDef, 'tsv', compress), fieldNames), outputBase
+        stats = DatasetStats(outputBase, metadata=False)
+        writer = TsvWriter(open_output(outputDef, 'tsv', compress, checkpoint,
+                                       codec, level),
+                           fieldNames, stats=stats)
+
+    elif outputFormat in ['parquet', 'arrow']:
+        from pipelines_utils import ArrowWriter
+        if not outputDef:
+            raise ValueError("The %s format can't be written to STDOUT"
+                             % outputFormat)
+        if checkpoint is not None:
+            raise ValueError("The %s format can't be checkpointed"
+                             % outputFormat)
+        stats = DatasetStats(outputBase,
+                             valueClassMappings=valueClassMappings,
+                             datasetMetaProps=datasetMetaProps,
+                             fieldMetaProps=fieldMetaProps)
+        writer = ArrowWriter.ArrowWriter(
+            outputBase + '.' + ArrowWriter.FORMATS[outputFormat],
+            outputFormat, fieldNames=fieldNames,
+            valueClassMappings=valueClassMappings, compress=compress,
+            batchSize=batchSize or ArrowWriter.DEFAULT_BATCH_SIZE,
+            stats=stats)
+        write_squonk_datasetmetadata(outputBase, True, valueClassMappings,
+                                     datasetMetaProps, fieldMetaProps)
 
     else:
         raise ValueError("Unsupported format: " + outputFormat)
 
+    if checkpoint is not None:
+        checkpoint.track(writer)
+    return writer, outputBase
+
+
+def create_molecule_writer(outputDef, defaultOutput, compress=True,
+                           valueClassMappings=None, datasetMetaProps=None,
+                           fieldMetaProps=None, checkpoint=None,
+                           codec=compression_utils.DEFAULT_CODEC, level=None):
+    """Create a writer of Squonk MoleculeObjects. The dataset metadata
+    (including the number of molecules written) and metrics are written
+    when the writer is closed. If a Checkpoint is provided the output
+    file is opened by it and the writer is tracked by it. Compressed output
+    uses the named codec and compression level."""
+    from pipelines_utils.MoleculeObjectWriter import MoleculeObjectWriter
+
+    if not outputDef:
+        outputBase = defaultOutput
+    else:
+        outputBase = outputDef
+
+    writer = MoleculeObjectWriter(open_output(outputDef, 'data', compress,
+                                             checkpoint, codec, level),
+                                 outputBase=outputBase,
+                                 valueClassMappings=valueClassMappings,
+                                 datasetMetaProps=datasetMetaProps,
+                                 fieldMetaProps=fieldMetaProps)
+    if checkpoint is not None:
+        checkpoint.track(writer)
+    return writer, outputBase
+
 def determine_output_format(outformat):
     if outformat:
         return outformat
@@ -77,12 +191,22 @@ def determine_output_format(outformat):
         log("No output format specified - using sdf")
         return 'sdf'
 
-def open_output(basename, ext, compress):
+def open_output(basename, ext, compress, checkpoint=None,
+                codec=compression_utils.DEFAULT_CODEC, level=None):
+    """Opens an output file, replacing any existing file (or, if a
+    Checkpoint is resuming, truncating it to its checkpointed size).
+    Compressed output uses the named codec (see compression_utils),
+    whose extension is added to the filename, and compression level.
+    Without a basename the output is STDOUT."""
     if basename:
         fname = basename + '.' + ext
         if compress:
-            fname += ".gz"
-            return gzip.open(fname, 'at')
+            fname += compression_utils.get_codec(codec).extension
+        if checkpoint is not None:
+            return checkpoint.open_output(fname, level=level)
+        if compress:
+            return compression_utils.open_file(fname, 'wt', codec=codec,
+                                               level=level)
         else:
             return open(fname, 'w+')
     else:
@@ -106,6 +230,7 @@ def write_squonk_datasetmetadata(outputBase, thinOutput, valueClassMappings, dat
             is the name of the field being described, and a key name values wholes values is a map of metadata properties.
             The keys used for these metadata are up to the user, but common ones include source, description, created, history.
     """
+    import json
     meta = {}
     props = {}
     # TODO add created property - how to handle date formats?
@@ -132,18 +257,81 @@ def write_squonk_datasetmetadata(outputBase, thinOutput, valueClassMappings, dat
     meta.close()
 
 
+def read_metrics(baseName):
+    """Reads the metrics data
+
+    :param baseName: The base name of the output files.
+    :returns: A dictionary of (string) values,
+              empty if there is no metrics file
+    """
+    values = {}
+    filename = baseName + '_metrics.txt'
+    if os.path.exists(filename):
+        m = open(filename, 'r')
+        for line in m:
+            key, sep, value = line.rstrip('\n').partition('=')
+            if sep and not key.startswith('#'):
+                values[key] = value
+        m.close()
+    return values
+
+
 def write_metrics(baseName, values):
-    """Write the metrics data
+    """Write the metrics data, replacing any existing metrics file.
+    The metrics added by the writers (or other components) of this process
+    are kept, so a pipeline can write its metrics before or after closing
+    its writers, but values from earlier runs are not. The pipeline's
+    values replace any the writers added with the same key.
+    If instrumentation is enabled its totals are also written.
+    Typed metrics, and metrics from parallel runs, are handled
+    by metrics_utils.
 
     :param baseName: The base name of the output files.
                      e.g. extensions will be appended to this base name
     :param values dictionary of values to write
     """
-    m = open(baseName  + '_metrics.txt', 'w')
+    merged = dict(_contributed_metrics.get(baseName, {}))
+    merged.update(values)
+    _write_metrics_file(baseName, merged)
+
+
+def _write_metrics_file(baseName, values):
+    """Writes (replaces) the metrics file, with any instrumentation totals.
+    """
+    values = dict(values)
+    if instrumentation.is_enabled():
+        values.update(instrumentation.as_metrics())
+    # Written to a temporary file that replaces the metrics file
+    # so a reader never sees a partly written file
+    filename = baseName + '_metrics.txt'
+    m = open(filename + '.tmp', 'w')
     for key in values:
         m.write(key + '=' + str(values[key]) + "\n")
     m.flush()
     m.close()
+    if hasattr(os, 'replace'):
+        os.replace(filename + '.tmp', filename)
+    else:
+        # Python 2
+        if os.path.exists(filename):
+            os.remove(filename)
+        os.rename(filename + '.tmp', filename)
+
+
+def update_metrics(baseName, values):
+    """Adds values to the metrics file, keeping those already written
+    (other than those with the same key, which are replaced). Used by
+    components (i.e. writers) that contribute some of a pipeline's metrics,
+    which are also kept when the pipeline calls write_metrics().
+
+    :param baseName: The base name of the output files.
+                     e.g. extensions will be appended to this base name
+    :param values dictionary of values to add
+    """
+    _contributed_metrics.setdefault(baseName, {}).update(values)
+    merged = read_metrics(baseName)
+    merged.update(values)
+    _write_metrics_file(baseName, merged)
 
 
 def generate_molecule_object_dict(source, format, values):
@@ -154,6 +342,7 @@ def generate_molecule_object_dict(source, format, values):
     :param format: The format of the molecule. Either 'mol' or 'smiles'
     :param values: Optional dict of values (properties) for the MoleculeObject
     """
+    import uuid
     m = {"uuid": str(uuid.uuid4()), "source": source, "format": format}
     if values:
         m["values"] = values
@@ -169,6 +358,7 @@ def get_undecorated_calling_module():
 
     As the name suggests, this does not work for decorated functions.
     """
+    import inspect
     frame = inspect.stack()[2]
     module = inspect.getmodule(frame[0])
     # Return the module's file and its path
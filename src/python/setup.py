@@ -41,9 +41,15 @@ setup(
     packages=find_packages(exclude=['*.test', '*.test.*', 'test.*', 'test']),
 
     # Essential dependencies
+    # (the future package is only needed on Python 2)
     install_requires=[
-        'future >= 0.16.0'
+        'future >= 0.16.0; python_version < "3"'
     ],
+    # Optional dependencies
+    # (pyarrow for the parquet and arrow output formats)
+    extras_require={
+        'arrow': ['pyarrow'],
+    },
     # Supported Python versions
     # 2.7 and 3.5 or better
     python_requires='>=2.7, !=3.0.*, !=3.1.*, !=3.2.*, !=3.3.*, != 3.4.*, <4',
@@ -61,6 +67,13 @@ setup(
         'Topic :: Software Development :: Build Tools',
     ],
 
+    # Command-line utilities
+    entry_points={
+        'console_scripts': [
+            'pipelines_utils = pipelines_utils.cli:main',
+        ],
+    },
+
     # Root of the test suite
     test_suite=_TEST_SUITE,
 
@@ -0,0 +1,146 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from pipelines_utils import ArrowWriter, utils
+from pipelines_utils.Checkpoint import Checkpoint
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class ArrowWriterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.base = os.path.join(self.tmp_dir, 'output')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_records(self, outputFormat, fieldNames=None,
+                      valueClassMappings=None, batchSize=3):
+        writer, _ = utils.create_simple_writer(
+            self.base, None, outputFormat, fieldNames,
+            valueClassMappings=valueClassMappings, batchSize=batchSize)
+        writer.writeHeader()
+        for i in range(10):
+            values = {'i': i, 'name': 'mol%d' % i}
+            if i % 2:
+                values['score'] = i / 2.0
+            writer.write(values, objectUUID=str(i))
+        writer.writeFooter()
+        writer.close()
+        return writer
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_parquet(self):
+        """Checks a Parquet file has the named columns, of the mapped types,
+        and the Squonk metadata is written.
+        """
+        import pyarrow.parquet as pq
+        writer = self.write_records('parquet', ['name', 'i', 'score'],
+                                    {'i': 'java.lang.Integer',
+                                     'score': 'java.lang.Float'})
+        self.assertEqual(10, writer.count)
+
+        table = pq.read_table(self.base + '.parquet')
+        self.assertEqual(['uuid', 'name', 'i', 'score'], table.column_names)
+        self.assertEqual(pyarrow.int64(), table.schema.field('i').type)
+        self.assertEqual(pyarrow.float64(), table.schema.field('score').type)
+        self.assertEqual([str(i) for i in range(10)],
+                         table.column('uuid').to_pylist())
+        self.assertEqual([None, 0.5], table.column('score').to_pylist()[:2])
+
+        with open(self.base + '.metadata') as metadata_file:
+            metadata = json.load(metadata_file)
+        self.assertEqual(10, metadata['size'])
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_arrow(self):
+        """Checks an Arrow IPC file, with a schema inferred from the first
+        batch, is written as a number of record batches.
+        """
+        self.write_records('arrow')
+
+        reader = pyarrow.ipc.open_file(self.base + '.arrow')
+        self.assertEqual(4, reader.num_record_batches)
+        table = reader.read_all()
+        self.assertEqual(['uuid', 'i', 'name', 'score'], table.column_names)
+        # Integers without a value class mapping are written as floats
+        self.assertEqual(pyarrow.float64(), table.schema.field('i').type)
+        self.assertEqual(list(range(10)), table.column('i').to_pylist())
+        self.assertEqual('mol9', table.column('name').to_pylist()[-1])
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_schema_mismatch(self):
+        """Checks values that don't fit the schema written with the first
+        batch raise a ValueError rather than being truncated or dropped.
+        """
+        filename = os.path.join(self.tmp_dir, 'mismatch.parquet')
+        writer = ArrowWriter.ArrowWriter(filename, batchSize=1)
+        writer.write({'i': 1, 'name': 'a'})
+        writer.write({'i': 2.5, 'name': 'b'})
+        self.assertRaises(ValueError, writer.write, {'i': 3, 'extra': 1})
+        self.assertRaises(ValueError, writer.write, {'i': 'x'})
+
+        writer = ArrowWriter.ArrowWriter(
+            filename, valueClassMappings={'i': 'java.lang.Integer'},
+            batchSize=1)
+        writer.write({'i': 1})
+        writer.write({'i': 2.0})
+        self.assertRaises(ValueError, writer.write, {'i': 2.5})
+
+        # A value without a mapping and no values in the first batch
+        # has no type, a mapping is needed for it
+        writer = ArrowWriter.ArrowWriter(filename, batchSize=1)
+        writer.write({'i': 1, 's': None})
+        self.assertRaises(ValueError, writer.write, {'i': 2, 's': 1.5})
+        writer = ArrowWriter.ArrowWriter(
+            filename, valueClassMappings={'s': 'java.lang.Float'},
+            batchSize=1)
+        writer.write({'i': 1, 's': None})
+        writer.write({'i': 2, 's': 1.5})
+        writer.write({'i': 3})
+        writer.close()
+        import pyarrow.parquet as pq
+        self.assertEqual([None, 1.5, None],
+                         pq.read_table(filename).column('s').to_pylist())
+
+        # Values that are not in the named fields are not written
+        writer = ArrowWriter.ArrowWriter(filename, fieldNames=['i'],
+                                         batchSize=1)
+        writer.write({'i': 1})
+        writer.write({'i': 2, 'extra': 1})
+        writer.close()
+        self.assertEqual(['uuid', 'i'], pq.read_table(filename).column_names)
+
+    def test_unsupported_outputs(self):
+        """Checks columnar formats are not written to STDOUT
+        or with a checkpoint.
+        """
+        self.assertRaises(ValueError, utils.create_simple_writer,
+                          None, 'output', 'parquet', None)
+        checkpoint = Checkpoint(self.base)
+        self.assertRaises(ValueError, utils.create_simple_writer,
+                          self.base, None, 'arrow', None,
+                          checkpoint=checkpoint)
+        self.assertRaises(ValueError, ArrowWriter.ArrowWriter,
+                          self.base + '.orc', outputFormat='orc')
+
+    @unittest.skipIf(pyarrow is not None, 'pyarrow is installed')
+    def test_without_pyarrow(self):
+        """Checks the formats fail clearly, and write no metadata,
+        without pyarrow.
+        """
+        self.assertRaises(ImportError, utils.create_simple_writer,
+                          self.base, None, 'parquet', None)
+        self.assertFalse(os.path.exists(self.base + '.metadata'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import json
 import os
 import unittest
 
@@ -53,3 +54,29 @@ class BasicObjectWriterTestCase(unittest.TestCase):
         self.assertTrue(line.endswith('}]'))
         bow_file.close()
         os.remove(filename)
+
+    def test_lines_mode(self):
+        """Test line-delimited JSON output, which can be appended to.
+        """
+        filename = 'bow_test_c.tmp'
+
+        for values in [{"A": "a"}, {"A": "b"}]:
+            bow = BasicObjectWriter.BasicObjectWriter(open(filename, 'a'),
+                                                      lines=True)
+            bow.writeHeader()
+            bow.write(values)
+            bow.writeFooter()
+            bow.close()
+
+        bow_file = open(filename, 'r')
+        lines = bow_file.readlines()
+        bow_file.close()
+        os.remove(filename)
+
+        self.assertEqual(2, len(lines))
+        for line, value in zip(lines, ['a', 'b']):
+            self.assertTrue(line.endswith('}\n'))
+            record = json.loads(line)
+            self.assertEqual(set(['uuid', 'values']), set(record))
+            self.assertTrue(record['uuid'])
+            self.assertEqual({'A': value}, record['values'])
@@ -0,0 +1,82 @@
+import gzip
+import json
+import os
+import unittest
+
+from pipelines_utils import Checkpoint, utils
+
+
+class CheckpointTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.base = 'checkpoint_test'
+
+    def tearDown(self):
+        for ext in ['.data.gz', '.metadata', '_metrics.txt', '.checkpoint']:
+            if os.path.exists(self.base + ext):
+                os.remove(self.base + ext)
+
+    def _run(self, records, fail_at=None):
+        """Runs a simple pipeline that writes a record for each input value,
+        checkpointing every 10 records, optionally failing after writing
+        'fail_at' records.
+        """
+        checkpoint = Checkpoint.Checkpoint(self.base, interval=10)
+        writer, _ = utils.create_simple_writer(self.base, None, 'json', None,
+                                               checkpoint=checkpoint)
+        if not checkpoint.resuming:
+            writer.writeHeader()
+        count = checkpoint.records
+        for i in checkpoint.skip(range(records)):
+            if count == fail_at:
+                # Leave records written since the checkpoint
+                # and a partial gzip member behind
+                writer.file.commit()
+                partial = open(self.base + '.data.gz', 'ab')
+                partial.write(b'\x1f\x8b\x08partial')
+                partial.close()
+                return checkpoint
+            writer.write({'i': i}, objectUUID=str(i))
+            count += 1
+            checkpoint.update(count)
+        writer.writeFooter()
+        writer.close()
+        checkpoint.complete()
+        return checkpoint
+
+    def test_resume(self):
+        """Test a pipeline that fails and is resumed writes a complete dataset
+        """
+        checkpoint = self._run(35, fail_at=27)
+        self.assertEqual(20, checkpoint.records)
+        self.assertTrue(os.path.exists(self.base + '.checkpoint'))
+
+        checkpoint = self._run(35)
+        self.assertTrue(checkpoint.resuming)
+        self.assertFalse(os.path.exists(self.base + '.checkpoint'))
+
+        data_file = gzip.open(self.base + '.data.gz', 'rt')
+        objects = json.load(data_file)
+        data_file.close()
+        meta_file = open(self.base + '.metadata', 'r')
+        meta = json.load(meta_file)
+        meta_file.close()
+
+        self.assertEqual([str(i) for i in range(35)],
+                         [obj['uuid'] for obj in objects])
+        self.assertEqual(35, meta['size'])
+        self.assertEqual('java.lang.Integer', meta['valueClassMappings']['i'])
+        self.assertEqual('35', utils.read_metrics(self.base)['__OutputCount__'])
+
+    def test_without_checkpoint_output_is_replaced(self):
+        """Test a pipeline that's re-run without a checkpoint
+        replaces its output
+        """
+        self._run(5)
+        checkpoint = self._run(3)
+        self.assertFalse(checkpoint.resuming)
+
+        data_file = gzip.open(self.base + '.data.gz', 'rt')
+        objects = json.load(data_file)
+        data_file.close()
+        self.assertEqual(3, len(objects))
@@ -0,0 +1,123 @@
+import json
+import os
+import unittest
+
+from collections import OrderedDict
+
+from pipelines_utils import DatasetStats, utils
+
+
+class DatasetStatsTestCase(unittest.TestCase):
+
+    def test_value_class_mappings(self):
+        """Test Java classes derived from the observed values
+        """
+        stats = DatasetStats.DatasetStats()
+        stats.add({'s': 'a', 'i': 1, 'f': 1.5, 'b': True, 'n': 1, 'x': 1})
+        stats.add({'s': 'b', 'i': 2, 'f': 2.5, 'b': False, 'n': 2.5, 'x': 'y'})
+
+        self.assertEqual(2, stats.count)
+        self.assertEqual({'s': 'java.lang.String',
+                          'i': 'java.lang.Integer',
+                          'f': 'java.lang.Float',
+                          'b': 'java.lang.Boolean',
+                          'n': 'java.lang.Float',
+                          'x': 'java.lang.String'},
+                         stats.value_class_mappings())
+
+    def test_state_round_trip(self):
+        """Test statistics survive being saved (as JSON) and restored
+        """
+        stats = DatasetStats.DatasetStats()
+        stats.add({'s': 'a', 'n': 1, 'x': 1})
+        stats.add({'n': 2.5, 'x': 'y'})
+        state = json.loads(json.dumps(stats.get_state()))
+
+        restored = DatasetStats.DatasetStats()
+        restored.set_state(state)
+        restored.add({'n': 0})
+
+        self.assertEqual(3, restored.count)
+        self.assertEqual({'s': 'java.lang.String',
+                          'n': 'java.lang.Float',
+                          'x': 'java.lang.String'},
+                         restored.value_class_mappings())
+        self.assertEqual(2, restored.null_count('s'))
+        self.assertEqual([{'fieldName': 'n',
+                           'values': {'min': 0, 'max': 2.5, 'nullCount': 0}},
+                          {'fieldName': 'x',
+                           'values': {'min': 1, 'max': 1, 'nullCount': 1}}],
+                         restored.field_meta_props())
+
+    def test_user_value_class_mappings_take_precedence(self):
+        """Test user-defined mappings are preferred
+        """
+        stats = DatasetStats.DatasetStats(
+            valueClassMappings={'i': 'java.lang.Long'})
+        stats.add({'i': 1})
+
+        self.assertEqual({'i': 'java.lang.Long'}, stats.value_class_mappings())
+
+    def test_numeric_field_meta_props(self):
+        """Test min, max and null counts (missing or None values)
+        """
+        stats = DatasetStats.DatasetStats(
+            fieldMetaProps=[{'fieldName': 'i', 'values': {'source': 'me'}},
+                            {'fieldName': 's', 'values': {'source': 'you'}}])
+        stats.add({'i': 5, 's': 'a'})
+        stats.add({'i': -2})
+        stats.add({'i': None})
+        stats.add({'i': 7})
+        stats.add(None)
+
+        self.assertEqual(5, stats.count)
+        self.assertEqual(4, stats.null_count('s'))
+        self.assertEqual([{'fieldName': 's', 'values': {'source': 'you'}},
+                          {'fieldName': 'i',
+                           'values': {'min': -2, 'max': 7, 'nullCount': 2,
+                                      'source': 'me'}}],
+                         stats.field_meta_props())
+
+    def test_simple_writer_writes_metadata_and_metrics_on_close(self):
+        """Test the complete metadata is written when the writer is closed
+        """
+        json_base = 'test_stats_json'
+
+        writer, _ = utils.create_simple_writer(json_base, None, 'json', None)
+        writer.writeHeader()
+        for i in range(10):
+            writer.write({'i': i, 'f': i / 2.0})
+        writer.writeFooter()
+        writer.close()
+
+        meta_file = open(json_base + '.metadata', 'r')
+        meta = json.load(meta_file)
+        meta_file.close()
+        metrics = utils.read_metrics(json_base)
+        for ext in ['.metadata', '.data.gz', '_metrics.txt']:
+            os.remove(json_base + ext)
+
+        self.assertEqual(10, meta['size'])
+        self.assertEqual('org.squonk.types.BasicObject', meta['type'])
+        self.assertEqual({'i': 'java.lang.Integer', 'f': 'java.lang.Float'},
+                         meta['valueClassMappings'])
+        self.assertEqual('10', metrics['__OutputCount__'])
+
+    def test_tsv_writer_writes_metrics_on_close(self):
+        """Test the TSV writer's metrics
+        """
+        tsv_base = 'test_stats_tsv'
+        header = OrderedDict()
+        header['a'] = 'A'
+
+        writer, _ = utils.create_simple_writer(tsv_base, None, 'tsv', header)
+        writer.writeHeader()
+        writer.write({'a': 1})
+        writer.close()
+
+        metrics = utils.read_metrics(tsv_base)
+        os.remove(tsv_base + '.tsv.gz')
+        os.remove(tsv_base + '_metrics.txt')
+
+        self.assertFalse(os.path.exists(tsv_base + '.metadata'))
+        self.assertEqual('1', metrics['__OutputCount__'])
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pipelines_utils import Deduplicator, utils
+
+
+class DeduplicatorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.base = os.path.join(self.tmp_dir, 'dedup_test')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _records(self):
+        # 1000 unique keys, every tenth record repeated
+        records = []
+        for i in range(1000):
+            records.append({'uuid': str(i), 'values': {'i': i}})
+            if i % 10 == 0:
+                records.append({'uuid': str(i // 2),
+                                'values': {'i': i // 2}})
+        records.append({'values': {'i': -1}})
+        return records
+
+    def test_exact(self):
+        """Checks the first of each key is kept, with records without a key,
+        and the number of duplicates is written to the metrics.
+        """
+        dedup = Deduplicator.Deduplicator(self.base)
+        result = list(dedup.filter(self._records()))
+        dedup.close()
+
+        self.assertEqual(1001, len(result))
+        self.assertEqual([str(i) for i in range(1000)],
+                         [r['uuid'] for r in result[:-1]])
+        self.assertEqual(100, dedup.duplicates)
+        self.assertEqual('100', utils.read_metrics(self.base)
+                         [Deduplicator.DUPLICATES_METRIC])
+
+    def test_exact_spilled(self):
+        """Checks hashes moved to partition files are still found
+        (and the files are removed).
+        """
+        dedup = Deduplicator.Deduplicator(key_field='i', max_memory=5000,
+                                          tmp_dir=self.tmp_dir)
+        result = list(dedup.filter(self._records()))
+        self.assertTrue(dedup._store.spills)
+        dedup.close()
+
+        self.assertEqual(1001, len(result))
+        self.assertEqual(100, dedup.duplicates)
+        self.assertEqual([], os.listdir(self.tmp_dir))
+
+    def test_exact_spill_runs(self):
+        """Checks each spill writes new runs, which are merged with runs
+        of a similar size so a partition only has a few.
+        """
+        dedup = Deduplicator.Deduplicator(key_field='i', max_memory=1000,
+                                          tmp_dir=self.tmp_dir)
+        result = list(dedup.filter(self._records()))
+        store = dedup._store
+        self.assertEqual(1001, len(result))
+        self.assertEqual(100, dedup.duplicates)
+        # 10 hashes are held in memory, so there are about 100 spills
+        self.assertTrue(store._files_written > 100)
+        for runs in store._runs:
+            sizes = [len(run) for run in runs]
+            self.assertTrue(len(runs) <= 4, sizes)
+            self.assertEqual(sorted(sizes, reverse=True), sizes)
+        dedup.close()
+        self.assertEqual([], os.listdir(self.tmp_dir))
+
+    def test_approximate(self):
+        """Checks the Bloom filter finds every duplicate and drops (almost)
+        no unique records.
+        """
+        dedup = Deduplicator.Deduplicator(self.base, mode='approximate',
+                                          capacity=1000, error_rate=0.01)
+        result = list(dedup.filter(self._records()))
+        dedup.close()
+
+        self.assertTrue(1001 - 10 <= len(result) <= 1001)
+        self.assertTrue(100 <= dedup.duplicates <= 110)
+        self.assertRaises(ValueError, Deduplicator.Deduplicator,
+                          mode='unknown')
+
+    def test_bloom_filter_size(self):
+        """Checks the Bloom filter's bits and bit positions for
+        a capacity and error rate.
+        """
+        bloom = Deduplicator.BloomFilter(1000, error_rate=0.01)
+        self.assertEqual(9586, bloom.num_bits)
+        self.assertEqual(7, bloom.num_positions)
+
+
+if __name__ == '__main__':
+    unittest.main()
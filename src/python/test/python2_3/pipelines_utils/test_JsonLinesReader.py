@@ -0,0 +1,78 @@
+import gzip
+import json
+import os
+import unittest
+
+from pipelines_utils import JsonLinesReader
+
+
+class JsonLinesReaderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'jlr_test.ndjson'
+        lines = [json.dumps({'uuid': str(i), 'values': {'i': i, 's': 'x' * i}})
+                 for i in range(20)]
+        # A blank line and a final record without a newline
+        lines.insert(5, '')
+        data = '\n'.join(lines)
+        self.records = 20
+        data_file = open(self.filename, 'w')
+        data_file.write(data)
+        data_file.close()
+        data_file = gzip.open(self.filename + '.gz', 'wt')
+        data_file.write(data)
+        data_file.close()
+
+    def tearDown(self):
+        os.remove(self.filename)
+        os.remove(self.filename + '.gz')
+
+    def test_basic_operation(self):
+        """Test reading every record (plain and gzipped) with small blocks
+        """
+        for filename in [self.filename, self.filename + '.gz']:
+            reader = JsonLinesReader.JsonLinesReader(filename, block_size=7)
+            records = list(reader)
+            reader.close()
+
+            self.assertEqual(self.records, len(records))
+            self.assertEqual('0', records[0]['uuid'])
+            self.assertEqual(19, records[-1]['values']['i'])
+
+    def test_build_index(self):
+        """Test the offset index, each offset starting a record
+        """
+        index = JsonLinesReader.build_index(self.filename)
+
+        self.assertEqual(self.records, len(index))
+        for i, offset in enumerate(index):
+            reader = JsonLinesReader.JsonLinesReader(self.filename,
+                                                     start=offset)
+            record = next(iter(reader))
+            reader.close()
+            self.assertEqual(str(i), record['uuid'])
+
+    def test_split_ranges_return_every_record_once(self):
+        """Test that ranges of any size return each record exactly once
+        """
+        for num_ranges in range(1, 40):
+            uuids = []
+            for start, end in JsonLinesReader.split_ranges(self.filename,
+                                                           num_ranges):
+                reader = JsonLinesReader.JsonLinesReader(self.filename,
+                                                         start=start, end=end,
+                                                         block_size=16)
+                uuids.extend([record['uuid'] for record in reader])
+                reader.close()
+            self.assertEqual([str(i) for i in range(self.records)], uuids)
+
+    def test_split_ranges_gzip_requires_index(self):
+        """Test splitting a gzipped file
+        """
+        filename = self.filename + '.gz'
+        self.assertRaises(ValueError, JsonLinesReader.split_ranges,
+                          filename, 2)
+
+        index = JsonLinesReader.build_index(filename)
+        ranges = JsonLinesReader.split_ranges(filename, 2, index=index)
+        self.assertEqual([(0, index[10]), (index[10], None)], ranges)
@@ -0,0 +1,87 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from pipelines_utils import LookupTable
+from pipelines_utils.TypedColumnReader import TypedColumnReader
+
+
+class LookupTableTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _table(self, **kwargs):
+        rows = ['id:int\tname\tscore:float\tnotes',
+                '1\tone\t1.5\tx', '2\ttwo\t\ty', '2\tdeux\t2.5\tz',
+                '\tnone\t0\t']
+        return LookupTable.LookupTable(TypedColumnReader(rows), 'id',
+                                       columns=['name', 'score'], **kwargs)
+
+    def _records(self):
+        return [{'uuid': 'a', 'values': {'id': 1}},
+                {'uuid': 'b', 'values': {'id': '2'}},
+                {'uuid': 'c', 'values': {'id': 3}},
+                {'uuid': 'd', 'values': {}}]
+
+    def test_inner_join(self):
+        """Checks an inner join, with converted keys and duplicate rows.
+        """
+        table = self._table(key_type='int')
+        self.assertEqual(3, len(table))
+        self.assertFalse(table.spilled)
+        joined = list(table.join(self._records()))
+        table.close()
+
+        self.assertEqual(['a', 'b', 'b'], [r['uuid'] for r in joined])
+        self.assertEqual({'id': 1, 'name': 'one', 'score': 1.5},
+                         joined[0]['values'])
+        self.assertEqual(['two', 'deux'],
+                         [r['values']['name'] for r in joined[1:]])
+        self.assertEqual(None, joined[1]['values']['score'])
+
+    def test_left_join_spilled(self):
+        """Checks a left join with a table moved to a database.
+        """
+        table = self._table(key_type='int', max_memory=1,
+                            tmp_dir=self.tmp_dir)
+        self.assertTrue(table.spilled)
+        self.assertEqual([('two', None), ('deux', 2.5)], table.lookup('2'))
+        joined = list(table.join(self._records(), how='left', prefix='t_'))
+        table.close()
+
+        self.assertEqual(['a', 'b', 'b', 'c', 'd'],
+                         [r['uuid'] for r in joined])
+        self.assertEqual({'id': 3, 't_name': None, 't_score': None},
+                         joined[3]['values'])
+        self.assertEqual('deux', joined[2]['values']['t_name'])
+        self.assertEqual([], os.listdir(self.tmp_dir))
+
+    def test_from_file(self):
+        """Checks a table is read from a (gzipped) CSV file named
+        without its extension and joined to rows.
+        """
+        base = os.path.join(self.tmp_dir, 'lookup')
+        csv_file = gzip.open(base + '.csv.gz', 'wt')
+        csv_file.write('code,label,count:int\nA,alpha,1\nB,beta,2\n')
+        csv_file.close()
+
+        table = LookupTable.LookupTable.from_file(base, 'code')
+        self.assertEqual(['label', 'count'], table.columns)
+        rows = [{'code': 'B', 'n': 1}, {'code': 'C', 'n': 2}]
+        joined = list(table.join(rows, how='left'))
+        table.close()
+
+        self.assertEqual({'code': 'B', 'n': 1, 'label': 'beta', 'count': 2},
+                         joined[0])
+        self.assertEqual(None, joined[1]['label'])
+        self.assertRaises(ValueError, list, table.join(rows, how='outer'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import gzip
+import json
+import os
+import unittest
+
+from pipelines_utils import MoleculeObjectWriter, utils
+
+
+class MoleculeObjectWriterTestCase(unittest.TestCase):
+
+    def test_basic_operation(self):
+        """Test basic file creation, with batches that do not
+        divide the number of molecules.
+        """
+        filename = 'mow_test_a.tmp'
+
+        mow = MoleculeObjectWriter.MoleculeObjectWriter(filename, batchSize=2)
+        mow.writeHeader()
+        mow.write('CCO', 'smiles', {'hac': 3}, objectUUID='1234567890')
+        mow.write('CN', 'smiles')
+        mow.write('CCC', 'smiles', {'hac': 3})
+        self.assertEqual(3, mow.count)
+        mow.writeFooter()
+        mow.close()
+
+        mow_file = open(filename, 'r')
+        molecules = json.load(mow_file)
+        mow_file.close()
+        os.remove(filename)
+
+        self.assertEqual(3, len(molecules))
+        self.assertEqual({'uuid': '1234567890', 'source': 'CCO',
+                          'format': 'smiles', 'values': {'hac': 3}},
+                         molecules[0])
+        self.assertFalse('values' in molecules[1])
+        self.assertTrue('uuid' in molecules[1])
+        self.assertEqual('CCC', molecules[2]['source'])
+
+    def test_create_molecule_writer(self):
+        """Test the utils writer writes the data and metadata on close.
+        """
+        base = 'test_mow'
+
+        writer, output_base = utils.create_molecule_writer(
+            base, None, valueClassMappings={'hac': 'java.lang.Integer'})
+        self.assertEqual(base, output_base)
+        writer.writeHeader()
+        for _ in range(5):
+            writer.write('CCO', 'smiles', {'hac': 3})
+        writer.writeFooter()
+        writer.close()
+
+        data_file = gzip.open(base + '.data.gz', 'rt')
+        molecules = json.load(data_file)
+        data_file.close()
+        meta_file = open(base + '.metadata', 'r')
+        meta = json.load(meta_file)
+        meta_file.close()
+        os.remove(base + '.data.gz')
+        os.remove(base + '.metadata')
+        os.remove(base + '_metrics.txt')
+
+        self.assertEqual(5, len(molecules))
+        self.assertEqual(5, meta['size'])
+        self.assertEqual('org.squonk.types.MoleculeObject', meta['type'])
+        self.assertEqual({'hac': 'java.lang.Integer'},
+                         meta['valueClassMappings'])
+        self.assertEqual([{'fieldName': 'hac',
+                           'values': {'min': 3, 'max': 3, 'nullCount': 0}}],
+                         meta['fieldMetaProps'])
@@ -0,0 +1,40 @@
+import gzip
+import os
+import unittest
+
+from pipelines_utils import ParallelGzipWriter
+
+
+class ParallelGzipWriterTestCase(unittest.TestCase):
+
+    def test_basic_operation(self):
+        """Test content compressed in many blocks is read back intact.
+        """
+        filename = 'pgw_test_a.gz.tmp'
+        lines = ['line %d\n' % i for i in range(1000)]
+
+        writer = ParallelGzipWriter.ParallelGzipWriter(filename, threads=3,
+                                                       block_size=100)
+        for line in lines:
+            writer.write(line)
+        writer.close()
+
+        gz_file = gzip.open(filename, 'rt')
+        content = gz_file.read()
+        gz_file.close()
+        os.remove(filename)
+        self.assertEqual(''.join(lines), content)
+
+    def test_empty_file(self):
+        """Test a file with nothing written is still a valid gzip file.
+        """
+        filename = 'pgw_test_b.gz.tmp'
+
+        writer = ParallelGzipWriter.ParallelGzipWriter(filename, threads=2)
+        writer.close()
+
+        gz_file = gzip.open(filename, 'rt')
+        content = gz_file.read()
+        gz_file.close()
+        os.remove(filename)
+        self.assertEqual('', content)
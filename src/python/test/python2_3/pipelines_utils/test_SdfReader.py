@@ -0,0 +1,92 @@
+import os
+import unittest
+
+from pipelines_utils import SdfReader
+
+DATA_DIR = os.path.join('test', 'python2_3', 'pipelines_utils', 'data')
+
+
+class SdfReaderTestCase(unittest.TestCase):
+
+    def test_basic_operation(self):
+        """Test loading of a simple SD file
+        """
+        test_file = os.path.join(DATA_DIR, 'SdfReader.example.sdf')
+        reader = SdfReader.SdfReader(test_file)
+        records = list(reader)
+        reader.close()
+
+        self.assertEqual(3, len(records))
+        self.assertTrue(records[0].molblock.startswith('ethanol\n'))
+        self.assertTrue(records[0].molblock.endswith('M  END\n'))
+        self.assertEqual('ethanol', records[0].properties['name'])
+        self.assertEqual('3', records[0].properties['hac'])
+        self.assertEqual('line one\nline two', records[0].properties['comment'])
+        self.assertEqual('methylamine', records[1].properties['name'])
+        self.assertEqual({}, records[2].properties)
+        self.assertEqual(0, records[0].offset)
+
+    def test_basic_operation_gzip_with_small_blocks(self):
+        """Test loading of a gzipped SD file using a tiny block size
+        """
+        test_file = os.path.join(DATA_DIR, 'SdfReader.example.sdf.gz')
+        reader = SdfReader.SdfReader(test_file, block_size=7)
+        names = [record.properties.get('name') for record in reader]
+        reader.close()
+
+        self.assertEqual(['ethanol', 'methylamine', None], names)
+
+    def test_without_properties(self):
+        """Test loading without parsing the data items
+        """
+        test_file = os.path.join(DATA_DIR, 'SdfReader.example.sdf')
+        reader = SdfReader.SdfReader(test_file, parse_properties=False)
+        record = next(iter(reader))
+        reader.close()
+
+        self.assertEqual(None, record.properties)
+        self.assertTrue(record.molblock.find('>  <hac>') > 0)
+
+    def test_build_index(self):
+        """Test the offset index, each offset starting a record
+        """
+        test_file = os.path.join(DATA_DIR, 'SdfReader.example.sdf')
+        index = SdfReader.build_index(test_file)
+
+        self.assertEqual(3, len(index))
+        for offset in index:
+            reader = SdfReader.SdfReader(test_file, start=offset)
+            record = next(iter(reader))
+            reader.close()
+            self.assertEqual(offset, record.offset)
+
+    def test_split_ranges_return_every_record_once(self):
+        """Test that ranges of any size return each record exactly once
+        """
+        test_file = os.path.join(DATA_DIR, 'SdfReader.example.sdf')
+        index = SdfReader.build_index(test_file)
+        for num_ranges in range(1, 40):
+            offsets = []
+            for start, end in SdfReader.split_ranges(test_file, num_ranges):
+                reader = SdfReader.SdfReader(test_file, start=start, end=end,
+                                             block_size=16)
+                offsets.extend([record.offset for record in reader])
+                reader.close()
+            self.assertEqual(index, offsets)
+
+    def test_split_ranges_gzip_requires_index(self):
+        """Test splitting a gzipped file
+        """
+        test_file = os.path.join(DATA_DIR, 'SdfReader.example.sdf.gz')
+        self.assertRaises(ValueError, SdfReader.split_ranges, test_file, 2)
+
+        index = SdfReader.build_index(test_file)
+        ranges = SdfReader.split_ranges(test_file, 2, index=index)
+        self.assertEqual([(0, index[1]), (index[1], None)], ranges)
+
+    def test_parse_record_without_mol_end(self):
+        """Test parsing of a record that has no 'M  END'
+        """
+        molblock, properties = SdfReader.parse_record('not a molblock\n')
+        self.assertEqual('not a molblock\n', molblock)
+        self.assertEqual({}, properties)
@@ -0,0 +1,103 @@
+import gzip
+import json
+import os
+import unittest
+
+from collections import OrderedDict
+
+from pipelines_utils import ShardedWriter, utils
+
+
+class ShardedWriterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.base = 'sharded_test'
+
+    def tearDown(self):
+        for filename in os.listdir('.'):
+            if filename.startswith(self.base):
+                os.remove(filename)
+
+    def _read_manifest(self):
+        manifest_file = open(self.base + ShardedWriter.MANIFEST_EXT, 'r')
+        manifest = json.load(manifest_file)
+        manifest_file.close()
+        return manifest
+
+    def _read_shard(self, number, ext='.data.gz'):
+        shard_file = gzip.open('%s.%05d%s' % (self.base, number, ext), 'rt')
+        if ext == '.data.gz':
+            content = json.load(shard_file)
+        else:
+            content = shard_file.readlines()
+        shard_file.close()
+        return content
+
+    def test_rolling_shards(self):
+        """Test shards roll over after a number of records
+        """
+        writer = ShardedWriter.ShardedWriter(self.base, maxRecords=4)
+        writer.writeHeader()
+        for i in range(10):
+            writer.write({'i': i}, objectUUID=str(i))
+        writer.writeFooter()
+        writer.close()
+
+        manifest = self._read_manifest()
+        self.assertEqual(10, manifest['records'])
+        self.assertEqual([4, 4, 2],
+                         [shard['records'] for shard in manifest['shards']])
+        self.assertEqual('sharded_test.00003.data.gz',
+                         manifest['shards'][2]['file'])
+        self.assertEqual(['8', '9'],
+                         [obj['uuid'] for obj in self._read_shard(3)])
+        meta_file = open(self.base + '.00003.metadata', 'r')
+        meta = json.load(meta_file)
+        meta_file.close()
+        self.assertEqual(2, meta['size'])
+        self.assertEqual('10', utils.read_metrics(self.base)['__OutputCount__'])
+
+    def test_rolling_shards_by_size(self):
+        """Test shards roll over after a number of bytes
+        """
+        writer = ShardedWriter.ShardedWriter(self.base, maxBytes=100)
+        for i in range(10):
+            writer.write({'s': 'x' * 20})
+        writer.close()
+
+        manifest = self._read_manifest()
+        self.assertEqual(5, len(manifest['shards']))
+        self.assertEqual(10, sum(shard['records']
+                                 for shard in manifest['shards']))
+
+    def test_partitioned_tsv_shards(self):
+        """Test records with the same key are written to the same shard
+        and that empty shards are written
+        """
+        header = OrderedDict()
+        header['k'] = 'k'
+        header['i'] = 'i:int'
+        writer = ShardedWriter.ShardedWriter(self.base, outputFormat='tsv',
+                                             fieldNames=header,
+                                             numShards=8, keyField='k')
+        for i in range(20):
+            writer.write({'k': 'key%d' % (i % 3), 'i': i})
+        writer.close()
+
+        manifest = self._read_manifest()
+        self.assertEqual(8, len(manifest['shards']))
+        self.assertEqual(20, sum(shard['records']
+                                 for shard in manifest['shards']))
+        number = writer.shard_for('key1')
+        lines = self._read_shard(number, ext='.tsv.gz')
+        self.assertEqual('k\ti:int\n', lines[0])
+        self.assertTrue('key1\t19\n' in lines)
+        for shard in manifest['shards']:
+            self.assertTrue(shard['records'] in [0, 6, 7, 13, 14, 20])
+
+    def test_invalid_arguments(self):
+        """Test a sharding method is required
+        """
+        self.assertRaises(ValueError, ShardedWriter.ShardedWriter, self.base)
+        self.assertRaises(ValueError, ShardedWriter.ShardedWriter, self.base,
+                          numShards=2)
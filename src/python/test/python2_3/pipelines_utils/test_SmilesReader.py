@@ -0,0 +1,104 @@
+import os
+import unittest
+
+from pipelines_utils import SmilesReader, TypedColumnReader
+
+DATA_DIR = os.path.join('test', 'python2_3', 'pipelines_utils', 'data')
+
+
+def count_records(records):
+    """A (picklable) chunk function for map_chunks().
+    """
+    return len(records)
+
+
+class SmilesReaderTestCase(unittest.TestCase):
+
+    def test_basic_operation(self):
+        """Test loading of a simple SMILES file
+        """
+        test_file = os.path.join(DATA_DIR, 'SmilesReader.example.smi')
+        reader = SmilesReader.SmilesReader(test_file)
+        records = list(reader)
+        reader.close()
+
+        # The blank line is skipped
+        self.assertEqual(4, len(records))
+        self.assertEqual(('CCO', 'ethanol', ['46.07', '3']), records[0])
+        self.assertEqual('c1ccccc1', records[3][0])
+
+    def test_typed_header(self):
+        """Test loading of a SMILES file with a provided typed header
+        """
+        test_file = os.path.join(DATA_DIR, 'SmilesReader.example.smi')
+        reader = SmilesReader.SmilesReader(test_file, column_sep='\t',
+                                           header='smiles,id,mw:float,hac:int')
+        records = list(reader)
+        reader.close()
+
+        self.assertEqual(['mw', 'hac'], reader.extra_names)
+        self.assertEqual(('CCO', 'ethanol', [46.07, 3]), records[0])
+        # Empty values are None
+        self.assertEqual(('CCC', 'propane', [None, 3]), records[2])
+
+    def test_file_header_gzip_with_small_blocks(self):
+        """Test loading of a gzipped SMILES file with a typed header line
+        """
+        test_file = os.path.join(DATA_DIR, 'SmilesReader.example.header.smi.gz')
+        reader = SmilesReader.SmilesReader(test_file, has_header=True,
+                                           block_size=5)
+        records = list(reader)
+        reader.close()
+
+        self.assertEqual(['mw', 'hac'], reader.extra_names)
+        self.assertEqual(2, len(records))
+        self.assertEqual(('CN', 'methylamine', [31.06, 2]), records[1])
+
+    def test_missing_id(self):
+        """Test loading lines with and without identifiers
+        """
+        test_file = os.path.join(DATA_DIR, 'SmilesReader.example.b.smi')
+        reader = SmilesReader.SmilesReader(test_file)
+        records = list(reader)
+        reader.close()
+
+        self.assertEqual([('CCO', 'ethanol', []), ('CN', None, [])], records)
+
+    def test_wrong_type(self):
+        """Test loading of a value that does not comply with its type
+        """
+        test_file = os.path.join(DATA_DIR, 'SmilesReader.example.smi')
+        reader = SmilesReader.SmilesReader(test_file,
+                                           header='smiles,id,mw:int,hac:int')
+        got_exception = False
+        try:
+            list(reader)
+        except TypedColumnReader.ContentError as e:
+            self.assertEqual(3, e.column)
+            self.assertEqual(1, e.row)
+            self.assertEqual('46.07', e.value)
+            got_exception = True
+        reader.close()
+        self.assertTrue(got_exception)
+
+    def test_chunks(self):
+        """Test lines are handed out in fixed-size chunks
+        """
+        test_file = os.path.join(DATA_DIR, 'SmilesReader.example.smi')
+        reader = SmilesReader.SmilesReader(test_file)
+        chunks = list(reader.chunks(2))
+        reader.close()
+
+        self.assertEqual([1, 3, 5], [chunk[0] for chunk in chunks])
+        self.assertEqual([2, 2, 1], [len(chunk[1]) for chunk in chunks])
+
+    def test_map_chunks(self):
+        """Test chunks are parsed and processed by worker processes
+        """
+        test_file = os.path.join(DATA_DIR, 'SmilesReader.example.header.smi.gz')
+        reader = SmilesReader.SmilesReader(test_file, has_header=True)
+        results = list(reader.map_chunks(count_records,
+                                         processes=2, chunk_size=1))
+        reader.close()
+
+        self.assertEqual([1, 1], results)
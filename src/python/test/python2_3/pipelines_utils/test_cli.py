@@ -0,0 +1,160 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from pipelines_utils import cli
+
+DATA_DIR = os.path.join('test', 'python2_3', 'pipelines_utils', 'data')
+
+
+class CliTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def test_guess_format(self):
+        """Checks formats are guessed from file extensions.
+        """
+        self.assertEqual('json', cli.guess_format('a/b.data.gz'))
+        self.assertEqual('sdf', cli.guess_format('b.SDF'))
+        self.assertEqual('smi', cli.guess_format('b.smi.gz'))
+        self.assertEqual('ndjson', cli.guess_format('b.ndjson.gz'))
+        self.assertEqual('json', cli.guess_format('b.json'))
+        self.assertEqual(None, cli.guess_format('b.txt'))
+        self.assertEqual('a/b', cli.output_base('a/b.data.gz'))
+
+    def test_convert_sdf_to_json_and_back(self):
+        """Checks SDF records survive conversion to MoleculeObjects
+        (using parallel compression) and back to SDF.
+        """
+        sdf_file = os.path.join(DATA_DIR, 'SdfReader.example.sdf')
+        json_base = os.path.join(self.tmp_dir, 'mols')
+
+        self.assertEqual(0, cli.main(['convert', sdf_file,
+                                      json_base + '.data.gz',
+                                      '--threads', '2']))
+        self.assertEqual(3, cli.convert(json_base + '.data.gz',
+                                        json_base + '.sdf'))
+
+        data_file = gzip.open(json_base + '.data.gz', 'rt')
+        molecules = json.load(data_file)
+        data_file.close()
+        meta_file = open(json_base + '.metadata', 'r')
+        meta = json.load(meta_file)
+        meta_file.close()
+        original = open(sdf_file, 'r')
+        converted = open(json_base + '.sdf', 'r')
+        self.assertEqual(original.read(), converted.read())
+        original.close()
+        converted.close()
+
+        self.assertEqual(3, len(molecules))
+        self.assertEqual('mol', molecules[0]['format'])
+        self.assertEqual('ethanol', molecules[0]['values']['name'])
+        self.assertEqual(3, meta['size'])
+        self.assertEqual('org.squonk.types.MoleculeObject', meta['type'])
+
+    def test_convert_smiles_to_tsv_to_json(self):
+        """Checks typed values survive conversion through a typed TSV file.
+        """
+        smi_file = os.path.join(DATA_DIR, 'SmilesReader.example.header.smi.gz')
+        base = os.path.join(self.tmp_dir, 'smiles')
+
+        self.assertEqual(2, cli.convert(smi_file, base + '.tsv',
+                                        smiles_header=True))
+        self.assertEqual(2, cli.convert(base + '.tsv', base + '.data.gz'))
+
+        tsv_file = open(base + '.tsv', 'r')
+        header = tsv_file.readline()
+        tsv_file.close()
+        data_file = gzip.open(base + '.data.gz', 'rt')
+        objects = json.load(data_file)
+        data_file.close()
+        meta_file = open(base + '.metadata', 'r')
+        meta = json.load(meta_file)
+        meta_file.close()
+
+        self.assertEqual('smiles\tid\tmw:float\thac:int\n', header)
+        self.assertEqual({'smiles': 'CCO', 'id': 'ethanol',
+                          'mw': 46.07, 'hac': 3}, objects[0]['values'])
+        self.assertEqual('org.squonk.types.BasicObject', meta['type'])
+        self.assertEqual('java.lang.Integer', meta['valueClassMappings']['hac'])
+
+    def test_convert_tsv_to_ndjson_and_back(self):
+        """Checks records survive conversion to line-delimited JSON.
+        """
+        smi_file = os.path.join(DATA_DIR, 'SmilesReader.example.header.smi.gz')
+        base = os.path.join(self.tmp_dir, 'ndjson')
+
+        self.assertEqual(2, cli.convert(smi_file, base + '.tsv',
+                                        smiles_header=True))
+        self.assertEqual(2, cli.convert(base + '.tsv', base + '.ndjson.gz'))
+        self.assertEqual(2, cli.convert(base + '.ndjson.gz', base + '.data.gz'))
+
+        data_file = gzip.open(base + '.ndjson.gz', 'rt')
+        lines = data_file.readlines()
+        data_file.close()
+        data_file = gzip.open(base + '.data.gz', 'rt')
+        objects = json.load(data_file)
+        data_file.close()
+
+        self.assertEqual(2, len(lines))
+        self.assertEqual(json.loads(lines[1]), objects[1])
+        self.assertEqual(3, objects[0]['values']['hac'])
+
+    def test_convert_sorted(self):
+        """Checks records are sorted by one of their values,
+        with records without the value last.
+        """
+        sdf_file = os.path.join(DATA_DIR, 'SdfReader.example.sdf')
+        output = os.path.join(self.tmp_dir, 'sorted.sdf')
+
+        self.assertEqual(0, cli.main(['convert', sdf_file, output,
+                                      '--sort', 'hac', '--sort-type', 'int']))
+        sdf = open(output, 'r')
+        lines = sdf.read().splitlines()
+        sdf.close()
+
+        titles = [lines[0]] + [lines[i + 1] for i in range(len(lines) - 1)
+                               if lines[i] == '$$$$']
+        self.assertEqual(['methylamine', 'ethanol', 'propane'], titles)
+
+    def test_convert_smiles_to_sdf_fails(self):
+        """Checks SMILES cannot be written as SDF, and the incomplete
+        output (written with parallel compression or not) is removed.
+        """
+        smi_file = os.path.join(DATA_DIR, 'SmilesReader.example.smi')
+        output = os.path.join(self.tmp_dir, 'smiles.sdf')
+
+        self.assertRaises(ValueError, cli.convert, smi_file, output)
+        self.assertFalse(os.path.exists(output))
+        self.assertRaises(ValueError, cli.convert, smi_file, output + '.gz',
+                          threads=2)
+        self.assertFalse(os.path.exists(output + '.gz'))
+
+    def test_convert_sdf_to_tsv_fails(self):
+        """Checks molfiles are not (silently dropped when) written as TSV.
+        """
+        sdf_file = os.path.join(DATA_DIR, 'SdfReader.example.sdf')
+        output = os.path.join(self.tmp_dir, 'mols.tsv')
+
+        self.assertRaises(ValueError, cli.convert, sdf_file, output)
+        self.assertFalse(os.path.exists(output))
+
+    def test_convert_mixed_json_fails(self):
+        """Checks records with and without a molecule
+        are not written to one dataset.
+        """
+        mixed_file = os.path.join(self.tmp_dir, 'mixed.json')
+        output = os.path.join(self.tmp_dir, 'output.data.gz')
+        with open(mixed_file, 'w') as json_file:
+            json.dump([{'uuid': '1', 'source': 'CC', 'format': 'smiles',
+                        'values': {'a': 1}},
+                       {'uuid': '2', 'values': {'a': 2}}], json_file)
+
+        self.assertRaises(ValueError, cli.convert, mixed_file, output)
+        self.assertFalse(os.path.exists(output))
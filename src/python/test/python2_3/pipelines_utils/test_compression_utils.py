@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pipelines_utils import compression_utils, utils
+from pipelines_utils.Checkpoint import CheckpointFile
+from pipelines_utils.SdfReader import SdfReader
+
+
+class CompressionUtilsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        """Checks every available codec writes (and appends to) files that
+        are recognised by their content, whatever their name.
+        """
+        for name in compression_utils.codec_names():
+            codec = compression_utils.get_codec(name)
+            filename = os.path.join(self.tmp_dir, 'test.txt' + codec.extension)
+            output = compression_utils.open_file(filename, 'wt', level=1)
+            output.write(u'line one\n')
+            output.close()
+            output = compression_utils.open_file(filename, 'at')
+            output.write(u'line two\n')
+            output.close()
+
+            renamed = os.path.join(self.tmp_dir, 'test-' + name)
+            os.rename(filename, renamed)
+            self.assertEqual(name, compression_utils.detect_file(renamed).name)
+            text_file = utils.open_file(renamed, as_text=True)
+            self.assertEqual('line one\nline two\n', text_file.read())
+            text_file.close()
+
+    def test_codecs(self):
+        """Checks codecs are found by name and extension.
+        """
+        self.assertTrue(set(['gzip', 'bz2', 'xz']) <=
+                        set(compression_utils.codec_names(available=False)))
+        self.assertTrue('gzip' in compression_utils.codec_names())
+        self.assertEqual(('a.sdf', 'bz2'),
+                         (compression_utils.split_extension('a.sdf.bz2')[0],
+                          compression_utils.split_extension('a.sdf.bz2')[1]
+                          .name))
+        self.assertEqual(('a.sdf', None),
+                         compression_utils.split_extension('a.sdf'))
+        self.assertRaises(ValueError, compression_utils.get_codec, 'zip')
+        self.assertEqual(None, compression_utils.detect(b'$$$$\n'))
+
+    @unittest.skipUnless(set(['bz2', 'xz']) <=
+                         set(compression_utils.codec_names()),
+                         'The bz2 and xz codecs are not available')
+    def test_output_and_readers(self):
+        """Checks open_output() uses a codec and the readers
+        and checkpoints recognise it.
+        """
+        base = os.path.join(self.tmp_dir, 'test')
+        output = utils.open_output(base, 'sdf', True, codec='xz', level=1)
+        output.write(u'mol\n\n\n  0  0  0  0  0  0  0  0  0  0999 V2000\n'
+                     u'M  END\n$$$$\n')
+        output.close()
+        reader = SdfReader(base + '.sdf.xz')
+        self.assertEqual(['mol'], [record.molblock.splitlines()[0]
+                                   for record in reader])
+        reader.close()
+
+        filename = base + '.txt.bz2'
+        checkpoint_file = CheckpointFile(filename)
+        checkpoint_file.write(u'one\n')
+        size = checkpoint_file.commit()
+        checkpoint_file.write(u'two\n')
+        checkpoint_file.close()
+        checkpoint_file = CheckpointFile(filename, size=size)
+        checkpoint_file.write(u'three\n')
+        checkpoint_file.close()
+        text_file = utils.open_file(filename, as_text=True)
+        self.assertEqual('one\nthree\n', text_file.read())
+        text_file.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
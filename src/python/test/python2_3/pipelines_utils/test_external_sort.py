@@ -0,0 +1,85 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from pipelines_utils import external_sort
+from pipelines_utils.TypedColumnReader import TypedColumnReader
+
+
+class ExternalSortTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.max_merge_width = external_sort.MAX_MERGE_WIDTH
+
+    def tearDown(self):
+        external_sort.MAX_MERGE_WIDTH = self.max_merge_width
+        shutil.rmtree(self.tmp_dir)
+
+    def _records(self, num_records):
+        rnd = random.Random(42)
+        return [{'i': i, 'score': rnd.randint(0, 99)}
+                for i in range(num_records)]
+
+    def test_sort_in_memory(self):
+        """Checks records that fit in memory are sorted (stably)
+        without using temporary files.
+        """
+        records = self._records(50)
+        result = list(external_sort.sort_records(records, 'score',
+                                                 tmp_dir=self.tmp_dir))
+        self.assertEqual(sorted(records, key=lambda r: r['score']), result)
+        self.assertEqual([], os.listdir(self.tmp_dir))
+
+    def test_sort_with_runs(self):
+        """Checks records are sorted using runs, merged in several passes,
+        and the temporary files are removed.
+        """
+        external_sort.MAX_MERGE_WIDTH = 4
+        records = self._records(2000)
+        result = list(external_sort.sort_records(records, 'score',
+                                                 max_memory=1,
+                                                 tmp_dir=self.tmp_dir))
+        self.assertEqual(sorted(records, key=lambda r: r['score']), result)
+        self.assertEqual([], os.listdir(self.tmp_dir))
+
+    def test_sort_reversed_with_processes(self):
+        """Checks a descending sort using a pool of processes,
+        with missing values last.
+        """
+        records = self._records(1000)
+        records[10]['score'] = None
+        records[500]['score'] = None
+        result = list(external_sort.sort_records(records, 'score',
+                                                 reverse=True,
+                                                 max_memory=1, processes=2,
+                                                 tmp_dir=self.tmp_dir))
+        expected = sorted([r for r in records if r['score'] is not None],
+                          key=lambda r: r['score'], reverse=True)
+        self.assertEqual(expected, result[:-2])
+        self.assertEqual([10, 500], [r['i'] for r in result[-2:]])
+        self.assertEqual([], os.listdir(self.tmp_dir))
+
+    def test_sort_typed_columns(self):
+        """Checks typed columns, and values converted by the key,
+        are sorted numerically.
+        """
+        rows = ['name\tscore:float\tcount', 'a\t10.5\t10', 'b\t9\t9',
+                'c\t\t100', 'd\t-1\t2']
+        reader = TypedColumnReader(rows, header=None)
+        names = [row['name'] for row in
+                 external_sort.sort_records(reader, 'score')]
+        self.assertEqual(['d', 'b', 'a', 'c'], names)
+
+        objects = [{'uuid': row[0], 'values': {'count': row[1]}}
+                   for row in [('a', '10'), ('b', '9'), ('c', '100')]]
+        uuids = [obj['uuid'] for obj in
+                 external_sort.sort_records(objects, 'count',
+                                            key_type='int')]
+        self.assertEqual(['b', 'a', 'c'], uuids)
+
+
+if __name__ == '__main__':
+    unittest.main()
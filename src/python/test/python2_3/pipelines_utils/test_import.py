@@ -0,0 +1,78 @@
+import ast
+import subprocess
+import sys
+import unittest
+
+# The longest time (seconds) an import of pipelines_utils.utils can take.
+# Generous, to allow for slow CI machines, but it's typically a few ms.
+IMPORT_TIME_BUDGET = 0.25
+
+# Modules that must not be imported by the minimal import path
+HEAVY_MODULES = ['gzip', 'inspect', 'json', 're', 'uuid',
+                 'pipelines_utils.BasicObjectWriter',
+                 'pipelines_utils.TsvWriter']
+
+# The modules are listed with repr(), so the script imports nothing
+# (but time) after its snapshot of the loaded modules
+_IMPORT_SCRIPT = """
+import sys
+before = set(sys.modules)
+import time
+start = time.time()
+import pipelines_utils.utils
+elapsed = time.time() - start
+print(repr((elapsed, sorted(set(sys.modules) - before))))
+"""
+
+
+class ImportTestCase(unittest.TestCase):
+
+    def _import_utils(self):
+        """Imports pipelines_utils.utils in a new interpreter, returning
+        the time taken and the list of modules it imported.
+        """
+        output = subprocess.check_output([sys.executable, '-c',
+                                          _IMPORT_SCRIPT])
+        elapsed, modules = ast.literal_eval(output.decode('utf-8').strip())
+        return elapsed, modules
+
+    def test_minimal_imports(self):
+        """Checks importing utils does not import heavy modules.
+        """
+        _, modules = self._import_utils()
+        for module in HEAVY_MODULES:
+            self.assertFalse(module in modules, module + ' was imported')
+
+    def test_import_time(self):
+        """Checks importing utils is within the time budget.
+        """
+        # Best of 3, to reduce the noise
+        elapsed = min(self._import_utils()[0] for _ in range(3))
+        self.assertTrue(elapsed < IMPORT_TIME_BUDGET,
+                        'Import took %.3fs' % elapsed)
+
+    def test_lazy_submodules(self):
+        """Checks submodules are available as package attributes.
+        """
+        if sys.version_info < (3, 7):
+            self.skipTest('Needs Python 3.7')
+        import pipelines_utils
+        self.assertEqual('pipelines_utils.SdfReader',
+                         pipelines_utils.SdfReader.__name__)
+        self.assertRaises(AttributeError, getattr, pipelines_utils, 'missing')
+
+    def test_compatibility_aliases(self):
+        """Checks the names utils used to import are still available.
+        """
+        if sys.version_info < (3, 7):
+            self.skipTest('Needs Python 3.7')
+        import gzip
+        import json
+        from pipelines_utils import utils
+        from pipelines_utils.BasicObjectWriter import BasicObjectWriter
+        from pipelines_utils.TsvWriter import TsvWriter
+        self.assertIs(BasicObjectWriter, utils.BasicObjectWriter)
+        self.assertIs(TsvWriter, utils.TsvWriter)
+        self.assertIs(gzip, utils.gzip)
+        self.assertIs(json, utils.json)
+        self.assertRaises(AttributeError, getattr, utils, 'missing')
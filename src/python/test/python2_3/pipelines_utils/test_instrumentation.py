@@ -0,0 +1,80 @@
+import os
+import unittest
+
+from pipelines_utils import instrumentation, utils
+from pipelines_utils import BasicObjectWriter, SdfReader, TsvWriter
+
+DATA_DIR = os.path.join('test', 'python2_3', 'pipelines_utils', 'data')
+
+
+class InstrumentationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.was_enabled = instrumentation.is_enabled()
+        instrumentation.reset()
+
+    def tearDown(self):
+        instrumentation.enable(self.was_enabled)
+        instrumentation.reset()
+
+    def test_disabled(self):
+        """Checks nothing is recorded when instrumentation is off.
+        """
+        instrumentation.enable(False)
+        self.assertIsNone(instrumentation.recorder('SdfReader'))
+
+        reader = SdfReader.SdfReader(os.path.join(DATA_DIR,
+                                                  'SdfReader.example.sdf'))
+        self.assertEqual(3, len(list(reader)))
+        reader.close()
+
+        self.assertEqual({}, instrumentation.snapshot())
+        self.assertEqual({}, instrumentation.as_metrics())
+
+    def test_readers_and_writers(self):
+        """Checks reader and writer counters and timers are collected.
+        """
+        instrumentation.enable()
+        filename = 'test_instrumentation.data.tmp'
+
+        reader = SdfReader.SdfReader(os.path.join(DATA_DIR,
+                                                  'SdfReader.example.sdf'))
+        writer = BasicObjectWriter.BasicObjectWriter(filename)
+        writer.writeHeader()
+        for record in reader:
+            writer.write(record.properties)
+        writer.writeFooter()
+        writer.close()
+        reader.close()
+        size = os.path.getsize(filename)
+        os.remove(filename)
+
+        totals = instrumentation.snapshot()
+        self.assertEqual(3, totals['SdfReader']['records'])
+        self.assertEqual(3, totals['BasicObjectWriter']['records'])
+        self.assertEqual(size - 2 - 2 * len(',\n'),
+                         totals['BasicObjectWriter']['chars'])
+        self.assertTrue(totals['SdfReader']['bytes'] > 0)
+        self.assertTrue('close_seconds' in totals['BasicObjectWriter'])
+        self.assertTrue(totals['SdfReader']['parse_seconds'] >= 0)
+        self.assertTrue('encode_seconds' in totals['BasicObjectWriter'])
+
+    def test_metrics_are_merged(self):
+        """Checks instrumentation totals are added to the metrics file.
+        """
+        instrumentation.enable()
+        base = 'test_instrumentation'
+
+        writer = TsvWriter.TsvWriter(base + '.tsv.tmp', {'a': 'a:int'})
+        writer.writeHeader()
+        writer.write({'a': 1})
+        writer.write({'a': 2})
+        writer.close()
+        utils.write_metrics(base, {'__InputCount__': 2})
+        metrics = utils.read_metrics(base)
+        os.remove(base + '.tsv.tmp')
+        os.remove(base + '_metrics.txt')
+
+        self.assertEqual('2', metrics['__InputCount__'])
+        self.assertEqual('2', metrics['pipelines_utils.TsvWriter.records'])
+        self.assertTrue('pipelines_utils.TsvWriter.write_seconds' in metrics)
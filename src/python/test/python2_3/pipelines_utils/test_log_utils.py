@@ -0,0 +1,85 @@
+import gc
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import weakref
+
+try:
+    # A buffer of native strings (bytes) on Python 2
+    from cStringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from pipelines_utils import compression_utils, log_utils
+
+
+class LogUtilsTestCase(unittest.TestCase):
+
+    def test_logger_buffers(self):
+        """Checks lines are buffered until a warning, suppressed lines
+        are dropped and the fields of structured lines are written.
+        """
+        stream = StringIO()
+        logger = log_utils.Logger(level=log_utils.INFO, stream=stream,
+                                  flush_seconds=60)
+        logger.debug('Not logged %s', 'at all')
+        logger.info('Read %d records', 3, file='a.sdf')
+        self.assertEqual('', stream.getvalue())
+        logger.warning('Odd')
+        self.assertEqual('Read 3 records file=a.sdf\nWARNING Odd\n',
+                         stream.getvalue())
+
+        stream = StringIO()
+        logger = log_utils.Logger(stream=stream, structured=True,
+                                  buffer_size=1)
+        logger.info('Done', records=10)
+        entry = json.loads(stream.getvalue())
+        self.assertEqual('INFO', entry['level'])
+        self.assertEqual(10, entry['records'])
+
+    def test_logger_is_released(self):
+        """Checks a logger (and its stream) is not kept until exit.
+        """
+        logger = log_utils.Logger(stream=StringIO())
+        released = weakref.ref(logger)
+        del logger
+        gc.collect()
+        self.assertTrue(released() is None)
+
+    def test_progress(self):
+        """Checks progress is reported with an ETA from the position
+        in the compressed input.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        filename = os.path.join(tmp_dir, 'input.txt.gz')
+        data = os.urandom(100000)
+        output = gzip.open(filename, 'wb')
+        output.write(data)
+        output.close()
+
+        stream = StringIO()
+        logger = log_utils.Logger(stream=stream)
+        source = compression_utils.open_file(filename, 'rt',
+                                             encoding='latin-1')
+        progress = log_utils.ProgressReporter(source=source, interval=0,
+                                              logger=logger, name='Test')
+        self.assertEqual(os.path.getsize(filename), progress.total_bytes)
+        source.read(1000)
+        progress.update(10, bytes=1000)
+        self.assertTrue(0 < progress.position() <= progress.total_bytes)
+        progress.finish()
+        source.close()
+
+        lines = stream.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('Test: 10 records'))
+        self.assertTrue('ETA' in lines[0])
+        self.assertTrue(lines[1].startswith('Test: 10 records in 0:00:00'))
+        self.assertEqual('1:01:05', log_utils.format_seconds(3665))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pipelines_utils import cli, metrics_utils, utils
+
+
+class MetricsUtilsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _base(self, name):
+        return os.path.join(self.tmp_dir, name)
+
+    def test_journal(self):
+        """Checks typed metrics are journaled when flushed
+        and summarised when closed.
+        """
+        base = self._base('worker')
+        metrics = metrics_utils.Metrics(base)
+        metrics.counter('__InputCount__', 2)
+        metrics.gauge('maxHac', 7, rule='max')
+        metrics.flush()
+        metrics.counter('__InputCount__')
+        metrics.gauge('maxHac', 5, rule='max')
+        metrics.add_time('scoring', 1.5, count=3)
+        with metrics.timer('scoring'):
+            pass
+        metrics.close()
+
+        journal = open(base + metrics_utils.JOURNAL_EXT, 'r')
+        lines = journal.readlines()
+        journal.close()
+        self.assertEqual(5, len(lines))
+        found = metrics_utils.read_journal(base + metrics_utils.JOURNAL_EXT)
+        self.assertEqual(3, found['__InputCount__'].value)
+        self.assertEqual(7, found['maxHac'].value)
+        self.assertEqual(4, found['scoring'].count)
+
+        values = utils.read_metrics(base)
+        self.assertEqual('3', values['__InputCount__'])
+        self.assertEqual('7', values['maxHac'])
+        self.assertEqual('4', values['scoring.count'])
+        self.assertRaises(ValueError, metrics.counter, 'maxHac')
+
+    def test_merge(self):
+        """Checks journals and metrics files are merged, ignoring
+        an incomplete journal line.
+        """
+        for i in range(3):
+            metrics = metrics_utils.Metrics(self._base('shard%d' % i))
+            metrics.counter('__OutputCount__', 10 + i)
+            metrics.gauge('maxHac', i * 2, rule='max')
+            metrics.close()
+        journal = open(self._base('shard2') + metrics_utils.JOURNAL_EXT, 'a')
+        journal.write('{"name": "__OutputCount__", "ty')
+        journal.close()
+        utils.write_metrics(self._base('shard3'), {'__OutputCount__': 5,
+                                                   '__Shards__': 2,
+                                                   'status': 'ok'})
+
+        self.assertEqual(0, cli.main(['merge-metrics', self._base('output')] +
+                                     [self._base('shard%d' % i)
+                                      for i in range(4)] +
+                                     ['--rule', '__Shards__=max',
+                                      '--rule', 'maxHac=min']))
+        values = utils.read_metrics(self._base('output'))
+        # A rule doesn't change a metric's declared (journal) rule
+        self.assertEqual({'__OutputCount__': '38', 'maxHac': '4',
+                          '__Shards__': '2', 'status': 'ok'}, values)
+        self.assertRaises(ValueError, metrics_utils.merge_metrics,
+                          [self._base('shard3')], self._base('output'),
+                          {'__Shards__': 'mean'})
+
+    def test_merge_with_writer_metrics(self):
+        """Checks the metrics of a worker's writer (in its metrics file)
+        are merged along with those in its journal.
+        """
+        bases = [self._base('worker%d' % i) for i in range(2)]
+        for base in bases:
+            writer, _ = utils.create_simple_writer(base, None, 'json', None)
+            metrics = metrics_utils.Metrics(base)
+            for i in range(3):
+                writer.write({'i': i})
+                metrics.counter('scored')
+            metrics.add_time('scoring', 0.5, count=3)
+            writer.close()
+            metrics.close()
+
+        merged = metrics_utils.merge_metrics(bases, self._base('output'))
+        self.assertEqual(metrics_utils.TIMER, merged['scoring'].type)
+        values = utils.read_metrics(self._base('output'))
+        self.assertEqual('6', values['__OutputCount__'])
+        self.assertEqual('6', values['scored'])
+        self.assertEqual('6', values['scoring.count'])
+        self.assertEqual(1.0, float(values['scoring']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import argparse
+import os
+import signal
+import unittest
+
+from pipelines_utils import parameter_utils, profile_utils
+
+
+def _busy(n):
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+
+class ProfileUtilsTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        # Don't leave a profiler running
+        for filename in profile_utils.stop('test_profile_teardown'):
+            os.remove(filename)
+
+    def test_profile_option(self):
+        """Checks the --profile option profiles the program and writes
+        files named after the output base.
+        """
+        parser = argparse.ArgumentParser()
+        parameter_utils.add_default_io_args(parser, profile=True)
+        args = parser.parse_args(['--profile', '-o', 'test_profile_a'])
+        self.assertEqual('deterministic', args.profile)
+        self.assertTrue(profile_utils.is_profiling())
+
+        _busy(1000)
+        files = profile_utils.stop(args.output)
+        self.assertFalse(profile_utils.is_profiling())
+        self.assertEqual(['test_profile_a_profile.prof',
+                          'test_profile_a_profile.txt'], files)
+        summary_file = open(files[1], 'r')
+        summary = summary_file.read()
+        summary_file.close()
+        for filename in files:
+            os.remove(filename)
+        self.assertTrue('_busy' in summary)
+
+        # Stopping again does nothing
+        self.assertEqual([], profile_utils.stop(args.output))
+
+    @unittest.skipUnless(hasattr(signal, 'setitimer'), 'Needs setitimer')
+    def test_sampling_profile(self):
+        """Checks a sampling profile is written as folded stacks.
+        """
+        profile_utils.start('sampling', interval=0.001)
+        _busy(500000)
+        files = profile_utils.stop('test_profile_b')
+
+        self.assertEqual(['test_profile_b_profile.folded',
+                          'test_profile_b_profile.txt'], files)
+        folded_file = open(files[0], 'r')
+        lines = folded_file.readlines()
+        folded_file.close()
+        for filename in files:
+            os.remove(filename)
+        self.assertTrue(lines)
+        self.assertTrue(any('_busy' in line for line in lines))
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertTrue(int(count) > 0)
+
+    def test_profile_option_is_optional(self):
+        """Checks the default arguments don't include --profile,
+        so a pipeline can define its own.
+        """
+        parser = argparse.ArgumentParser()
+        parameter_utils.add_default_io_args(parser)
+        parser.add_argument('--profile', help='A pipeline option')
+        args = parser.parse_args(['--profile', 'fast', '-o', 'test_profile_c'])
+        self.assertEqual('fast', args.profile)
+        self.assertFalse(profile_utils.is_profiling())
+
+    def test_unknown_mode(self):
+        """Checks unknown profile modes are rejected.
+        """
+        self.assertRaises(ValueError, profile_utils.start, 'magic')
+        self.assertFalse(profile_utils.is_profiling())
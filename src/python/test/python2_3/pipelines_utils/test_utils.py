@@ -70,6 +70,58 @@ class UtilsTestCase(unittest.TestCase):
         self.assertTrue(found_a)
         self.assertTrue(found_b)
 
+    def test_write_metrics_replaces_values(self):
+        """Checks metrics replace those already written.
+        """
+        m_base = 'test_utils_replace'
+        self.addCleanup(os.remove, m_base + '_metrics.txt')
+
+        utils.write_metrics(m_base, {'key_a': 'value_a', 'key_b': 'value_b'})
+        utils.write_metrics(m_base, {'key_b': 'value_c'})
+
+        self.assertEqual({'key_b': 'value_c'}, utils.read_metrics(m_base))
+
+    def test_update_metrics_merges_values(self):
+        """Checks updated metrics are merged with those already written.
+        """
+        m_base = 'test_utils_merge'
+        self.addCleanup(os.remove, m_base + '_metrics.txt')
+
+        utils.write_metrics(m_base, {'key_a': 'value_a', 'key_b': 'value_b'})
+        utils.update_metrics(m_base, {'key_b': 'value_c'})
+
+        self.assertEqual({'key_a': 'value_a', 'key_b': 'value_c'},
+                         utils.read_metrics(m_base))
+
+    def test_write_metrics_keeps_writer_metrics(self):
+        """Checks the metrics a writer adds are kept when the pipeline
+        writes its metrics, whether that's before or after the writer
+        is closed.
+        """
+        for m_base, pipeline_first in [('test_utils_before', True),
+                                       ('test_utils_after', False)]:
+            self.addCleanup(os.remove, m_base + '_metrics.txt')
+            self.addCleanup(os.remove, m_base + '.data.gz')
+            self.addCleanup(os.remove, m_base + '.metadata')
+            # A metrics file left by an earlier run
+            utils.write_metrics(m_base, {'stale': 1, '__InputCount__': 9})
+
+            writer, _ = utils.create_simple_writer(m_base, None, 'json', None)
+            writer.write({'i': 1})
+            if pipeline_first:
+                utils.write_metrics(m_base, {'__InputCount__': 1})
+                writer.close()
+            else:
+                writer.close()
+                utils.write_metrics(m_base, {'__InputCount__': 1})
+            self.assertEqual({'__InputCount__': '1', '__OutputCount__': '1'},
+                             utils.read_metrics(m_base), m_base)
+
+        # The pipeline's values replace the writer's
+        utils.write_metrics('test_utils_after', {'__OutputCount__': 2})
+        self.assertEqual({'__OutputCount__': '2'},
+                         utils.read_metrics('test_utils_after'))
+
     def test_generate_molecule_object_dict_without_values(self):
         """Checks molecule object creation without values.
         """